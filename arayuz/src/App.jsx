@@ -305,7 +305,9 @@ export default function App() {
     setIsTyping(true);
 
     try {
-      const response = await chatService.sendMessage(question, sessionId);
+      const response = await chatService.streamMessage(question, sessionId, {
+        onDone: fetchSessions,
+      });
       const fullText = response?.message || "Üzgünüm, bir hata oluştu. Lütfen tekrar deneyin.";
       const responseSessionId = response?.sessionId || sessionId;
       
@@ -328,7 +330,6 @@ export default function App() {
       // Typing effect başlat
       setTypingMessageId(botMessageId);
       setTypingText("");
-      fetchSessions();
       
     } catch {
       const fullText = "WebAPI bağlantısı kurulamadı. Lütfen API'nin çalıştığını kontrol edin.";
@@ -370,7 +371,9 @@ export default function App() {
     setIsTyping(true);
 
     try {
-      const response = await chatService.sendMessage(value, sessionId);
+      const response = await chatService.streamMessage(value, sessionId, {
+        onDone: fetchSessions,
+      });
       const fullText = response?.message || "Üzgünüm, bir hata oluştu. Lütfen tekrar deneyin.";
       const responseSessionId = response?.sessionId || sessionId;
       
@@ -393,7 +396,6 @@ export default function App() {
       // Typing effect başlat
       setTypingMessageId(botMessageId);
       setTypingText("");
-      fetchSessions();
       
     } catch {
       const fullText = "WebAPI bağlantısı kurulamadı. Lütfen API'nin çalıştığını kontrol edin.";
@@ -34,6 +34,84 @@ class ChatService {
     }
   }
 
+  // Chat mesajını SSE ile gönder: cevap gelir gelmez döner,
+  // benzer sorular, kayıt tamamlanması ve cevaptan sonraki hatalar callback'lerle bildirilir
+  async streamMessage(message, sessionId = null, { onRelated, onDone, onError } = {}) {
+    const response = await fetch(`${this.baseURL}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
+      },
+      body: JSON.stringify({
+        message: message,
+        sessionId: sessionId || null,
+      })
+    });
+
+    if (!response.ok) {
+      const text = await response.text();
+      throw new Error(`HTTP error ${response.status}: ${text}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = null;
+    let streamError = null;
+
+    const handleEvent = (rawEvent) => {
+      let event = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (!data) return;
+      const payload = JSON.parse(data);
+      if (event === 'answer') answer = payload;
+      else if (event === 'related' && onRelated) onRelated(payload);
+      else if (event === 'done' && onDone) onDone(payload);
+      else if (event === 'error') {
+        streamError = payload;
+        // Cevap gösterildiyse hata yalnızca bildirilir (ör. mesajlar kaydedilemedi)
+        if (answer) {
+          console.error('Chat Stream Error:', payload);
+          if (onError) onError(payload);
+        }
+      }
+    };
+
+    return new Promise((resolve, reject) => {
+      const pump = async () => {
+        try {
+          for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+              handleEvent(buffer.slice(0, boundary));
+              buffer = buffer.slice(boundary + 2);
+              if (answer) {
+                resolve(answer);
+              } else if (streamError) {
+                reject(new Error(streamError.detail || 'Stream failed'));
+              }
+            }
+          }
+          if (!answer) {
+            reject(new Error('Stream closed before an answer was received'));
+          }
+        } catch (error) {
+          console.error('Chat Stream Error:', error);
+          reject(error);
+        }
+      };
+      pump();
+    });
+  }
+
   // Session listesi getir
   async listSessions() {
     const response = await fetch(`${this.baseURL}/chat/history`);
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -31,12 +31,193 @@ class Settings(BaseSettings):
         default=DEFAULT_MODEL_DIR / "20251116_191825" / "vector_store.joblib",
         description="Path to serialized vector store containing TF-IDF matrices.",
     )
+    embedding_index_path: Optional[Path] = Field(
+        default=DEFAULT_MODEL_DIR / "20251116_191825" / "embedding_index.joblib",
+        description="Path to the dense question embedding index (a matching .npy file holds the matrix).",
+    )
+    typo_index_path: Optional[Path] = Field(
+        default=DEFAULT_MODEL_DIR / "20251116_191825" / "typo_index.joblib",
+        description="Path to the spelling/trigram index that fixes ASCII-typed and misspelled queries before inference.",
+    )
+    bots: dict[str, Path] = Field(
+        default_factory=dict,
+        description="Extra chatbots served next to the default one, as a JSON object of bot id -> model directory.",
+    )
+    default_bot_id: str = Field(
+        default="default",
+        description="Bot id of the model configured above; requests without a botId are answered by it.",
+    )
+    max_resident_models: int = Field(
+        default=2,
+        description="Most bot models kept loaded at once; the least recently used one is unloaded first.",
+    )
+    model_memory_budget_mb: Optional[float] = Field(
+        default=None,
+        description="Estimated memory all loaded bot models may use together; None limits by count only.",
+    )
+    embedding_search_probes: int = Field(
+        default=4,
+        description="Number of coarse clusters scanned per query when the embedding index is partitioned.",
+    )
+
+    inference_backend: Literal["eager", "torchscript", "compile"] = Field(
+        default="eager",
+        description="How the classifier runs: plain PyTorch, a frozen TorchScript trace or torch.compile, per length bucket.",
+    )
+    sequence_buckets: Optional[list[int]] = Field(
+        default=None,
+        description=(
+            "Padded sequence lengths queries are routed to, e.g. [16, 32, 64]; max_length is always added. "
+            "Unset with a non-eager backend: powers of two from 16 up to max_length."
+        ),
+    )
+    early_exit_threshold: Optional[float] = Field(
+        default=None,
+        description="Stop at the first intermediate exit head at least this confident; None runs every layer.",
+    )
+    preload_model: bool = Field(
+        default=True,
+        description="Load and warm the model at startup instead of on the first request.",
+    )
+    warmup_data_path: Optional[Path] = Field(
+        default=DEFAULT_DATA_DIR / "raw" / "train.csv",
+        description="CSV with a question column used to warm the model up.",
+    )
+    warmup_questions: int = Field(
+        default=32,
+        description="Number of representative questions run through the model during warm-up.",
+    )
+
+    token_cache_size: int = Field(
+        default=2048,
+        description="Number of tokenized queries kept per model, keyed by normalized text.",
+    )
+
+    web_concurrency: int = Field(
+        default=1,
+        description="Number of uvicorn worker processes sharing the machine (uvicorn reads the same WEB_CONCURRENCY).",
+    )
+    torch_threads: Optional[int] = Field(
+        default=None,
+        description="torch intra-op threads per worker; None splits the available cores evenly between workers.",
+    )
+    torch_interop_threads: Optional[int] = Field(
+        default=None,
+        description="torch inter-op threads per worker; None uses 1.",
+    )
+    tokenizer_threads: Optional[int] = Field(
+        default=None,
+        description="Rayon threads for the fast tokenizer; None uses 1.",
+    )
+    max_concurrent_inference: Optional[int] = Field(
+        default=None,
+        description="Forward passes allowed at once per worker; None fits them to the worker's core share.",
+    )
+    cpu_pinning: bool = Field(
+        default=False,
+        description="Pin each worker to its own set of cores (Linux only).",
+    )
 
     max_history_items: int = Field(
         default=50,
         description="Maximum number of previous messages to return in chat history endpoints.",
     )
 
+    retention_days: Optional[int] = Field(
+        default=None,
+        description="Sessions idle for longer than this many days are archived and deleted; None disables retention.",
+    )
+    archive_dir: Optional[Path] = Field(
+        default=DEFAULT_DATA_DIR / "archive",
+        description="Directory for date-partitioned, gzip-compressed JSONL archives of expired sessions.",
+    )
+    retention_batch_size: int = Field(
+        default=500,
+        description="Sessions archived and deleted per transaction by the retention job.",
+    )
+    retention_interval_minutes: int = Field(
+        default=60,
+        description="How often the in-process retention job runs; 0 leaves it to the offline CLI.",
+    )
+
+    search_candidate_limit: int = Field(
+        default=5000,
+        description="History search ranks only the newest this many matches by BM25.",
+    )
+
+    low_confidence_threshold: float = Field(
+        default=0.5,
+        description="Bot answers below this confidence count as low-confidence in analytics rollups.",
+    )
+    analytics_refresh_batch: int = Field(
+        default=50_000,
+        description="Most new messages folded into the analytics rollups per /analytics request.",
+    )
+
+    gzip_minimum_size: int = Field(
+        default=1024,
+        description="Responses smaller than this many bytes are sent uncompressed.",
+    )
+
+    profiling_enabled: bool = Field(
+        default=False,
+        description="Install the request profiler; when off, requests never pass through it.",
+    )
+    profile_sample_rate: float = Field(
+        default=0.0,
+        description="Fraction of requests profiled automatically; admins can force one with X-Profile: 1.",
+    )
+    profile_dir: Path = Field(
+        default=DEFAULT_DATA_DIR / "profiles",
+        description="Directory where request profiles (pstats, collapsed stacks, torch traces) are stored.",
+    )
+    profile_keep: int = Field(
+        default=100,
+        description="Number of most recent request profiles kept on disk.",
+    )
+    profile_sample_interval_ms: float = Field(
+        default=2.0,
+        description="Stack sampling interval of the request profiler.",
+    )
+    profile_torch: bool = Field(
+        default=True,
+        description="Also record a torch profiler trace for profiled requests.",
+    )
+
+    shadow_model_dir: Optional[Path] = Field(
+        default=None,
+        description="Candidate model evaluated in shadow mode on the default bot's live traffic from startup.",
+    )
+    shadow_sample_rate: float = Field(
+        default=0.1,
+        description="Share of chat questions replayed against the shadow candidate.",
+    )
+    shadow_queue_size: int = Field(
+        default=32,
+        description="Most questions waiting for the shadow candidate; further samples are dropped.",
+    )
+    shadow_max_delay_seconds: float = Field(
+        default=5.0,
+        description="Queued shadow questions older than this are skipped instead of evaluated late.",
+    )
+    shadow_duty_cycle: float = Field(
+        default=0.25,
+        description="Largest share of time the shadow worker spends predicting; it rests in between.",
+    )
+
+    admin_token: Optional[str] = Field(
+        default=None,
+        description="Shared secret expected in the X-Admin-Token header for admin endpoints.",
+    )
+    reload_smoke_size: int = Field(
+        default=25,
+        description="Number of labelled example questions used to validate a model before it is swapped in.",
+    )
+    reload_min_accuracy: float = Field(
+        default=0.8,
+        description="Minimum smoke-set accuracy a reloaded model must reach to become active.",
+    )
+
     class Config:
         env_file = ROOT_DIR / ".env"
         env_file_encoding = "utf-8"
@@ -1,17 +1,66 @@
 from __future__ import annotations
 
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from .config import get_settings
 from .database import Base, engine
-from .routers import chat, health, history
+from .routers import admin, analytics, chat, health, history
+from .services.analytics import ensure_monotonic_message_ids
+from .services.model_manager import get_model_registry
+from .services.retention import get_retention_scheduler
+from .services.shadow import get_shadow_controller
+from .services.search import ensure_search_index
+from .utils.cpu import apply_topology, available_cpus, plan_topology
+from .utils.profiling import ProfileStore, ProfilingMiddleware
+
+LOGGER = logging.getLogger(__name__)
 
 settings = get_settings()
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title=settings.app_name, version=settings.version)
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # Not at import time: training scripts and benchmarks import app.* and must not touch the database
+    ensure_monotonic_message_ids(engine)
+    ensure_search_index(engine)
+    # Runs in every worker process, before the model is loaded
+    apply_topology(
+        plan_topology(
+            available_cpus(),
+            workers=settings.web_concurrency,
+            intra_op_threads=settings.torch_threads,
+            inter_op_threads=settings.torch_interop_threads,
+            tokenizer_threads=settings.tokenizer_threads,
+            max_concurrent_inference=settings.max_concurrent_inference,
+        ),
+        pin=settings.cpu_pinning,
+    )
+    if settings.preload_model:
+        try:
+            get_model_registry().get()
+        except Exception:  # noqa: BLE001 - keep serving history; chat retries the load lazily
+            LOGGER.exception("Model preload failed")
+    shadow = get_shadow_controller()
+    if settings.shadow_model_dir is not None and shadow.begin(settings.default_bot_id, settings.shadow_model_dir):
+        shadow.start(settings.default_bot_id, settings.shadow_model_dir)
+    scheduler = None
+    if settings.retention_days is not None and settings.retention_interval_minutes > 0:
+        scheduler = get_retention_scheduler()
+        scheduler.start()
+    yield
+    shadow.stop()
+    if scheduler is not None:
+        scheduler.stop()
+
+
+app = FastAPI(title=settings.app_name, version=settings.version, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,9 +71,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Büyük sohbet geçmişlerini sıkıştır; küçük yanıtlar ve SSE akışı olduğu gibi gider
+app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_minimum_size)
+
+if settings.profiling_enabled:
+    # Outermost, so the profile covers compression and the whole endpoint
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=ProfileStore(settings.profile_dir, settings.profile_keep),
+        sample_rate=settings.profile_sample_rate,
+        admin_token=settings.admin_token,
+        interval=settings.profile_sample_interval_ms / 1000,
+        torch_trace=settings.profile_torch,
+    )
+
 app.include_router(health.router, prefix=settings.api_prefix)
 app.include_router(chat.router, prefix=settings.api_prefix)
 app.include_router(history.router, prefix=settings.api_prefix)
+app.include_router(analytics.router, prefix=settings.api_prefix)
+app.include_router(admin.router, prefix=settings.api_prefix)
 
 
 @app.get("/")
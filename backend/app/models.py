@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import uuid
-from datetime import datetime
+from datetime import date, datetime
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from .database import Base
@@ -24,6 +24,9 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    # AUTOINCREMENT: SQLite would otherwise reuse the ids of deleted newest rows,
+    # which the analytics watermark relies on never happening
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id: int = Column(Integer, primary_key=True, index=True, autoincrement=True)
     session_id: str = Column(String(36), ForeignKey("chat_sessions.id"), nullable=False, index=True)
@@ -37,25 +40,33 @@ class ChatMessage(Base):
     session = relationship("ChatSession", back_populates="messages")
 
 
+class PredictionRollup(Base):
+    """Bot answers per UTC day and predicted label, maintained by services.analytics."""
 
+    __tablename__ = "prediction_rollups"
 
+    day: date = Column(Date, primary_key=True)
+    # Empty string instead of NULL so the composite primary key stays unique
+    category: str = Column(String(64), primary_key=True, default="")
+    subcategory: str = Column(String(128), primary_key=True, default="")
+    answer_count: int = Column(Integer, nullable=False, default=0)
+    low_confidence_count: int = Column(Integer, nullable=False, default=0)
+    confidence_sum: float = Column(Float, nullable=False, default=0.0)
 
 
+class ConfidenceRollup(Base):
+    """Histogram of bot answer confidence per UTC day, in buckets of 1 / CONFIDENCE_BUCKETS."""
 
+    __tablename__ = "confidence_rollups"
 
+    day: date = Column(Date, primary_key=True)
+    bucket: int = Column(Integer, primary_key=True)
+    answer_count: int = Column(Integer, nullable=False, default=0)
 
 
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
 
-
-
-
-
-
-
-
-
-
-
-
-
-
+    name: str = Column(String(64), primary_key=True)
+    last_message_id: int = Column(Integer, nullable=False, default=0)
+    updated_at: datetime = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
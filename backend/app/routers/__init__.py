@@ -1,6 +1,6 @@
-from . import chat, health, history
+from . import admin, analytics, chat, health, history
 
-__all__ = ["chat", "health", "history"]
+__all__ = ["admin", "analytics", "chat", "health", "history"]
 
 
 
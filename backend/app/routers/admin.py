@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from ..config import get_settings
+from ..schemas import (
+    BotModelStats,
+    CoalescingStats,
+    CpuTopologyStats,
+    EarlyExitStats,
+    ExitLayerStats,
+    InferenceMetricsResponse,
+    ModelRegistryResponse,
+    ModelReloadRequest,
+    ModelStatusResponse,
+    ProfileDetail,
+    ProfileSummary,
+    RetentionStatusResponse,
+    ShadowDisagreementItem,
+    ShadowStartRequest,
+    ShadowStatusResponse,
+    TokenCacheStats,
+)
+from ..services.model_manager import ModelManager, ReloadStatus, get_model_registry
+from ..services.nlp import NLPService
+from ..services.retention import RetentionScheduler, get_retention_scheduler
+from ..services.shadow import ShadowController, get_shadow_controller
+from ..utils.cpu import active_topology
+from ..utils.profiling import ProfileStore
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    settings = get_settings()
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Yönetici erişimi yapılandırılmamış")
+    if x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=401, detail="Geçersiz yönetici anahtarı")
+
+
+def _status_response(status: ReloadStatus) -> ModelStatusResponse:
+    return ModelStatusResponse(
+        state=status.state,
+        model_dir=str(status.model_dir) if status.model_dir else None,
+        started_at=status.started_at,
+        finished_at=status.finished_at,
+        smoke_accuracy=status.smoke_accuracy,
+        error=status.error,
+    )
+
+
+def _bot_manager(bot_id: Optional[str]) -> ModelManager:
+    try:
+        return get_model_registry().manager(bot_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Bot bulunamadı") from None
+
+
+@router.get("/model", response_model=ModelStatusResponse, dependencies=[Depends(require_admin)])
+def model_status(bot_id: Optional[str] = Query(None, alias="botId")) -> ModelStatusResponse:
+    return _status_response(_bot_manager(bot_id).status)
+
+
+@router.get("/models", response_model=ModelRegistryResponse, dependencies=[Depends(require_admin)])
+def model_registry() -> ModelRegistryResponse:
+    registry = get_model_registry()
+    resident = set(registry.resident())
+    bots = []
+    for bot_id in registry.bot_ids:
+        manager = registry.manager(bot_id)
+        stats = manager.stats
+        bots.append(
+            BotModelStats(
+                bot_id=bot_id,
+                model_dir=str(manager.bot.model_dir),
+                resident=bot_id in resident,
+                loads=stats.loads,
+                evictions=stats.evictions,
+                hits=stats.hits,
+                memory_mb=stats.memory_bytes / 2**20 if stats.loads else None,
+                last_used=stats.last_used,
+                last_load_seconds=stats.last_load_seconds,
+                state=manager.status.state,
+            )
+        )
+    budget = registry.memory_budget_bytes
+    return ModelRegistryResponse(
+        default_bot_id=registry.default_bot_id,
+        max_resident=registry.max_resident,
+        memory_budget_mb=budget / 2**20 if budget is not None else None,
+        resident_memory_mb=sum(bot.memory_mb or 0.0 for bot in bots if bot.resident),
+        bots=bots,
+    )
+
+
+@router.post(
+    "/model/reload",
+    response_model=ModelStatusResponse,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)
+def reload_model(payload: ModelReloadRequest, background_tasks: BackgroundTasks) -> ModelStatusResponse:
+    model_dir = Path(payload.model_dir)
+    if not model_dir.is_dir():
+        raise HTTPException(status_code=400, detail="Model dizini bulunamadı")
+
+    manager = _bot_manager(payload.bot_id)
+    if not manager.begin_reload(model_dir):
+        raise HTTPException(status_code=409, detail="Başka bir model yüklemesi sürüyor")
+
+    vector_store_path = Path(payload.vector_store_path) if payload.vector_store_path else None
+    background_tasks.add_task(get_model_registry().reload, manager.bot.bot_id, model_dir, vector_store_path)
+    return _status_response(manager.status)
+
+
+def _shadow_response(controller: ShadowController) -> ShadowStatusResponse:
+    response = ShadowStatusResponse(
+        state=controller.state,
+        bot_id=controller.bot_id,
+        model_dir=str(controller.model_dir) if controller.model_dir else None,
+        pending_bot_id=controller.pending_bot_id,
+        pending_model_dir=str(controller.pending_model_dir) if controller.pending_model_dir else None,
+        error=controller.error,
+    )
+    evaluator = controller.evaluator
+    if evaluator is None:
+        return response
+    return response.model_copy(
+        update={
+            "started_at": evaluator.started_at,
+            "sample_rate": evaluator.sample_rate,
+            "queue_size": evaluator.queue_size,
+            "queued": evaluator.queued,
+            "counts": dict(evaluator.counts),
+            "disagreements": [
+                ShadowDisagreementItem.model_validate(item) for item in reversed(evaluator.disagreements)
+            ],
+            **evaluator.summary(),
+        }
+    )
+
+
+@router.get("/shadow", response_model=ShadowStatusResponse, dependencies=[Depends(require_admin)])
+def shadow_status() -> ShadowStatusResponse:
+    return _shadow_response(get_shadow_controller())
+
+
+@router.post(
+    "/shadow",
+    response_model=ShadowStatusResponse,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)
+def start_shadow(payload: ShadowStartRequest, background_tasks: BackgroundTasks) -> ShadowStatusResponse:
+    model_dir = Path(payload.model_dir)
+    if not model_dir.is_dir():
+        raise HTTPException(status_code=400, detail="Model dizini bulunamadı")
+    bot_id = _bot_manager(payload.bot_id).bot.bot_id
+
+    controller = get_shadow_controller()
+    if not controller.begin(bot_id, model_dir):
+        raise HTTPException(status_code=409, detail="Başka bir aday model yüklemesi sürüyor")
+
+    vector_store_path = Path(payload.vector_store_path) if payload.vector_store_path else None
+    background_tasks.add_task(controller.start, bot_id, model_dir, vector_store_path, payload.sample_rate)
+    return _shadow_response(controller)
+
+
+@router.delete("/shadow", response_model=ShadowStatusResponse, dependencies=[Depends(require_admin)])
+def stop_shadow() -> ShadowStatusResponse:
+    controller = get_shadow_controller()
+    controller.stop()
+    return _shadow_response(controller)
+
+
+def _early_exit_stats(nlp: NLPService) -> Optional[EarlyExitStats]:
+    if nlp.exit_heads is None:
+        return None
+    counts = nlp.exit_stats.snapshot()
+    total = sum(counts.values())
+    return EarlyExitStats(
+        threshold=nlp.early_exit_threshold,
+        exit_layers=nlp.exit_heads.layers,
+        total_layers=nlp.model.config.num_hidden_layers,
+        mean_exit_layer=sum(layer * count for layer, count in counts.items()) / total if total else None,
+        exits=[ExitLayerStats(layer=layer, count=count, rate=count / total) for layer, count in counts.items()],
+    )
+
+
+@router.get("/metrics", response_model=InferenceMetricsResponse, dependencies=[Depends(require_admin)])
+def inference_metrics(bot_id: Optional[str] = Query(None, alias="botId")) -> InferenceMetricsResponse:
+    # Read-only: loading the model here could evict another bot's live model and skew the LRU order
+    nlp = _bot_manager(bot_id).peek()
+    if nlp is None:
+        raise HTTPException(status_code=404, detail="Botun modeli şu anda yüklü değil")
+    cache = nlp.token_cache_info()
+    topology = active_topology()
+    return InferenceMetricsResponse(
+        coalescing=CoalescingStats(
+            requests=nlp.inflight.requests,
+            executions=nlp.inflight.executions,
+            coalesced=nlp.inflight.coalesced,
+        ),
+        token_cache=TokenCacheStats(
+            hits=cache.hits,
+            misses=cache.misses,
+            size=cache.currsize,
+            max_size=cache.maxsize,
+        ),
+        cpu=CpuTopologyStats.model_validate(topology) if topology else None,
+        early_exit=_early_exit_stats(nlp),
+    )
+
+
+def _retention_response(scheduler: RetentionScheduler) -> RetentionStatusResponse:
+    settings = get_settings()
+    return RetentionStatusResponse(
+        enabled=settings.retention_days is not None,
+        retention_days=settings.retention_days,
+        totals=scheduler.totals,
+        last_run=scheduler.last_stats.to_dict() if scheduler.last_stats else None,
+        last_error=scheduler.last_error,
+    )
+
+
+@router.get("/retention", response_model=RetentionStatusResponse, dependencies=[Depends(require_admin)])
+def retention_status() -> RetentionStatusResponse:
+    return _retention_response(get_retention_scheduler())
+
+
+@router.post(
+    "/retention/run",
+    response_model=RetentionStatusResponse,
+    status_code=202,
+    dependencies=[Depends(require_admin)],
+)
+def run_retention_now(background_tasks: BackgroundTasks) -> RetentionStatusResponse:
+    if get_settings().retention_days is None:
+        raise HTTPException(status_code=400, detail="Saklama süresi (RETENTION_DAYS) tanımlı değil")
+    scheduler = get_retention_scheduler()
+    background_tasks.add_task(_run_retention_quietly, scheduler)
+    return _retention_response(scheduler)
+
+
+def _run_retention_quietly(scheduler: RetentionScheduler) -> None:
+    try:
+        scheduler.run_once()
+    except Exception:  # noqa: BLE001 - recorded as last_error on the scheduler
+        pass
+
+
+def _profile_store() -> ProfileStore:
+    settings = get_settings()
+    return ProfileStore(settings.profile_dir, settings.profile_keep)
+
+
+@router.get("/profiles", response_model=list[ProfileSummary], dependencies=[Depends(require_admin)])
+def list_profiles() -> list[ProfileSummary]:
+    return [ProfileSummary.model_validate(record) for record in _profile_store().list()]
+
+
+@router.get("/profiles/{request_id}", response_model=ProfileDetail, dependencies=[Depends(require_admin)])
+def get_profile(request_id: str) -> ProfileDetail:
+    record = _profile_store().get(request_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profil bulunamadı")
+    return ProfileDetail.model_validate(record)
+
+
+@router.get("/profiles/{request_id}/flamegraph", dependencies=[Depends(require_admin)])
+def profile_flamegraph(request_id: str) -> PlainTextResponse:
+    """Sampled stacks in collapsed format (``frame;frame;frame count``) for flamegraph.pl or speedscope."""
+    path = _profile_store().artifact(request_id, "flamegraph")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profil bulunamadı")
+    return PlainTextResponse(path.read_text(encoding="utf-8"))
+
+
+@router.get("/profiles/{request_id}/pstats", dependencies=[Depends(require_admin)])
+def profile_pstats(request_id: str) -> FileResponse:
+    """Raw cProfile dump, readable with ``pstats``, snakeviz or flameprof."""
+    path = _profile_store().artifact(request_id, "pstats")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profil bulunamadı")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
+@router.get("/profiles/{request_id}/torch", dependencies=[Depends(require_admin)])
+def profile_torch_trace(request_id: str) -> FileResponse:
+    """Torch profiler trace in Chrome trace format (chrome://tracing, Perfetto)."""
+    path = _profile_store().artifact(request_id, "torch")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Bu profil için torch izi yok")
+    return FileResponse(path, media_type="application/json", filename=path.name)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..database import get_db
+from ..schemas import AnalyticsResponse, CategoryAnalytics, ConfidenceBucket, DailyAnalytics
+from ..services.analytics import CONFIDENCE_BUCKETS, refresh_rollups, summarize
+
+LOGGER = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("", response_model=AnalyticsResponse)
+def analytics(
+    start: Optional[date] = Query(None, description="First day (UTC), defaults to `days` before end"),
+    end: Optional[date] = Query(None, description="Last day (UTC), defaults to today"),
+    days: int = Query(30, ge=1, le=366),
+    top: int = Query(20, ge=1, le=200, description="Number of category/subcategory pairs to return"),
+    db: Session = Depends(get_db),
+) -> AnalyticsResponse:
+    settings = get_settings()
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=days - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Başlangıç tarihi bitiş tarihinden sonra olamaz")
+
+    # Fold in what was written since the last request; bounded, so the cost does
+    # not grow with history size. A busy database just means slightly stale numbers.
+    try:
+        refresh_rollups(db, settings.low_confidence_threshold, max_messages=settings.analytics_refresh_batch)
+    except OperationalError:
+        db.rollback()
+        LOGGER.warning("Analytics rollup refresh skipped, database is busy")
+
+    summary = summarize(db, start, end, top_categories=top)
+    total_answers = sum(day.answers for day in summary.daily)
+    total_low = sum(day.low_confidence for day in summary.daily)
+
+    return AnalyticsResponse(
+        start=summary.start,
+        end=summary.end,
+        total_answers=total_answers,
+        low_confidence_rate=total_low / total_answers if total_answers else 0.0,
+        low_confidence_threshold=settings.low_confidence_threshold,
+        daily=[
+            DailyAnalytics(
+                day=day.day,
+                answers=day.answers,
+                low_confidence=day.low_confidence,
+                low_confidence_rate=day.low_confidence / day.answers if day.answers else 0.0,
+                mean_confidence=day.mean_confidence,
+            )
+            for day in summary.daily
+        ],
+        categories=[
+            CategoryAnalytics(
+                category=item.category,
+                subcategory=item.subcategory,
+                answers=item.answers,
+                low_confidence=item.low_confidence,
+                mean_confidence=item.mean_confidence,
+            )
+            for item in summary.categories
+        ],
+        confidence_histogram=[
+            ConfidenceBucket(lower=index / CONFIDENCE_BUCKETS, upper=(index + 1) / CONFIDENCE_BUCKETS, count=count)
+            for index, count in enumerate(summary.histogram)
+        ],
+        watermark=summary.watermark,
+        refreshed_at=summary.refreshed_at,
+    )
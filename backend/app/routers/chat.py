@@ -1,23 +1,47 @@
 from __future__ import annotations
 
+import logging
+import time
+import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import db_session, get_db
 from ..models import ChatMessage, ChatSession
 from ..schemas import ChatRequest, ChatResponse
-from ..services.nlp import NLPService, get_nlp_service
+from ..services.model_manager import get_model_registry
+from ..services.nlp import NLPService
+from ..services.shadow import get_shadow_controller
+from ..utils.profiling import profiled, profiled_iterator
+from ..utils.serialization import FastJSONResponse, dumps, json_keys
+
+LOGGER = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Detail of the ``error`` event, by the stream stage that failed
+_STREAM_ERRORS = {
+    "answer": "Yanıt oluşturulamadı",
+    "related": "Benzer sorular getirilemedi",
+    "save": "Mesajlar kaydedilemedi",
+}
+
+_CHAT_RESPONSE_KEYS = json_keys(
+    ChatResponse,
+    ("session_id", "message", "category", "subcategory", "confidence", "similar_questions", "suggested_links"),
+)
+
 
-def _get_nlp_cached() -> NLPService:
-    if not hasattr(_get_nlp_cached, "_instance"):
-        _get_nlp_cached._instance = get_nlp_service()
-    return _get_nlp_cached._instance  # type: ignore[attr-defined]
+def _get_nlp(bot_id: Optional[str]) -> tuple[str, NLPService]:
+    registry = get_model_registry()
+    if bot_id is not None and bot_id not in registry:
+        raise HTTPException(status_code=404, detail="Bot bulunamadı")
+    # Loads the bot's model on first use and may unload the least recently used one
+    return bot_id or registry.default_bot_id, registry.get(bot_id)
 
 
 def _ensure_session(db: Session, session_id: Optional[str]) -> ChatSession:
@@ -27,32 +51,51 @@ def _ensure_session(db: Session, session_id: Optional[str]) -> ChatSession:
             return chat_session
         raise HTTPException(status_code=404, detail="Session not found")
 
-    chat_session = ChatSession()
+    # Explicit id so messages can reference it without flushing (and locking SQLite) early
+    chat_session = ChatSession(id=str(uuid.uuid4()))
     db.add(chat_session)
-    db.flush()
     return chat_session
 
 
+def _apply_title(chat_session: ChatSession, message: str) -> None:
+    if not chat_session.title and message:
+        snippet = message.strip()[:60]
+        chat_session.title = snippet + ("..." if len(message.strip()) > 60 else "")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+
 @router.post("", response_model=ChatResponse)
+@profiled
 def chat(
     payload: ChatRequest,
     db: Session = Depends(get_db),
-    nlp: NLPService = Depends(_get_nlp_cached),
-) -> ChatResponse:
+) -> FastJSONResponse:
     if not payload.message.strip():
         raise HTTPException(status_code=400, detail="Mesaj boş olamaz")
+    bot_id, nlp = _get_nlp(payload.bot_id)
 
+    received_at = datetime.utcnow()
     chat_session = _ensure_session(db, payload.session_id)
 
+    # Predict before any write: holding the SQLite write lock during inference would
+    # serialize identical concurrent questions before they could be coalesced
+    started = time.perf_counter()
+    answer = nlp.predict(payload.message)
+    # Never blocks: a sampled question is queued for the shadow candidate or dropped
+    get_shadow_controller().offer(
+        bot_id, payload.message, answer.text, answer.category, answer.confidence, time.perf_counter() - started
+    )
+
     user_message = ChatMessage(
         session_id=chat_session.id,
         sender="user",
         text=payload.message.strip(),
+        created_at=received_at,
     )
     db.add(user_message)
-    db.flush()
-
-    answer = nlp.predict(payload.message)
 
     bot_message = ChatMessage(
         session_id=chat_session.id,
@@ -64,21 +107,121 @@ def chat(
     )
     db.add(bot_message)
 
-    if not chat_session.title and payload.message:
-        snippet = payload.message.strip()[:60]
-        chat_session.title = snippet + ("..." if len(payload.message.strip()) > 60 else "")
+    _apply_title(chat_session, payload.message)
 
     chat_session.updated_at = datetime.utcnow()
+    # Read before commit expires the instance; refreshing it would cost another SELECT
+    session_id = chat_session.id
 
     db.commit()
-    db.refresh(chat_session)
 
-    return ChatResponse(
-        session_id=chat_session.id,
-        message=answer.text,
-        category=answer.category,
-        subcategory=answer.subcategory,
-        confidence=answer.confidence,
-        similar_questions=answer.similar_questions,
-        suggested_links=answer.suggested_links,
+    # The answer comes from our own service, so it is encoded as is instead of being
+    # copied into a ChatResponse and validated again by the response model
+    values = (
+        session_id,
+        answer.text,
+        answer.category,
+        answer.subcategory,
+        answer.confidence,
+        answer.similar_questions,
+        answer.suggested_links,
+    )
+    return FastJSONResponse(dict(zip(_CHAT_RESPONSE_KEYS, values)))
+
+
+@router.post("/stream")
+@profiled
+def chat_stream(
+    payload: ChatRequest,
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """Stream the answer as server-sent events and persist the exchange afterwards.
+
+    Events: ``answer`` as soon as the classifier finishes, ``related`` with
+    similar questions and links, then ``done`` once the messages are stored.
+    A failure after the response has started ends the stream with an
+    ``error`` event naming the failed stage instead of closing it silently.
+    """
+    message = payload.message.strip()
+    if not message:
+        raise HTTPException(status_code=400, detail="Mesaj boş olamaz")
+    bot_id, nlp = _get_nlp(payload.bot_id)
+
+    if payload.session_id:
+        exists = db.query(ChatSession.id).filter(ChatSession.id == payload.session_id).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Session not found")
+    session_id = payload.session_id or str(uuid.uuid4())
+    is_new_session = payload.session_id is None
+
+    def events() -> Iterator[str]:
+        stage = "answer"
+        try:
+            started = time.perf_counter()
+            classification = nlp.classify(payload.message)
+            inference_seconds = time.perf_counter() - started
+            metadata, confidence = classification.metadata, classification.confidence
+            yield _sse_event(
+                "answer",
+                {
+                    "sessionId": session_id,
+                    "message": metadata.answer,
+                    "category": metadata.category,
+                    "subcategory": metadata.subcategory,
+                    "confidence": confidence,
+                },
+            )
+
+            stage = "related"
+            started = time.perf_counter()
+            similar_questions, suggested_links = nlp.related(payload.message, classification)
+            inference_seconds += time.perf_counter() - started
+            get_shadow_controller().offer(
+                bot_id, payload.message, metadata.answer, metadata.category, confidence, inference_seconds
+            )
+            yield _sse_event(
+                "related",
+                {"similarQuestions": similar_questions, "suggestedLinks": suggested_links},
+            )
+
+            stage = "save"
+            with db_session() as session:
+                if is_new_session:
+                    chat_session = ChatSession(id=session_id)
+                    session.add(chat_session)
+                else:
+                    chat_session = session.get(ChatSession, session_id)
+                    if chat_session is None:
+                        # Deleted while the answer was being generated; do not bring it back
+                        yield _sse_event(
+                            "error",
+                            {
+                                "sessionId": session_id,
+                                "stage": stage,
+                                "detail": "Oturum silinmiş, mesajlar kaydedilmedi",
+                            },
+                        )
+                        return
+                session.add(ChatMessage(session_id=session_id, sender="user", text=message))
+                session.add(
+                    ChatMessage(
+                        session_id=session_id,
+                        sender="bot",
+                        text=metadata.answer,
+                        category=metadata.category,
+                        subcategory=metadata.subcategory,
+                        confidence=confidence,
+                    )
+                )
+                _apply_title(chat_session, payload.message)
+                chat_session.updated_at = datetime.utcnow()
+            yield _sse_event("done", {"sessionId": session_id})
+        except Exception:  # noqa: BLE001 - the status line is already sent; report the failure in-band
+            LOGGER.exception("Chat stream failed during %s", stage)
+            yield _sse_event("error", {"sessionId": session_id, "stage": stage, "detail": _STREAM_ERRORS[stage]})
+
+    return StreamingResponse(
+        profiled_iterator(events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
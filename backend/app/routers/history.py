@@ -1,18 +1,90 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy import desc, func
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
+from ..config import get_settings
 from ..database import get_db
 from ..models import ChatMessage, ChatSession
-from ..schemas import ChatMessageSchema, ChatSessionSchema, SessionHistoryResponse, SessionListItem
+from ..schemas import (
+    ChatMessageSchema,
+    ChatSessionSchema,
+    MessageSearchHit,
+    MessageSearchResponse,
+    SessionHistoryResponse,
+    SessionListItem,
+)
+from ..services.search import search_messages
+from ..utils.serialization import FastJSONResponse, json_keys
 
 router = APIRouter(prefix="/chat/history", tags=["history"])
 
+# History responses are encoded straight from row tuples; each column list is
+# paired with the JSON keys its schema gives those fields
+_SESSION_LIST_KEYS = json_keys(SessionListItem, ("id", "title", "last_updated", "message_count"))
+_SESSION_FIELDS = ("id", "title", "created_at", "updated_at")
+_SESSION_KEYS = json_keys(ChatSessionSchema, _SESSION_FIELDS)
+_MESSAGE_FIELDS = ("id", "sender", "text", "category", "subcategory", "confidence", "created_at")
+_MESSAGE_COLUMNS = tuple(getattr(ChatMessage, name) for name in _MESSAGE_FIELDS)
+_MESSAGE_KEYS = json_keys(ChatMessageSchema, _MESSAGE_FIELDS)
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # HTTP dates have second precision
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def _conditional_headers(etag: str, last_modified: Optional[datetime]) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def _history_version(db: Session) -> tuple[str, Optional[datetime]]:
+    """Global version of the session list, read from chat_sessions only.
+
+    Every write that changes the list (new message, new or deleted session)
+    changes either the session count or the newest updated_at.
+    """
+    count, last_updated = db.query(func.count(ChatSession.id), func.max(ChatSession.updated_at)).one()
+    stamp = last_updated.timestamp() if last_updated else 0
+    return f'W/"history-{count}-{stamp}"', last_updated
+
 
 @router.get("", response_model=list[SessionListItem])
-def list_histories(db: Session = Depends(get_db)) -> list[SessionListItem]:
+def list_histories(request: Request, db: Session = Depends(get_db)):
+    etag, last_modified = _history_version(db)
+    headers = _conditional_headers(etag, last_modified)
+    if _is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
     sessions = (
         db.query(
             ChatSession.id,
@@ -26,34 +98,63 @@ def list_histories(db: Session = Depends(get_db)) -> list[SessionListItem]:
         .all()
     )
 
-    return [
-        SessionListItem(
-            id=row.id,
-            title=row.title,
-            last_updated=row.last_updated,
-            message_count=row.message_count,
+    return FastJSONResponse([dict(zip(_SESSION_LIST_KEYS, row)) for row in sessions], headers=headers)
+
+
+@router.get("/search", response_model=MessageSearchResponse)
+def search_history(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for in message text"),
+    sender: Optional[Literal["user", "bot"]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+) -> MessageSearchResponse:
+    try:
+        total, hits = search_messages(
+            db,
+            q,
+            limit=limit,
+            offset=offset,
+            sender=sender,
+            candidate_limit=get_settings().search_candidate_limit,
         )
-        for row in sessions
-    ]
+    except OperationalError as exc:
+        raise HTTPException(status_code=503, detail="Sohbet araması şu anda kullanılamıyor") from exc
+
+    return MessageSearchResponse(
+        query=q,
+        total=total,
+        limit=limit,
+        offset=offset,
+        results=[MessageSearchHit.model_validate(hit) for hit in hits],
+    )
 
 
 @router.get("/{session_id}", response_model=SessionHistoryResponse)
-def get_history(session_id: str, db: Session = Depends(get_db)) -> SessionHistoryResponse:
+def get_history(session_id: str, request: Request, db: Session = Depends(get_db)):
     session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Sohbet bulunamadı")
 
+    etag = f'W/"{session.id}-{session.updated_at.timestamp()}"'
+    headers = _conditional_headers(etag, session.updated_at)
+    if _is_not_modified(request, etag, session.updated_at):
+        return Response(status_code=304, headers=headers)
+
     messages = (
-        db.query(ChatMessage)
+        db.query(*_MESSAGE_COLUMNS)
         .filter(ChatMessage.session_id == session_id)
         .order_by(ChatMessage.created_at.asc())
         .limit(200)
         .all()
     )
 
-    return SessionHistoryResponse(
-        session=ChatSessionSchema.model_validate(session),
-        messages=[ChatMessageSchema.model_validate(m) for m in messages],
+    return FastJSONResponse(
+        {
+            "session": dict(zip(_SESSION_KEYS, (getattr(session, name) for name in _SESSION_FIELDS))),
+            "messages": [dict(zip(_MESSAGE_KEYS, row)) for row in messages],
+        },
+        headers=headers,
     )
 
 
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Literal, Optional
+from datetime import date, datetime
+from typing import Any, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -9,6 +9,7 @@ from pydantic import BaseModel, Field
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, description="User query text")
     session_id: Optional[str] = Field(None, alias="sessionId", description="Existing chat session identifier")
+    bot_id: Optional[str] = Field(None, alias="botId", description="Bot that answers; the default bot when omitted")
 
     model_config = {"populate_by_name": True}
 
@@ -71,6 +72,247 @@ class SessionListItem(BaseModel):
     model_config = {"populate_by_name": True}
 
 
+class MessageSearchHit(BaseModel):
+    message_id: int = Field(alias="messageId")
+    session_id: str = Field(alias="sessionId")
+    session_title: Optional[str] = Field(None, alias="sessionTitle")
+    sender: Literal["user", "bot"]
+    snippet: str = Field(..., description="Matching excerpt with hits wrapped in **")
+    score: float = Field(..., description="BM25 relevance, higher is better")
+    created_at: datetime = Field(alias="createdAt")
+
+    model_config = {"from_attributes": True, "populate_by_name": True}
+
+
+class MessageSearchResponse(BaseModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: list[MessageSearchHit]
+
+
+class ModelReloadRequest(BaseModel):
+    model_dir: str = Field(..., alias="modelDir", description="Directory with the new model artifacts")
+    vector_store_path: Optional[str] = Field(None, alias="vectorStorePath")
+    bot_id: Optional[str] = Field(None, alias="botId", description="Bot to reload; the default bot when omitted")
+
+    model_config = {"populate_by_name": True, "protected_namespaces": ()}
+
+
+class ModelStatusResponse(BaseModel):
+    state: Literal["idle", "loading", "ready", "failed"]
+    model_dir: Optional[str] = Field(None, alias="modelDir")
+    started_at: Optional[datetime] = Field(None, alias="startedAt")
+    finished_at: Optional[datetime] = Field(None, alias="finishedAt")
+    smoke_accuracy: Optional[float] = Field(None, alias="smokeAccuracy")
+    error: Optional[str] = None
+
+    model_config = {"populate_by_name": True, "protected_namespaces": ()}
+
+
+class BotModelStats(BaseModel):
+    bot_id: str = Field(alias="botId")
+    model_dir: str = Field(alias="modelDir")
+    resident: bool
+    loads: int
+    evictions: int
+    hits: int
+    memory_mb: Optional[float] = Field(None, alias="memoryMb")
+    last_used: Optional[datetime] = Field(None, alias="lastUsed")
+    last_load_seconds: Optional[float] = Field(None, alias="lastLoadSeconds")
+    state: Literal["idle", "loading", "ready", "failed"]
+
+    model_config = {"populate_by_name": True, "protected_namespaces": ()}
+
+
+class ModelRegistryResponse(BaseModel):
+    default_bot_id: str = Field(alias="defaultBotId")
+    max_resident: int = Field(alias="maxResident")
+    memory_budget_mb: Optional[float] = Field(None, alias="memoryBudgetMb")
+    resident_memory_mb: float = Field(alias="residentMemoryMb")
+    bots: list[BotModelStats]
+
+    model_config = {"populate_by_name": True}
+
+
+class ShadowStartRequest(BaseModel):
+    model_dir: str = Field(..., alias="modelDir", description="Directory with the candidate model artifacts")
+    vector_store_path: Optional[str] = Field(None, alias="vectorStorePath")
+    bot_id: Optional[str] = Field(None, alias="botId", description="Bot whose traffic is shadowed (default bot)")
+    sample_rate: Optional[float] = Field(None, alias="sampleRate", ge=0.0, le=1.0)
+
+    model_config = {"populate_by_name": True, "protected_namespaces": ()}
+
+
+class ShadowDisagreementItem(BaseModel):
+    question: str
+    primary_category: Optional[str] = Field(None, alias="primaryCategory")
+    candidate_category: Optional[str] = Field(None, alias="candidateCategory")
+    primary_confidence: Optional[float] = Field(None, alias="primaryConfidence")
+    candidate_confidence: Optional[float] = Field(None, alias="candidateConfidence")
+    at: datetime
+
+    model_config = {"populate_by_name": True, "from_attributes": True}
+
+
+class ShadowStatusResponse(BaseModel):
+    state: Literal["idle", "loading", "running", "failed"]
+    bot_id: Optional[str] = Field(None, alias="botId")
+    model_dir: Optional[str] = Field(None, alias="modelDir")
+    # Candidate being loaded to replace the running one
+    pending_bot_id: Optional[str] = Field(None, alias="pendingBotId")
+    pending_model_dir: Optional[str] = Field(None, alias="pendingModelDir")
+    error: Optional[str] = None
+    started_at: Optional[datetime] = Field(None, alias="startedAt")
+    sample_rate: Optional[float] = Field(None, alias="sampleRate")
+    queue_size: Optional[int] = Field(None, alias="queueSize")
+    queued: int = 0
+    counts: dict[str, int] = Field(default_factory=dict)
+    agreement_rate: Optional[float] = Field(None, alias="agreementRate")
+    mean_confidence_delta: Optional[float] = Field(None, alias="meanConfidenceDelta")
+    mean_abs_confidence_delta: Optional[float] = Field(None, alias="meanAbsConfidenceDelta")
+    primary_p50_ms: Optional[float] = Field(None, alias="primaryP50Ms")
+    primary_p95_ms: Optional[float] = Field(None, alias="primaryP95Ms")
+    candidate_p50_ms: Optional[float] = Field(None, alias="candidateP50Ms")
+    candidate_p95_ms: Optional[float] = Field(None, alias="candidateP95Ms")
+    disagreements: list[ShadowDisagreementItem] = Field(default_factory=list)
+
+    model_config = {"populate_by_name": True, "protected_namespaces": ()}
+
+
+class CoalescingStats(BaseModel):
+    requests: int
+    executions: int
+    coalesced: int
+
+
+class TokenCacheStats(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    max_size: Optional[int] = Field(None, alias="maxSize")
+
+    model_config = {"populate_by_name": True}
+
+
+class CpuTopologyStats(BaseModel):
+    cpus: int
+    workers: int
+    intra_op_threads: int = Field(alias="intraOpThreads")
+    inter_op_threads: int = Field(alias="interOpThreads")
+    tokenizer_threads: int = Field(alias="tokenizerThreads")
+    max_concurrent_inference: int = Field(alias="maxConcurrentInference")
+    worker_slot: Optional[int] = Field(None, alias="workerSlot")
+    pinned_cores: list[int] = Field(default_factory=list, alias="pinnedCores")
+
+    model_config = {"from_attributes": True, "populate_by_name": True}
+
+
+class ExitLayerStats(BaseModel):
+    layer: int
+    count: int
+    rate: float
+
+
+class EarlyExitStats(BaseModel):
+    threshold: float
+    exit_layers: list[int] = Field(alias="exitLayers", description="Layers with an exit head; the last layer always exits")
+    total_layers: int = Field(alias="totalLayers")
+    mean_exit_layer: Optional[float] = Field(None, alias="meanExitLayer")
+    exits: list[ExitLayerStats]
+
+    model_config = {"populate_by_name": True}
+
+
+class InferenceMetricsResponse(BaseModel):
+    coalescing: CoalescingStats
+    token_cache: TokenCacheStats = Field(alias="tokenCache")
+    cpu: Optional[CpuTopologyStats] = None
+    early_exit: Optional[EarlyExitStats] = Field(None, alias="earlyExit")
+
+    model_config = {"populate_by_name": True}
+
+
+class ProfileFunctionStats(BaseModel):
+    function: str
+    calls: int
+    total_ms: float = Field(alias="totalMs")
+    cumulative_ms: float = Field(alias="cumulativeMs")
+
+    model_config = {"populate_by_name": True}
+
+
+class ProfileSummary(BaseModel):
+    request_id: str = Field(alias="requestId")
+    method: str
+    path: str
+    trigger: Literal["header", "sample"]
+    status_code: Optional[int] = Field(None, alias="statusCode")
+    started_at: datetime = Field(alias="startedAt")
+    duration_ms: float = Field(alias="durationMs")
+    samples: int = Field(..., description="Stack samples in the flamegraph")
+    has_torch_trace: bool = Field(alias="hasTorchTrace")
+
+    model_config = {"populate_by_name": True}
+
+
+class ProfileDetail(ProfileSummary):
+    sample_interval_ms: float = Field(alias="sampleIntervalMs")
+    top_functions: list[ProfileFunctionStats] = Field(default_factory=list, alias="topFunctions")
+
+
+class RetentionStatusResponse(BaseModel):
+    enabled: bool
+    retention_days: Optional[int] = Field(None, alias="retentionDays")
+    totals: dict[str, int]
+    last_run: Optional[dict[str, Any]] = Field(None, alias="lastRun")
+    last_error: Optional[str] = Field(None, alias="lastError")
+
+    model_config = {"populate_by_name": True}
+
+
+class DailyAnalytics(BaseModel):
+    day: date
+    answers: int
+    low_confidence: int = Field(alias="lowConfidence")
+    low_confidence_rate: float = Field(alias="lowConfidenceRate")
+    mean_confidence: Optional[float] = Field(None, alias="meanConfidence")
+
+    model_config = {"populate_by_name": True}
+
+
+class CategoryAnalytics(BaseModel):
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    answers: int
+    low_confidence: int = Field(alias="lowConfidence")
+    mean_confidence: Optional[float] = Field(None, alias="meanConfidence")
+
+    model_config = {"populate_by_name": True}
+
+
+class ConfidenceBucket(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+
+class AnalyticsResponse(BaseModel):
+    start: date
+    end: date
+    total_answers: int = Field(alias="totalAnswers")
+    low_confidence_rate: float = Field(alias="lowConfidenceRate")
+    low_confidence_threshold: float = Field(alias="lowConfidenceThreshold")
+    daily: list[DailyAnalytics]
+    categories: list[CategoryAnalytics]
+    confidence_histogram: list[ConfidenceBucket] = Field(alias="confidenceHistogram")
+    watermark: int = Field(..., description="Id of the last chat message included in the rollups")
+    refreshed_at: Optional[datetime] = Field(None, alias="refreshedAt")
+
+    model_config = {"populate_by_name": True}
+
+
 class HealthResponse(BaseModel):
     status: Literal["ok"] = "ok"
     version: str
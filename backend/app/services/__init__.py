@@ -1,8 +1,16 @@
+from .embedding_index import load_embedding_index, EmbeddingIndex
+from .model_manager import get_model_manager, get_model_registry, ModelManager, ModelRegistry
 from .nlp import get_nlp_service, NLPService
 from .preprocessing import normalize_text, tokenize
 from .vector_store import load_vector_store, VectorStore
 
 __all__ = [
+    "load_embedding_index",
+    "EmbeddingIndex",
+    "get_model_manager",
+    "get_model_registry",
+    "ModelManager",
+    "ModelRegistry",
     "get_nlp_service",
     "NLPService",
     "normalize_text",
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import case, cast, func, Integer, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from ..models import ChatMessage, ConfidenceRollup, PredictionRollup, RollupWatermark
+
+LOGGER = logging.getLogger(__name__)
+
+ROLLUP_NAME = "predictions"
+CONFIDENCE_BUCKETS = 10
+
+# Serializes refreshes inside one process; the conditional watermark update
+# below is what keeps separate processes from counting the same rows twice.
+_refresh_lock = threading.Lock()
+
+
+@dataclass
+class RefreshResult:
+    processed: int
+    watermark: int
+    caught_up: bool
+
+
+@dataclass
+class DailyStats:
+    day: date
+    answers: int
+    low_confidence: int
+    mean_confidence: Optional[float]
+
+
+@dataclass
+class CategoryStats:
+    category: Optional[str]
+    subcategory: Optional[str]
+    answers: int
+    low_confidence: int
+    mean_confidence: Optional[float]
+
+
+@dataclass
+class AnalyticsSummary:
+    start: date
+    end: date
+    watermark: int
+    refreshed_at: Optional[datetime]
+    daily: List[DailyStats]
+    categories: List[CategoryStats]
+    histogram: List[int]
+
+
+def ensure_monotonic_message_ids(engine: Engine) -> bool:
+    """Rebuild a chat_messages table created without AUTOINCREMENT; returns True if it was migrated.
+
+    Without AUTOINCREMENT SQLite hands out max(id) + 1, so deleting the newest
+    session lets new messages reuse ids at or below the rollup watermark and
+    the refresh skips them. Rows keep their ids, so the full-text index stays
+    valid; its triggers are dropped with the old table and recreated by
+    ``ensure_search_index``. The sequence starts above the watermark so ids
+    that were already reused cannot be handed out again either.
+    """
+    table = ChatMessage.__table__
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        ddl = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+        ).scalar()
+        if ddl is None or "AUTOINCREMENT" in ddl.upper():
+            return False
+
+        columns = ", ".join(column.name for column in table.columns)
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            connection.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {table.name}_old")
+            for index in table.indexes:
+                connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+            connection.execute(CreateTable(table))
+            for index in table.indexes:
+                connection.execute(CreateIndex(index))
+            connection.exec_driver_sql(
+                f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {table.name}_old"
+            )
+            connection.exec_driver_sql(f"DROP TABLE {table.name}_old")
+            connection.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+            connection.exec_driver_sql(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES (?, max("
+                f"(SELECT coalesce(max(id), 0) FROM {table.name}), "
+                f"(SELECT coalesce(max(last_message_id), 0) FROM {RollupWatermark.__tablename__})))",
+                (table.name,),
+            )
+            connection.exec_driver_sql("COMMIT")
+        except Exception:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+    LOGGER.info("Rebuilt %s with AUTOINCREMENT ids", table.name)
+    return True
+
+
+def _bucket_expression():
+    scaled = cast(ChatMessage.confidence * CONFIDENCE_BUCKETS, Integer)
+    return case((ChatMessage.confidence >= 1, CONFIDENCE_BUCKETS - 1), else_=scaled)
+
+
+def _upsert_increment(db: Session, model, rows: List[dict], counters: List[str], chunk_size: int = 1000) -> None:
+    """Insert rollup rows, adding ``counters`` onto rows that already exist."""
+    keys = [column.name for column in model.__table__.primary_key.columns]
+    # Chunked to stay under SQLite's bound-parameter limit
+    for begin in range(0, len(rows), chunk_size):
+        statement = insert(model).values(rows[begin : begin + chunk_size])
+        statement = statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in counters},
+        )
+        db.execute(statement)
+
+
+def refresh_rollups(db: Session, low_confidence_threshold: float, max_messages: int = 50_000) -> RefreshResult:
+    """Fold messages written since the watermark into the rollup tables.
+
+    Work per call is bounded by ``max_messages`` regardless of history size.
+    chat_messages uses AUTOINCREMENT (see ``ensure_monotonic_message_ids``), so
+    ids are never reused after a delete; with SQLite's single writer every
+    message below the watermark is already committed and nothing is counted twice.
+    Rows removed later (retention, deleted sessions) stay in the rollups.
+    """
+    with _refresh_lock:
+        mark = db.get(RollupWatermark, ROLLUP_NAME)
+        start_id = mark.last_message_id if mark else 0
+
+        window = (
+            db.query(ChatMessage.id)
+            .filter(ChatMessage.id > start_id)
+            .order_by(ChatMessage.id.asc())
+            .limit(max_messages)
+            .subquery()
+        )
+        end_id, scanned = db.query(func.max(window.c.id), func.count(window.c.id)).one()
+        if end_id is None:
+            db.rollback()
+            return RefreshResult(processed=0, watermark=start_id, caught_up=True)
+
+        # Claim the range first: this takes SQLite's write lock, and a concurrent
+        # refresh that read the same watermark matches no row and backs off.
+        if mark is None:
+            # Two first refreshes may both get here; the second insert is a no-op
+            db.execute(
+                insert(RollupWatermark)
+                .values(name=ROLLUP_NAME, last_message_id=0, updated_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+        claimed = db.execute(
+            update(RollupWatermark)
+            .where(RollupWatermark.name == ROLLUP_NAME, RollupWatermark.last_message_id == start_id)
+            .values(last_message_id=end_id, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return RefreshResult(processed=0, watermark=start_id, caught_up=False)
+
+        in_range = (
+            ChatMessage.id > start_id,
+            ChatMessage.id <= end_id,
+            ChatMessage.sender == "bot",
+        )
+        day = func.date(ChatMessage.created_at)
+        is_low = case((ChatMessage.confidence < low_confidence_threshold, 1), else_=0)
+        category = func.coalesce(ChatMessage.category, "")
+        subcategory = func.coalesce(ChatMessage.subcategory, "")
+
+        label_rows = (
+            db.query(
+                day,
+                category,
+                subcategory,
+                func.count(ChatMessage.id),
+                func.sum(is_low),
+                func.sum(func.coalesce(ChatMessage.confidence, 0.0)),
+            )
+            .filter(*in_range)
+            .group_by(day, category, subcategory)
+            .all()
+        )
+        _upsert_increment(
+            db,
+            PredictionRollup,
+            [
+                {
+                    "day": date.fromisoformat(row_day),
+                    "category": row_category,
+                    "subcategory": row_subcategory,
+                    "answer_count": count,
+                    "low_confidence_count": low or 0,
+                    "confidence_sum": total or 0.0,
+                }
+                for row_day, row_category, row_subcategory, count, low, total in label_rows
+            ],
+            ["answer_count", "low_confidence_count", "confidence_sum"],
+        )
+
+        bucket = _bucket_expression()
+        bucket_rows = (
+            db.query(day, bucket, func.count(ChatMessage.id))
+            .filter(*in_range, ChatMessage.confidence.isnot(None))
+            .group_by(day, bucket)
+            .all()
+        )
+        _upsert_increment(
+            db,
+            ConfidenceRollup,
+            [
+                {"day": date.fromisoformat(row_day), "bucket": max(0, int(row_bucket)), "answer_count": count}
+                for row_day, row_bucket, count in bucket_rows
+            ],
+            ["answer_count"],
+        )
+
+        db.commit()
+        LOGGER.debug("Rolled up messages %s-%s", start_id + 1, end_id)
+        return RefreshResult(processed=scanned, watermark=end_id, caught_up=scanned < max_messages)
+
+
+def rebuild_rollups(db: Session, low_confidence_threshold: float, batch_size: int = 50_000) -> int:
+    """Drop all rollups and recompute them from the messages still in the database."""
+    db.query(PredictionRollup).delete()
+    db.query(ConfidenceRollup).delete()
+    db.query(RollupWatermark).filter(RollupWatermark.name == ROLLUP_NAME).delete()
+    db.commit()
+
+    processed = 0
+    while True:
+        result = refresh_rollups(db, low_confidence_threshold, max_messages=batch_size)
+        processed += result.processed
+        if result.caught_up:
+            return processed
+
+
+def summarize(db: Session, start: date, end: date, top_categories: int = 20) -> AnalyticsSummary:
+    """Read dashboard figures for ``start``..``end`` (inclusive) from the rollup tables only."""
+    in_range = (PredictionRollup.day >= start, PredictionRollup.day <= end)
+
+    daily = [
+        DailyStats(
+            day=row_day,
+            answers=answers,
+            low_confidence=low,
+            mean_confidence=total / answers if answers else None,
+        )
+        for row_day, answers, low, total in (
+            db.query(
+                PredictionRollup.day,
+                func.sum(PredictionRollup.answer_count),
+                func.sum(PredictionRollup.low_confidence_count),
+                func.sum(PredictionRollup.confidence_sum),
+            )
+            .filter(*in_range)
+            .group_by(PredictionRollup.day)
+            .order_by(PredictionRollup.day.asc())
+            .all()
+        )
+    ]
+
+    answers_total = func.sum(PredictionRollup.answer_count)
+    categories = [
+        CategoryStats(
+            category=category or None,
+            subcategory=subcategory or None,
+            answers=answers,
+            low_confidence=low,
+            mean_confidence=total / answers if answers else None,
+        )
+        for category, subcategory, answers, low, total in (
+            db.query(
+                PredictionRollup.category,
+                PredictionRollup.subcategory,
+                answers_total,
+                func.sum(PredictionRollup.low_confidence_count),
+                func.sum(PredictionRollup.confidence_sum),
+            )
+            .filter(*in_range)
+            .group_by(PredictionRollup.category, PredictionRollup.subcategory)
+            .order_by(answers_total.desc())
+            .limit(top_categories)
+            .all()
+        )
+    ]
+
+    histogram = [0] * CONFIDENCE_BUCKETS
+    for row_bucket, count in (
+        db.query(ConfidenceRollup.bucket, func.sum(ConfidenceRollup.answer_count))
+        .filter(ConfidenceRollup.day >= start, ConfidenceRollup.day <= end)
+        .group_by(ConfidenceRollup.bucket)
+        .all()
+    ):
+        histogram[min(row_bucket, CONFIDENCE_BUCKETS - 1)] += count
+
+    mark = db.get(RollupWatermark, ROLLUP_NAME)
+    return AnalyticsSummary(
+        start=start,
+        end=end,
+        watermark=mark.last_message_id if mark else 0,
+        refreshed_at=mark.updated_at if mark else None,
+        daily=daily,
+        categories=categories,
+        histogram=histogram,
+    )
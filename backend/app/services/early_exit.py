@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import torch
+from torch import nn
+
+EXIT_HEADS_FILE = "early_exit_heads.pt"
+EXIT_CONFIG_FILE = "early_exit.json"
+
+
+def masked_mean(hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+    """Average token states over the attention mask (no normalization, stays a tensor)."""
+    mask = attention_mask.unsqueeze(-1).to(hidden_state.dtype)
+    return (hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0)
+
+
+class ExitHeads(nn.Module):
+    """Linear classifiers on the mean-pooled output of selected encoder layers.
+
+    Layer numbers are 1-based, matching ``hidden_states[layer]`` of a Hugging
+    Face encoder. The model's own classifier stays the exit after the last layer.
+    """
+
+    def __init__(self, layers: Sequence[int], hidden_size: int, num_labels: int):
+        super().__init__()
+        self.layers = sorted(int(layer) for layer in layers)
+        self.hidden_size = hidden_size
+        self.num_labels = num_labels
+        self.heads = nn.ModuleDict({str(layer): nn.Linear(hidden_size, num_labels) for layer in self.layers})
+
+    def forward(self, layer: int, pooled: torch.Tensor) -> torch.Tensor:
+        return self.heads[str(layer)](pooled)
+
+    def save(self, output_dir: Path, metrics: Optional[Dict[str, float]] = None) -> None:
+        torch.save(self.state_dict(), output_dir / EXIT_HEADS_FILE)
+        config = {
+            "layers": self.layers,
+            "hidden_size": self.hidden_size,
+            "num_labels": self.num_labels,
+            "pooling": "mean",
+            "metrics": metrics or {},
+        }
+        with (output_dir / EXIT_CONFIG_FILE).open("w", encoding="utf-8") as fp:
+            json.dump(config, fp, indent=2)
+
+
+def load_exit_heads(model_dir: Path) -> Optional[ExitHeads]:
+    config_path = model_dir / EXIT_CONFIG_FILE
+    weights_path = model_dir / EXIT_HEADS_FILE
+    if not config_path.exists() or not weights_path.exists():
+        return None
+    with config_path.open("r", encoding="utf-8") as fp:
+        config = json.load(fp)
+    heads = ExitHeads(config["layers"], config["hidden_size"], config["num_labels"])
+    heads.load_state_dict(torch.load(weights_path, map_location="cpu", weights_only=True))
+    return heads.eval()
+
+
+def check_supported(model: nn.Module) -> None:
+    """Early exit walks the encoder layer by layer; only BERT-style classifiers expose the parts."""
+    base = model.base_model
+    parts = ((base, "embeddings"), (base, "encoder"), (base, "pooler"), (model, "dropout"), (model, "classifier"))
+    for owner, name in parts:
+        if getattr(owner, name, None) is None:
+            raise ValueError(f"Early exit needs a BERT-style classifier; model has no {name}")
+
+
+class ExitStats:
+    """Thread-safe count of how many queries left the encoder at each layer."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Counter[int] = Counter()
+
+    def record(self, exit_layers: Sequence[int]) -> None:
+        with self._lock:
+            self._counts.update(exit_layers)
+
+    def snapshot(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(sorted(self._counts.items()))
+
+
+@dataclass
+class EarlyExitOutput:
+    probabilities: torch.Tensor
+    exit_layers: List[int]
+    # Rows that ran every layer, with their last hidden state for the dense index
+    full_rows: torch.Tensor
+    last_hidden: Optional[torch.Tensor]
+    full_attention_mask: Optional[torch.Tensor]
+
+
+def early_exit_forward(
+    model: nn.Module,
+    heads: ExitHeads,
+    encoded: dict[str, torch.Tensor],
+    threshold: float,
+) -> EarlyExitOutput:
+    """Run the encoder one layer at a time and stop rows whose exit head is confident enough.
+
+    Rows that exit are dropped from the batch, so later layers only process
+    the questions that are still undecided.
+    """
+    base = model.base_model
+    layers = base.encoder.layer
+    input_ids = encoded["input_ids"]
+    attention_mask = encoded["attention_mask"]
+    batch_size = input_ids.shape[0]
+
+    hidden = base.embeddings(input_ids=input_ids, token_type_ids=encoded.get("token_type_ids"))
+    extended_mask = base.get_extended_attention_mask(attention_mask, input_ids.shape)
+
+    probabilities = torch.empty(batch_size, model.config.num_labels, device=input_ids.device)
+    exit_layers = [len(layers)] * batch_size
+    active = torch.arange(batch_size, device=input_ids.device)
+
+    for depth, layer in enumerate(layers, start=1):
+        hidden = layer(hidden, attention_mask=extended_mask)[0]
+        if depth == len(layers) or depth not in heads.layers:
+            continue
+        head_probabilities = torch.softmax(heads(depth, masked_mean(hidden, attention_mask)), dim=-1)
+        done = head_probabilities.max(dim=-1).values >= threshold
+        if not bool(done.any()):
+            continue
+        finished = active[done]
+        probabilities[finished] = head_probabilities[done]
+        for row in finished.tolist():
+            exit_layers[row] = depth
+        keep = ~done
+        active, hidden = active[keep], hidden[keep]
+        attention_mask, extended_mask = attention_mask[keep], extended_mask[keep]
+        if active.numel() == 0:
+            return EarlyExitOutput(probabilities, exit_layers, active, None, None)
+
+    logits = model.classifier(model.dropout(base.pooler(hidden)))
+    probabilities[active] = torch.softmax(logits, dim=-1)
+    return EarlyExitOutput(probabilities, exit_layers, active, hidden, attention_mask)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+import torch
+
+from .vector_store import SimilarQuestion
+
+# Rows scored per step so float16 rows are upcast in bounded blocks instead of all at once
+_SCORE_BLOCK_SIZE = 4096
+
+
+def mean_pool(hidden_state: torch.Tensor, attention_mask: torch.Tensor) -> np.ndarray:
+    """Average token states over the attention mask and L2-normalize each row."""
+    mask = attention_mask.unsqueeze(-1).to(hidden_state.dtype)
+    summed = (hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1.0)
+    pooled = torch.nn.functional.normalize(summed / counts, p=2, dim=-1)
+    return pooled.float().cpu().numpy()
+
+
+class EmbeddingIndex:
+    """Dense retrieval over pooled encoder embeddings of the training questions.
+
+    Embeddings live in a float16 ``.npy`` file next to the joblib metadata and are
+    memory-mapped on load. When the index was built with coarse clusters, rows are
+    stored grouped by cluster and ``offsets`` marks each cluster's slice, so a
+    query only scores the ``n_probe`` closest clusters.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        metadata: List[Dict[str, Any]],
+        centroids: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        n_probe: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.metadata = metadata
+        self.centroids = centroids
+        self.offsets = offsets
+        self.n_probe = n_probe
+
+    @classmethod
+    def load(cls, path: Path | str, n_probe: int = 4) -> Optional["EmbeddingIndex"]:
+        file_path = Path(path)
+        matrix_path = file_path.with_suffix(".npy")
+        if not file_path.exists() or not matrix_path.exists():
+            return None
+        payload = joblib.load(file_path)
+        return cls(
+            embeddings=np.load(matrix_path, mmap_mode="r"),
+            metadata=payload["metadata"],
+            centroids=payload.get("centroids"),
+            offsets=payload.get("offsets"),
+            n_probe=n_probe,
+        )
+
+    def save(self, path: Path | str) -> None:
+        file_path = Path(path)
+        np.save(file_path.with_suffix(".npy"), np.asarray(self.embeddings, dtype=np.float16))
+        joblib.dump(
+            {"metadata": self.metadata, "centroids": self.centroids, "offsets": self.offsets},
+            file_path,
+        )
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray:
+        if self.centroids is None or self.offsets is None:
+            return np.arange(len(self.embeddings))
+        centroid_scores = self.centroids @ query
+        probes = np.argsort(centroid_scores)[::-1][: self.n_probe]
+        return np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes])
+
+    def search(self, query: np.ndarray, top_k: int = 5, score_threshold: float = 0.5) -> List[SimilarQuestion]:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        rows = self._candidate_rows(query)
+        if rows.size == 0:
+            return []
+
+        scores = np.empty(rows.size, dtype=np.float32)
+        for start in range(0, rows.size, _SCORE_BLOCK_SIZE):
+            block = rows[start : start + _SCORE_BLOCK_SIZE]
+            if block[-1] - block[0] + 1 == block.size:
+                # Contiguous rows: slice the memmap instead of fancy-indexing it
+                matrix = self.embeddings[block[0] : block[-1] + 1]
+            else:
+                matrix = self.embeddings[block]
+            scores[start : start + block.size] = np.asarray(matrix, dtype=np.float32) @ query
+
+        k = min(top_k, scores.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        results: List[SimilarQuestion] = []
+        for position in best:
+            score = float(scores[position])
+            if score < score_threshold:
+                continue
+            item = self.metadata[int(rows[position])]
+            results.append(
+                SimilarQuestion(
+                    question=item.get("question", ""),
+                    answer=item.get("answer", ""),
+                    category=item.get("category"),
+                    subcategory=item.get("subcategory"),
+                    score=score,
+                    tags=item.get("tags", []),
+                    suggested_links=item.get("suggested_links", []),
+                )
+            )
+        return results
+
+
+def build_embedding_index(
+    embeddings: np.ndarray,
+    metadata: List[Dict[str, Any]],
+    num_clusters: int = 0,
+    seed: int = 42,
+) -> EmbeddingIndex:
+    """Create an index from normalized embeddings, optionally partitioned with k-means."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if num_clusters <= 1 or len(embeddings) <= num_clusters:
+        return EmbeddingIndex(embeddings.astype(np.float16), metadata)
+
+    from sklearn.cluster import MiniBatchKMeans
+
+    kmeans = MiniBatchKMeans(n_clusters=num_clusters, random_state=seed, n_init=3)
+    assignments = kmeans.fit_predict(embeddings)
+    order = np.argsort(assignments, kind="stable")
+    counts = np.bincount(assignments, minlength=num_clusters)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    centroids = kmeans.cluster_centers_ / np.linalg.norm(kmeans.cluster_centers_, axis=1, keepdims=True).clip(min=1e-12)
+    return EmbeddingIndex(
+        embeddings[order].astype(np.float16),
+        [metadata[i] for i in order],
+        centroids=centroids.astype(np.float32),
+        offsets=offsets,
+    )
+
+
+def load_embedding_index(path: Path | str | None, n_probe: int = 4) -> Optional[EmbeddingIndex]:
+    if not path:
+        return None
+    return EmbeddingIndex.load(path, n_probe=n_probe)
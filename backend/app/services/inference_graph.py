@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import bisect
+import logging
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+import torch
+
+LOGGER = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "compile")
+
+
+class _GraphForward(torch.nn.Module):
+    """Tensor-in, tensor-out view of a Hugging Face classifier that tracing and compiling can handle."""
+
+    def __init__(self, model: torch.nn.Module, with_hidden: bool):
+        super().__init__()
+        self.model = model
+        self.with_hidden = with_hidden
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+            output_hidden_states=self.with_hidden,
+            return_dict=False,
+        )
+        if self.with_hidden:
+            return outputs[0], outputs[1][-1]
+        return outputs[0]
+
+
+def resolve_buckets(buckets: Sequence[int], max_length: int) -> List[int]:
+    """Sorted padded lengths to serve, clipped to ``max_length``, which is always the last bucket."""
+    return sorted({min(int(bucket), max_length) for bucket in buckets if int(bucket) > 0} | {max_length})
+
+
+def default_buckets(max_length: int, smallest: int = 16) -> List[int]:
+    """Powers of two from ``smallest`` up to ``max_length``, for an optimized backend without configured buckets."""
+    buckets = []
+    bucket = smallest
+    while bucket < max_length:
+        buckets.append(bucket)
+        bucket *= 2
+    return resolve_buckets(buckets, max_length)
+
+
+def pick_bucket(length: int, buckets: List[int]) -> int:
+    """Smallest bucket that fits ``length`` tokens (``buckets`` is sorted, last is max_length)."""
+    index = bisect.bisect_left(buckets, length)
+    return buckets[min(index, len(buckets) - 1)]
+
+
+class BucketedGraph:
+    """One optimized forward graph per padded sequence length, for single-query batches.
+
+    Inputs must already be padded to a bucket length (see ``NLPService._encode``).
+    A shape without a graph, e.g. an offline batch of many questions, runs eagerly.
+    """
+
+    def __init__(self, model: torch.nn.Module, backend: str, buckets: List[int], with_hidden: bool):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.backend = backend
+        self.buckets = buckets
+        self.with_hidden = with_hidden
+        self._module = _GraphForward(model, with_hidden).eval()
+        self._graphs: Dict[int, Callable] = {}
+        self.warmup_seconds: Dict[int, float] = {}
+
+    def _build(self, example: dict[str, torch.Tensor]) -> Callable:
+        if self.backend == "torchscript":
+            with torch.no_grad():
+                traced = torch.jit.trace(self._module, example_kwarg_inputs=example, strict=False, check_trace=False)
+                return torch.jit.optimize_for_inference(torch.jit.freeze(traced.eval()))
+        if self.backend == "compile":
+            # One graph per bucket: static shapes let inductor specialise every kernel
+            return torch.compile(self._module, dynamic=False)
+        return self._module
+
+    def prepare(self, examples: Dict[int, dict[str, torch.Tensor]]) -> None:
+        """Build and run the graph for every bucket once so no request pays for it."""
+        for bucket in self.buckets:
+            example = examples[bucket]
+            started = time.perf_counter()
+            try:
+                graph = self._build(example)
+                with torch.no_grad():
+                    # Profiling executors and inductor specialise over the first couple of calls
+                    for _ in range(2):
+                        graph(**example)
+            except Exception:  # noqa: BLE001 - an unsupported model keeps working eagerly
+                LOGGER.exception("Could not build %s graph for length %s; using eager mode", self.backend, bucket)
+                graph = self._module
+                with torch.no_grad():
+                    graph(**example)
+            self._graphs[bucket] = graph
+            self.warmup_seconds[bucket] = time.perf_counter() - started
+            LOGGER.info("Warmed %s graph for length %s in %.2fs", self.backend, bucket, self.warmup_seconds[bucket])
+
+    def __call__(self, encoded: dict[str, torch.Tensor]):
+        input_ids = encoded["input_ids"]
+        graph = self._graphs.get(input_ids.shape[1]) if input_ids.shape[0] == 1 else None
+        if graph is None:
+            graph = self._module
+        return graph(**encoded)
+
+
+def load_warmup_questions(path: Optional[Path], limit: int) -> List[str]:
+    """Representative questions from the training CSV (underscored question keys become sentences)."""
+    if path is None or not path.exists() or limit <= 0:
+        return []
+    questions = pd.read_csv(path, usecols=["question"])["question"].dropna().astype(str)
+    questions = questions.str.replace("_", " ", regex=False).drop_duplicates()
+    return questions.sample(n=min(limit, len(questions)), random_state=0).tolist()
@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from ..config import get_settings
+from .nlp import NLPService, load_nlp_service
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class ReloadStatus:
+    state: str = "idle"  # idle | loading | ready | failed
+    model_dir: Optional[Path] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    smoke_accuracy: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class BotConfig:
+    """Where a bot's artifacts live; index paths default to the files saved next to the model."""
+
+    bot_id: str
+    model_dir: Path
+    vector_store_path: Optional[Path] = None
+    embedding_index_path: Optional[Path] = None
+    typo_index_path: Optional[Path] = None
+    warmup_data_path: Optional[Path] = None
+
+
+@dataclass
+class ResidencyStats:
+    loads: int = 0
+    evictions: int = 0
+    hits: int = 0
+    # Estimated size of the most recently loaded model; kept after eviction to plan its next load
+    memory_bytes: int = 0
+    last_used: Optional[datetime] = None
+    last_load_seconds: Optional[float] = None
+
+
+def estimate_memory_bytes(service: NLPService) -> int:
+    """Approximate resident size of a service: weights and buffers plus the retrieval matrices.
+
+    The dense embedding matrix is memory-mapped, so only what queries page in
+    actually counts against RAM; its full size is used as an upper bound.
+    """
+    modules = [service.model] + ([service.exit_heads] if service.exit_heads is not None else [])
+    total = sum(
+        tensor.numel() * tensor.element_size()
+        for module in modules
+        for tensor in chain(module.parameters(), module.buffers())
+    )
+    store = service.vector_store
+    if store is not None:
+        for matrix in (store.matrix, store._columns):
+            if matrix is not None:
+                total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+    index = service.embedding_index
+    if index is not None:
+        total += index.embeddings.nbytes
+        if index.centroids is not None:
+            total += index.centroids.nbytes
+    return total
+
+
+def run_smoke_test(service: NLPService, sample_size: int) -> float:
+    """Predict one example question per label and return the share answered correctly."""
+    samples = [
+        (meta.question_examples[0], meta.answer)
+        for meta in service.label_metadata
+        if meta.question_examples
+    ][:sample_size]
+    if not samples:
+        raise ValueError("Model has no labelled example questions to validate against")
+    correct = sum(1 for question, answer in samples if service.predict(question).text == answer)
+    return correct / len(samples)
+
+
+class ModelManager:
+    """Owns one bot's active NLPService and swaps it atomically when a new model is loaded.
+
+    Requests take a reference to ``current`` once and keep using it, so an
+    in-flight prediction finishes on the old model while new requests see the
+    replacement. The old model is released once the last reference is dropped.
+    """
+
+    def __init__(self, bot: BotConfig) -> None:
+        self.bot = bot
+        self._service: Optional[NLPService] = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.status = ReloadStatus()
+        self.stats = ResidencyStats()
+
+    @property
+    def loaded(self) -> bool:
+        return self._service is not None
+
+    def peek(self) -> Optional[NLPService]:
+        """The loaded service, if any; never loads and does not count as a use."""
+        return self._service
+
+    @property
+    def current(self) -> NLPService:
+        service = self._service
+        if service is not None:
+            return service
+        with self._lock:
+            if self._service is None:
+                started = time.perf_counter()
+                self._activate(
+                    load_nlp_service(
+                        self.bot.model_dir,
+                        vector_store_path=self.bot.vector_store_path,
+                        embedding_index_path=self.bot.embedding_index_path,
+                        typo_index_path=self.bot.typo_index_path,
+                        warmup_data_path=self.bot.warmup_data_path,
+                    ),
+                    time.perf_counter() - started,
+                )
+                self.status = ReloadStatus(state="ready", model_dir=self._service.model_dir)
+            return self._service
+
+    def _activate(self, service: NLPService, load_seconds: float) -> Optional[NLPService]:
+        """Install ``service`` (caller holds ``_lock``) and return the one it replaces."""
+        previous, self._service = self._service, service
+        self.stats.loads += 1
+        self.stats.memory_bytes = estimate_memory_bytes(service)
+        self.stats.last_load_seconds = load_seconds
+        return previous
+
+    def unload(self) -> bool:
+        """Drop the loaded model; in-flight requests finish on their own reference. False while reloading."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                previous, self._service = self._service, None
+            if previous is None:
+                return False
+            self.stats.evictions += 1
+            self.status = ReloadStatus()
+            LOGGER.info("Unloaded model of bot %s (%s)", self.bot.bot_id, previous.model_dir)
+            del previous
+            _release_memory()
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def begin_reload(self, model_dir: Path) -> bool:
+        """Mark a reload as started; returns False if another reload is already running."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.status = ReloadStatus(state="loading", model_dir=model_dir, started_at=datetime.utcnow())
+        return True
+
+    def reload(self, model_dir: Path, vector_store_path: Optional[Path] = None) -> None:
+        """Load, validate and activate a model directory. Must follow a successful ``begin_reload``."""
+        settings = get_settings()
+        try:
+            started = time.perf_counter()
+            # Warm before the smoke test and the swap, so traffic never hits a cold model
+            candidate = load_nlp_service(
+                model_dir,
+                vector_store_path=vector_store_path,
+                warmup_data_path=self.bot.warmup_data_path,
+            )
+            load_seconds = time.perf_counter() - started
+            accuracy = run_smoke_test(candidate, settings.reload_smoke_size)
+            self.status.smoke_accuracy = accuracy
+            if accuracy < settings.reload_min_accuracy:
+                raise ValueError(
+                    f"Smoke test accuracy {accuracy:.2%} is below the required "
+                    f"{settings.reload_min_accuracy:.2%}"
+                )
+
+            with self._lock:
+                previous = self._activate(candidate, load_seconds)
+                # A later lazy load after eviction must bring back this model, not the configured one
+                self.bot = replace(
+                    self.bot,
+                    model_dir=model_dir,
+                    vector_store_path=vector_store_path,
+                    embedding_index_path=None,
+                    typo_index_path=None,
+                )
+            self.status.state = "ready"
+            LOGGER.info(
+                "Activated model %s for bot %s (smoke accuracy %.2f%%)", model_dir, self.bot.bot_id, accuracy * 100
+            )
+
+            del previous
+            _release_memory()
+        except Exception as exc:  # noqa: BLE001 - keep serving the previous model
+            LOGGER.exception("Model reload from %s failed", model_dir)
+            self.status.state = "failed"
+            self.status.error = str(exc)
+        finally:
+            self.status.finished_at = datetime.utcnow()
+            self._reload_lock.release()
+
+
+def _release_memory() -> None:
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class ModelRegistry:
+    """Serves several bots from one process while keeping only a few of their models loaded.
+
+    Each bot has its own ``ModelManager``, so lazy loading, hot reload and the
+    reload smoke test work per bot. The registry only decides residency: bots
+    are kept in least-recently-used order and, when more than
+    ``max_resident`` models are loaded or their estimated memory exceeds
+    ``memory_budget_bytes``, the least recently used ones are unloaded. A bot
+    whose model was evicted is loaded again on its next request.
+
+    A bot about to load holds its slot and expected memory from the moment
+    room is made until the load ends, so concurrent first requests for
+    different bots cannot each see room and load past the limits together.
+    """
+
+    def __init__(
+        self,
+        bots: List[BotConfig],
+        default_bot_id: str,
+        max_resident: int = 2,
+        memory_budget_bytes: Optional[int] = None,
+    ) -> None:
+        self._managers: Dict[str, ModelManager] = {bot.bot_id: ModelManager(bot) for bot in bots}
+        if default_bot_id not in self._managers:
+            raise ValueError(f"Default bot {default_bot_id!r} is not configured")
+        self.default_bot_id = default_bot_id
+        self.max_resident = max(1, max_resident)
+        self.memory_budget_bytes = memory_budget_bytes
+        # Loaded and loading bots, least recently used first
+        self._resident: "OrderedDict[str, None]" = OrderedDict()
+        # Bots being loaded and the memory reserved for them
+        self._loading: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def __contains__(self, bot_id: str) -> bool:
+        return bot_id in self._managers
+
+    @property
+    def bot_ids(self) -> List[str]:
+        return list(self._managers)
+
+    def manager(self, bot_id: Optional[str] = None) -> ModelManager:
+        """The bot's manager; raises ``KeyError`` for unknown bots."""
+        return self._managers[bot_id or self.default_bot_id]
+
+    def get(self, bot_id: Optional[str] = None) -> NLPService:
+        """The bot's service, loading it (and evicting others) if it is not resident."""
+        manager = self.manager(bot_id)
+        key = manager.bot.bot_id
+        reserved = not manager.loaded and self._reserve(key)
+        try:
+            service = manager.current
+        finally:
+            if reserved:
+                self._release(key)
+        manager.stats.hits += 1
+        manager.stats.last_used = datetime.utcnow()
+        self.touch(key)
+        return service
+
+    def touch(self, bot_id: str) -> None:
+        """Mark a loaded bot as most recently used and enforce the residency limits."""
+        with self._lock:
+            if not self._managers[bot_id].loaded:
+                return
+            self._resident[bot_id] = None
+            self._resident.move_to_end(bot_id)
+            victims, _ = self._pick_victims(keep=bot_id)
+            for bot in victims:
+                del self._resident[bot]
+            if victims:
+                self._changed.notify_all()
+        self._evict(victims)
+
+    def reload(self, bot_id: str, model_dir: Path, vector_store_path: Optional[Path] = None) -> None:
+        """``ModelManager.reload`` that also accounts for the new model's residency."""
+        self.manager(bot_id).reload(model_dir, vector_store_path)
+        self.touch(bot_id)
+
+    def resident(self) -> List[str]:
+        with self._lock:
+            return [bot for bot in self._resident if bot not in self._loading]
+
+    def _reserve(self, key: str) -> bool:
+        """Claim a slot and memory for ``key`` and unload the bots it replaces; False if already claimed.
+
+        The expected size is the bot's last measured footprint, or the largest
+        resident one for a first load. Bots still loading cannot be evicted, so
+        when the limits can only be met after one of them finishes this waits
+        for it; with nothing left to wait for, the model loads anyway.
+        """
+        manager = self._managers[key]
+        with self._changed:
+            while True:
+                if manager.loaded or key in self._loading:
+                    return False
+                incoming = manager.stats.memory_bytes or max(map(self._footprint, self._resident), default=0)
+                victims, fits = self._pick_victims(keep=key, incoming=incoming)
+                if fits or not self._loading:
+                    break
+                self._changed.wait()
+            for bot in victims:
+                del self._resident[bot]
+            self._resident[key] = None
+            self._loading[key] = incoming
+        # Make room first, so the new model is not loaded on top of the ones it will replace
+        self._evict(victims)
+        return True
+
+    def _release(self, key: str) -> None:
+        """End ``key``'s reservation; ``touch`` then accounts for its measured size."""
+        with self._changed:
+            del self._loading[key]
+            if not self._managers[key].loaded:
+                self._resident.pop(key, None)
+            self._changed.notify_all()
+
+    def _footprint(self, bot: str) -> int:
+        return self._loading.get(bot, self._managers[bot].stats.memory_bytes)
+
+    def _over_limits(self, count: int, memory: int) -> bool:
+        return count > self.max_resident or (
+            self.memory_budget_bytes is not None and memory > self.memory_budget_bytes
+        )
+
+    def _pick_victims(self, keep: str, incoming: int = 0) -> Tuple[List[str], bool]:
+        """Bots to unload (caller holds ``_lock``), least recently used first, and whether the limits then hold.
+
+        ``incoming`` is the expected size of ``keep`` when it is not resident
+        yet. Bots that are still loading are never picked.
+        """
+        incoming = 0 if keep in self._resident else incoming
+        count = len(self._resident) + (keep not in self._resident)
+        memory = incoming + sum(map(self._footprint, self._resident))
+        victims = []
+        for bot in self._resident:
+            if not self._over_limits(count, memory):
+                break
+            if bot == keep or bot in self._loading:
+                continue
+            victims.append(bot)
+            count -= 1
+            memory -= self._footprint(bot)
+        return victims, not self._over_limits(count, memory)
+
+    def _evict(self, victims: List[str]) -> None:
+        for bot in victims:
+            manager = self._managers[bot]
+            if not manager.unload() and manager.loaded:
+                # Busy reloading: keep it, but first in line for the next eviction
+                with self._lock:
+                    self._resident[bot] = None
+                    self._resident.move_to_end(bot, last=False)
+
+
+def configured_bots() -> List[BotConfig]:
+    """The default bot from the model settings plus the extra bots listed in ``BOTS``."""
+    settings = get_settings()
+    bots = [
+        BotConfig(
+            bot_id=settings.default_bot_id,
+            model_dir=settings.model_dir,
+            vector_store_path=settings.vector_store_path,
+            embedding_index_path=settings.embedding_index_path,
+            typo_index_path=settings.typo_index_path,
+            warmup_data_path=settings.warmup_data_path,
+        )
+    ]
+    for bot_id, model_dir in settings.bots.items():
+        if bot_id == settings.default_bot_id:
+            LOGGER.warning("Ignoring BOTS entry %r: it is the default bot's id", bot_id)
+            continue
+        bots.append(BotConfig(bot_id=bot_id, model_dir=model_dir))
+    return bots
+
+
+@lru_cache()
+def get_model_registry() -> ModelRegistry:
+    settings = get_settings()
+    budget = settings.model_memory_budget_mb
+    return ModelRegistry(
+        configured_bots(),
+        default_bot_id=settings.default_bot_id,
+        max_resident=settings.max_resident_models,
+        memory_budget_bytes=int(budget * 1024 * 1024) if budget is not None else None,
+    )
+
+
+def get_model_manager(bot_id: Optional[str] = None) -> ModelManager:
+    return get_model_registry().manager(bot_id)
@@ -1,17 +1,37 @@
 from __future__ import annotations
 
 import json
+import logging
+import threading
+from contextlib import nullcontext
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
+import numpy as np
 import torch
 from transformers import AutoModelForSequenceClassification, AutoTokenizer
 
 from ..config import get_settings
 from ..schemas import GeneratedAnswer
+from ..utils.cpu import active_topology
+from ..utils.singleflight import SingleFlight
 from .preprocessing import normalize_text
-from .vector_store import VectorStore, load_vector_store
+from .early_exit import ExitHeads, ExitStats, check_supported, early_exit_forward, load_exit_heads
+from .embedding_index import EmbeddingIndex, load_embedding_index, mean_pool
+from .inference_graph import BucketedGraph, default_buckets, load_warmup_questions, pick_bucket, resolve_buckets
+from .typo_index import TypoIndex, load_typo_index
+from .vector_store import SimilarQuestion, VectorStore, load_vector_store
+
+LOGGER = logging.getLogger(__name__)
+
+# Rank offset for reciprocal rank fusion of dense and sparse neighbours
+RRF_K = 60
+
+# Used when a model directory predates inference_config.json; matches the
+# --max-length default of training/train_classifier.py
+DEFAULT_MAX_LENGTH = 128
 
 
 @dataclass
@@ -39,8 +59,30 @@ class LabelMetadata:
         )
 
 
+@dataclass
+class Classification:
+    metadata: LabelMetadata
+    confidence: float
+    embedding: Optional[np.ndarray] = None
+    # Encoder layer the query left at when early exit is enabled
+    exit_layer: Optional[int] = None
+    # Query after normalization and typo correction, so ``related`` does not prepare it again
+    prepared: Optional[str] = None
+
+
 class NLPService:
-    def __init__(self, model_dir: Path, vector_store: Optional[VectorStore] = None):
+    def __init__(
+        self,
+        model_dir: Path,
+        vector_store: Optional[VectorStore] = None,
+        embedding_index: Optional[EmbeddingIndex] = None,
+        typo_index: Optional[TypoIndex] = None,
+        token_cache_size: int = 2048,
+        max_concurrent_inference: Optional[int] = None,
+        inference_backend: str = "eager",
+        sequence_buckets: Optional[Sequence[int]] = None,
+        early_exit_threshold: Optional[float] = None,
+    ):
         if not model_dir.exists():
             raise FileNotFoundError(f"Model directory not found: {model_dir}")
         self.model_dir = model_dir
@@ -52,6 +94,52 @@ class NLPService:
         self.label_metadata = self._load_label_metadata(model_dir)
         self.id_to_metadata = {meta.id: meta for meta in self.label_metadata}
         self.vector_store = vector_store
+        self.embedding_index = embedding_index
+        self.typo_index = typo_index
+        self.max_length = self._load_max_length(model_dir)
+        # Padding to a few fixed lengths gives the optimized graphs static shapes
+        self.buckets = resolve_buckets(sequence_buckets, self.max_length) if sequence_buckets else None
+        if self.buckets is None and inference_backend != "eager":
+            # Graphs are built per bucket; without any the backend setting would silently do nothing
+            self.buckets = default_buckets(self.max_length)
+            LOGGER.info("No sequence buckets configured for %s; using %s", inference_backend, self.buckets)
+        self.inference_backend = inference_backend
+        self._graph: Optional[BucketedGraph] = None
+        if self.buckets is not None:
+            # Bucketing pads a pre-tokenized batch on purpose; silence the "call __call__ instead" advice
+            self.tokenizer.deprecation_warnings["Asking-to-pad-a-fast-tokenizer"] = True
+        self.early_exit_threshold = early_exit_threshold
+        self.exit_heads = self._load_exit_heads(model_dir) if early_exit_threshold is not None else None
+        self.exit_stats = ExitStats()
+        # Single-query encodings keyed by normalized text; repeated questions skip the tokenizer
+        self._encode_cached = lru_cache(maxsize=token_cache_size)(self._encode_one)
+        # Identical questions arriving together (e.g. after an announcement) share one forward pass
+        self.inflight = SingleFlight()
+        # Starlette runs sync endpoints on a 40-thread pool; without a cap every one of
+        # them can start a forward pass and the torch thread pools oversubscribe the cores
+        self._inference_slots = (
+            threading.BoundedSemaphore(max_concurrent_inference) if max_concurrent_inference else nullcontext()
+        )
+
+    @staticmethod
+    def _load_max_length(model_dir: Path) -> int:
+        config_path = model_dir / "inference_config.json"
+        if not config_path.exists():
+            return DEFAULT_MAX_LENGTH
+        with config_path.open("r", encoding="utf-8") as fp:
+            return int(json.load(fp).get("max_length", DEFAULT_MAX_LENGTH))
+
+    def _load_exit_heads(self, model_dir: Path) -> Optional[ExitHeads]:
+        heads = load_exit_heads(model_dir)
+        if heads is None:
+            LOGGER.warning("Early exit requested but %s has no exit heads; running every layer", model_dir)
+            return None
+        try:
+            check_supported(self.model)
+        except ValueError:
+            LOGGER.exception("Early exit disabled for %s", model_dir)
+            return None
+        return heads.to(self.device)
 
     @staticmethod
     def _load_label_metadata(model_dir: Path) -> List[LabelMetadata]:
@@ -66,50 +154,243 @@ class NLPService:
         labels = payload.get("labels", payload)
         return [LabelMetadata.from_dict(item) for item in labels]
 
-    def predict(self, text: str, top_k: int = 3) -> GeneratedAnswer:
+    def _encode(self, normalized_texts: list[str], bucket: Optional[int] = None) -> dict[str, torch.Tensor]:
+        if self.buckets is None:
+            encoded = self.tokenizer(
+                normalized_texts,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt",
+            )
+        else:
+            encoded = self.tokenizer(normalized_texts, truncation=True, max_length=self.max_length)
+            if bucket is None:
+                bucket = pick_bucket(max(len(ids) for ids in encoded["input_ids"]), self.buckets)
+            encoded = self.tokenizer.pad(encoded, padding="max_length", max_length=bucket, return_tensors="pt")
+        return {key: value.to(self.device) for key, value in encoded.items()}
+
+    def _encode_one(self, normalized_text: str) -> dict[str, torch.Tensor]:
+        return self._encode([normalized_text])
+
+    def token_cache_info(self):
+        return self._encode_cached.cache_info()
+
+    def prepare(self, text: str) -> str:
+        """Normalize a query and, with a typo index, restore Turkish letters and fix misspelled words."""
         normalized = normalize_text(text)
-        encoded = self.tokenizer(
-            normalized,
-            padding=True,
-            truncation=True,
-            max_length=256,
-            return_tensors="pt",
+        if self.typo_index is None:
+            return normalized
+        return self.typo_index.correct(normalized).text
+
+    def _forward(
+        self, prepared: list[str]
+    ) -> tuple[torch.Tensor, Optional[Sequence[Optional[np.ndarray]]], Optional[list[int]]]:
+        """Forward pass over queries that already went through ``prepare``."""
+        encoded = self._encode_cached(prepared[0]) if len(prepared) == 1 else self._encode(prepared)
+        with_embeddings = self.embedding_index is not None
+        if self.exit_heads is not None:
+            return self._forward_early_exit(encoded, with_embeddings)
+        with self._inference_slots, torch.no_grad():
+            if self._graph is not None and self._graph.with_hidden == with_embeddings:
+                outputs = self._graph(encoded)
+                logits, last_hidden = outputs if with_embeddings else (outputs, None)
+            else:
+                outputs = self.model(**encoded, output_hidden_states=with_embeddings)
+                logits = outputs.logits
+                last_hidden = outputs.hidden_states[-1] if with_embeddings else None
+            probabilities = torch.softmax(logits, dim=-1)
+            # The dense index is built from the same pooled states, so the query embedding is free
+            embeddings = mean_pool(last_hidden, encoded["attention_mask"]) if with_embeddings else None
+        return probabilities, embeddings, None
+
+    def _forward_early_exit(
+        self, encoded: dict[str, torch.Tensor], with_embeddings: bool
+    ) -> tuple[torch.Tensor, Optional[list[Optional[np.ndarray]]], list[int]]:
+        """Layer-by-layer forward that stops each query at its first confident exit head.
+
+        Queries that leave early have no final hidden state, so they get no dense
+        embedding and ``related`` falls back to the TF-IDF neighbours for them.
+        """
+        with self._inference_slots, torch.no_grad():
+            output = early_exit_forward(self.model, self.exit_heads, encoded, self.early_exit_threshold)
+            self.exit_stats.record(output.exit_layers)
+            if not with_embeddings:
+                return output.probabilities, None, output.exit_layers
+            embeddings: list[Optional[np.ndarray]] = [None] * len(output.exit_layers)
+            if output.last_hidden is not None:
+                pooled = mean_pool(output.last_hidden, output.full_attention_mask)
+                for row, embedding in zip(output.full_rows.tolist(), pooled):
+                    embeddings[row] = embedding
+        return output.probabilities, embeddings, output.exit_layers
+
+    def warmup(self, questions: list[str]) -> dict[int, float]:
+        """Build the per-bucket graphs and run representative questions through them.
+
+        Without buckets, or with early exit (which walks the layers in Python and
+        cannot use a traced graph), this only runs the questions eagerly, which still moves
+        one-off allocation and kernel selection costs out of the first requests.
+        Returns warm-up seconds per bucket.
+        """
+        normalized = [normalize_text(question) for question in questions if question]
+        if self.buckets is None or self.exit_heads is not None:
+            with torch.no_grad():
+                for text in normalized:
+                    encoded = self._encode([text])
+                    if self.exit_heads is not None:
+                        early_exit_forward(self.model, self.exit_heads, encoded, self.early_exit_threshold)
+                    else:
+                        self.model(**encoded)
+            return {}
+
+        # One real question per bucket as the example input; a bucket no question
+        # falls into is still built from the shortest question padded up to it
+        by_bucket: dict[int, str] = {}
+        for text in normalized:
+            length = len(self.tokenizer(text, truncation=True, max_length=self.max_length)["input_ids"])
+            by_bucket.setdefault(pick_bucket(length, self.buckets), text)
+        fallback = min(normalized, key=len) if normalized else "merhaba"
+        examples = {
+            bucket: self._encode([by_bucket.get(bucket, fallback)], bucket=bucket) for bucket in self.buckets
+        }
+
+        graph = BucketedGraph(
+            self.model,
+            backend=self.inference_backend,
+            buckets=self.buckets,
+            with_hidden=self.embedding_index is not None,
         )
-        encoded = {key: value.to(self.device) for key, value in encoded.items()}
+        graph.prepare(examples)
+        self._graph = graph
         with torch.no_grad():
-            outputs = self.model(**encoded)
-            logits = outputs.logits
-            probabilities = torch.softmax(logits, dim=-1)
+            for text in normalized:
+                graph(self._encode([text]))
+        return dict(graph.warmup_seconds)
 
-        top_probabilities, top_indices = torch.topk(probabilities, k=min(top_k, probabilities.shape[-1]))
-        best_index = int(top_indices[0][0].item())
-        confidence = float(top_probabilities[0][0].item())
-        metadata = self.id_to_metadata.get(best_index)
-        if metadata is None:
-            raise ValueError(f"Label metadata missing for id {best_index}")
+    def classify(self, text: str) -> Classification:
+        """Run the classifier only and return the best label with its probability.
 
-        similar_questions: list[str] = []
-        suggested_links: list[str] = list(metadata.suggested_links)
+        Concurrent calls for the same prepared text are coalesced into one forward pass.
+        """
+        prepared = self.prepare(text)
+        return self.inflight.do(prepared, lambda: self._classify_prepared([prepared])[0])
 
+    def classify_batch(self, texts: list[str]) -> list[Classification]:
+        """Classify several queries in one padded forward pass."""
+        return self._classify_prepared([self.prepare(text) for text in texts])
+
+    def _classify_prepared(self, prepared: list[str]) -> list[Classification]:
+        if not prepared:
+            return []
+        probabilities, embeddings, exit_layers = self._forward(prepared)
+
+        top_probabilities, top_indices = torch.max(probabilities, dim=-1)
+        results: list[Classification] = []
+        for row, (index, probability) in enumerate(zip(top_indices.tolist(), top_probabilities.tolist())):
+            metadata = self.id_to_metadata.get(index)
+            if metadata is None:
+                raise ValueError(f"Label metadata missing for id {index}")
+            embedding = embeddings[row] if embeddings is not None else None
+            results.append(
+                Classification(
+                    metadata=metadata,
+                    confidence=float(probability),
+                    embedding=embedding,
+                    exit_layer=exit_layers[row] if exit_layers is not None else None,
+                    prepared=prepared[row],
+                )
+            )
+        return results
+
+    def related(self, text: str, classification: Classification, top_k: int = 3) -> tuple[list[str], list[str]]:
+        """Collect similar questions and suggested links for an already classified query."""
+        query = classification.prepared if classification.prepared is not None else self.prepare(text)
+        rankings: list[list[SimilarQuestion]] = []
+        if self.embedding_index is not None and classification.embedding is not None:
+            rankings.append(self.embedding_index.search(classification.embedding, top_k=top_k))
         if self.vector_store:
-            neighbours = self.vector_store.search(text, top_k=top_k)
-            similar_questions = [item.question for item in neighbours if item.question]
-            for item in neighbours:
-                for link in item.suggested_links:
-                    if link not in suggested_links:
-                        suggested_links.append(link)
-
-        return GeneratedAnswer(
+            rankings.append(self.vector_store.search(query, top_k=top_k))
+        if self.typo_index is not None:
+            # Character trigrams still match questions whose words stayed garbled after correction
+            rankings.append(self.typo_index.match(query, top_k=top_k))
+
+        # Reciprocal rank fusion: dense, TF-IDF and trigram scores are not comparable, their ranks are
+        fused: dict[str, float] = {}
+        by_question: dict[str, SimilarQuestion] = {}
+        for ranking in rankings:
+            for rank, item in enumerate(ranking):
+                if not item.question:
+                    continue
+                fused[item.question] = fused.get(item.question, 0.0) + 1.0 / (RRF_K + rank + 1)
+                by_question.setdefault(item.question, item)
+        neighbours = [by_question[q] for q in sorted(fused, key=fused.get, reverse=True)[:top_k]]
+
+        similar_questions = [item.question for item in neighbours]
+        suggested_links: list[str] = list(classification.metadata.suggested_links)
+        for item in neighbours:
+            for link in item.suggested_links:
+                if link not in suggested_links:
+                    suggested_links.append(link)
+        return similar_questions, suggested_links
+
+    def predict(self, text: str, top_k: int = 3) -> GeneratedAnswer:
+        classification = self.classify(text)
+        similar_questions, suggested_links = self.related(text, classification, top_k=top_k)
+        metadata = classification.metadata
+
+        # Every field comes from the loaded label metadata and our own scores; skip re-validation
+        return GeneratedAnswer.model_construct(
             text=metadata.answer,
             category=metadata.category,
             subcategory=metadata.subcategory,
-            confidence=confidence,
+            confidence=classification.confidence,
             similar_questions=similar_questions,
             suggested_links=suggested_links,
         )
 
 
+def inference_concurrency() -> Optional[int]:
+    topology = active_topology()
+    return topology.max_concurrent_inference if topology else get_settings().max_concurrent_inference
+
+
+def load_nlp_service(
+    model_dir: Path,
+    vector_store_path: Optional[Path] = None,
+    embedding_index_path: Optional[Path] = None,
+    typo_index_path: Optional[Path] = None,
+    warmup_data_path: Optional[Path] = None,
+) -> NLPService:
+    """Build a warmed-up service for a model directory; indexes default to the files saved next to the model."""
+    settings = get_settings()
+    service = NLPService(
+        model_dir=model_dir,
+        vector_store=load_vector_store(vector_store_path or model_dir / "vector_store.joblib"),
+        embedding_index=load_embedding_index(
+            embedding_index_path or model_dir / "embedding_index.joblib", n_probe=settings.embedding_search_probes
+        ),
+        typo_index=load_typo_index(typo_index_path or model_dir / "typo_index.joblib"),
+        token_cache_size=settings.token_cache_size,
+        max_concurrent_inference=inference_concurrency(),
+        inference_backend=settings.inference_backend,
+        sequence_buckets=settings.sequence_buckets,
+        early_exit_threshold=settings.early_exit_threshold,
+    )
+    questions = load_warmup_questions(warmup_data_path, settings.warmup_questions)
+    if not questions:
+        # Bots without a training CSV at hand warm up on their own labelled examples
+        questions = [meta.question_examples[0] for meta in service.label_metadata if meta.question_examples]
+        questions = questions[: settings.warmup_questions]
+    service.warmup(questions)
+    return service
+
+
 def get_nlp_service() -> NLPService:
     settings = get_settings()
-    vector_store = load_vector_store(settings.vector_store_path)
-    return NLPService(model_dir=settings.model_dir, vector_store=vector_store)
+    return load_nlp_service(
+        settings.model_dir,
+        vector_store_path=settings.vector_store_path,
+        embedding_index_path=settings.embedding_index_path,
+        typo_index_path=settings.typo_index_path,
+        warmup_data_path=settings.warmup_data_path,
+    )
@@ -18,21 +18,33 @@ TURKISH_LOWER_MAP = str.maketrans({
     "İ": "i",
 })
 
+# Turkish letters mapped to the ASCII letters people type on keyboards without them
+ASCII_FOLD_MAP = str.maketrans("çğıöşü", "cgiosu")
+
 # Characters we want to keep after normalization
 ALLOWED_CHARS_PATTERN = re.compile(r"[^a-z0-9çğıöşü\s]")
 MULTI_SPACE_PATTERN = re.compile(r"\s+")
 
 
-def normalize_text(text: str) -> str:
-    """Lowercase, strip punctuation, and standardize whitespace for Turkish text."""
+def fold_ascii(text: str) -> str:
+    """Replace Turkish letters in normalized text with their ASCII look-alikes ("başlangıç" -> "baslangic")."""
+    return text.translate(ASCII_FOLD_MAP)
+
+
+def normalize_text(text: str, ascii_fold: bool = False) -> str:
+    """Lowercase, strip punctuation, and standardize whitespace for Turkish text.
+
+    With ``ascii_fold`` the Turkish letters are also folded to ASCII, so text
+    typed with and without them normalizes to the same string.
+    """
     if not text:
         return ""
     normalized = unicodedata.normalize("NFKC", text.strip())
     normalized = normalized.translate(TURKISH_LOWER_MAP).lower()
     normalized = normalized.replace("i̇", "i")
     normalized = ALLOWED_CHARS_PATTERN.sub(" ", normalized)
-    normalized = MULTI_SPACE_PATTERN.sub(" ", normalized)
-    return normalized.strip()
+    normalized = MULTI_SPACE_PATTERN.sub(" ", normalized).strip()
+    return fold_ascii(normalized) if ascii_fold else normalized
 
 
 WORD_PATTERN = re.compile(r"[a-z0-9çğıöşü]+")
@@ -53,8 +65,8 @@ def sentence_split(text: str) -> List[str]:
     return [s.strip() for s in sentences if s.strip()]
 
 
-def batch_normalize(texts: Iterable[str]) -> List[str]:
-    return [normalize_text(t) for t in texts]
+def batch_normalize(texts: Iterable[str], ascii_fold: bool = False) -> List[str]:
+    return [normalize_text(t, ascii_fold=ascii_fold) for t in texts]
 
 
 
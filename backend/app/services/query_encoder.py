@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.pipeline import Pipeline
+from sklearn.utils import murmurhash3_32
+
+# Sparse query vector: sorted feature indices and their l2-normalized weights
+QueryVector = Tuple[np.ndarray, np.ndarray]
+
+
+def _word_settings_supported(params: dict) -> bool:
+    # Anything that changes how text becomes terms beyond lowercasing and the token pattern
+    return (
+        params["analyzer"] == "word"
+        and params["preprocessor"] is None
+        and params["tokenizer"] is None
+        and params["strip_accents"] is None
+        and params["input"] == "content"
+    )
+
+
+class QueryEncoder:
+    """Turns one normalized query into the same sparse TF-IDF vector a fitted vectorizer would.
+
+    ``TfidfVectorizer.transform`` builds an analyzer, a CSR matrix and runs input
+    validation on every call, which dwarfs the actual work for a five-word
+    query. This reimplements only the path the vector store uses: lowercase,
+    token regex, word n-grams, term counts, idf, l2 norm. Terms map to columns
+    either through the fitted vocabulary or, for a hashing vector store,
+    through the same murmurhash the ``HashingVectorizer`` used.
+    """
+
+    def __init__(
+        self,
+        token_pattern: str,
+        ngram_range: Tuple[int, int],
+        idf: Optional[np.ndarray],
+        lowercase: bool = True,
+        stop_words: Optional[frozenset] = None,
+        sublinear_tf: bool = False,
+        binary: bool = False,
+        norm: Optional[str] = "l2",
+        vocabulary: Optional[Dict[str, int]] = None,
+        n_features: Optional[int] = None,
+    ):
+        if (vocabulary is None) == (n_features is None):
+            raise ValueError("Give either a vocabulary or a hashing size")
+        self.token_pattern = re.compile(token_pattern)
+        self.ngram_range = ngram_range
+        self.idf = idf
+        self.lowercase = lowercase
+        self.stop_words = stop_words
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        self.norm = norm
+        self.vocabulary = vocabulary
+        self.n_features = n_features
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer) -> Optional["QueryEncoder"]:
+        """Build an encoder for a fitted vectorizer, or None when it uses options the encoder does not mirror."""
+        if isinstance(vectorizer, TfidfVectorizer):
+            params = vectorizer.get_params()
+            if not _word_settings_supported(params) or params["norm"] not in ("l2", None):
+                return None
+            return cls(
+                token_pattern=params["token_pattern"],
+                ngram_range=params["ngram_range"],
+                idf=vectorizer.idf_ if params["use_idf"] else None,
+                lowercase=params["lowercase"],
+                stop_words=frozenset(vectorizer.get_stop_words() or ()) or None,
+                sublinear_tf=params["sublinear_tf"],
+                binary=params["binary"],
+                norm=params["norm"],
+                vocabulary=vectorizer.vocabulary_,
+            )
+        if isinstance(vectorizer, Pipeline) and len(vectorizer.steps) == 2:
+            hashing, transformer = (step for _, step in vectorizer.steps)
+            if not isinstance(hashing, HashingVectorizer) or not isinstance(transformer, TfidfTransformer):
+                return None
+            params = hashing.get_params()
+            tfidf = transformer.get_params()
+            if (
+                not _word_settings_supported(params)
+                or params["alternate_sign"]
+                or params["norm"] is not None
+                or tfidf["norm"] not in ("l2", None)
+            ):
+                return None
+            return cls(
+                token_pattern=params["token_pattern"],
+                ngram_range=params["ngram_range"],
+                idf=transformer.idf_ if tfidf["use_idf"] else None,
+                lowercase=params["lowercase"],
+                stop_words=frozenset(hashing.get_stop_words() or ()) or None,
+                sublinear_tf=tfidf["sublinear_tf"],
+                binary=params["binary"],
+                norm=tfidf["norm"],
+                n_features=params["n_features"],
+            )
+        return None
+
+    def terms(self, text: str) -> List[str]:
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        if self.stop_words:
+            tokens = [token for token in tokens if token not in self.stop_words]
+        low, high = self.ngram_range
+        if high == 1:
+            return tokens
+        terms = list(tokens) if low == 1 else []
+        count = len(tokens)
+        for n in range(max(low, 2), min(high, count) + 1):
+            terms.extend(" ".join(tokens[start : start + n]) for start in range(count - n + 1))
+        return terms
+
+    def _column(self, term: str) -> Optional[int]:
+        if self.vocabulary is not None:
+            return self.vocabulary.get(term)
+        # Same bucket HashingVectorizer picks (sklearn's _hashing_fast), including the INT_MIN corner case
+        h = murmurhash3_32(term, seed=0)
+        if h == -2147483648:
+            return (2147483647 - (self.n_features - 1)) % self.n_features
+        return abs(h) % self.n_features
+
+    def encode(self, text: str) -> QueryVector:
+        counts: Dict[int, float] = {}
+        for term in self.terms(text):
+            column = self._column(term)
+            if column is not None:
+                counts[column] = counts.get(column, 0.0) + 1.0
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        indices = np.fromiter(sorted(counts), dtype=np.int64, count=len(counts))
+        values = np.fromiter((counts[index] for index in indices.tolist()), dtype=np.float64, count=len(counts))
+        if self.binary:
+            values[:] = 1.0
+        elif self.sublinear_tf:
+            values = np.log(values) + 1.0
+        if self.idf is not None:
+            values *= self.idf[indices]
+        if self.norm == "l2":
+            length = np.sqrt(np.dot(values, values))
+            if length > 0:
+                values /= length
+        return indices, values
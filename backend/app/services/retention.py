@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..config import get_settings
+from ..models import ChatMessage, ChatSession
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionStats:
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    cutoff: Optional[datetime] = None
+    batches: int = 0
+    sessions_archived: int = 0
+    messages_archived: int = 0
+    sessions_deleted: int = 0
+    messages_deleted: int = 0
+    pages_freed: int = 0
+    archive_files: List[str] = field(default_factory=list)
+    # Another process (worker or manage.py) was already running retention
+    skipped: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _serialize_session(session: ChatSession, messages: List[ChatMessage]) -> dict:
+    return {
+        "id": session.id,
+        "title": session.title,
+        "created_at": session.created_at.isoformat(),
+        "updated_at": session.updated_at.isoformat(),
+        "messages": [
+            {
+                "id": message.id,
+                "sender": message.sender,
+                "text": message.text,
+                "category": message.category,
+                "subcategory": message.subcategory,
+                "confidence": message.confidence,
+                "created_at": message.created_at.isoformat(),
+            }
+            for message in messages
+        ],
+    }
+
+
+def _archive_path(archive_dir: Path, day: datetime) -> Path:
+    return archive_dir / f"{day:%Y}" / f"{day:%m}" / f"chat_history_{day:%Y-%m-%d}.jsonl.gz"
+
+
+def _archive_batch(db: Session, sessions: List[ChatSession], archive_dir: Path, stats: RetentionStats) -> None:
+    session_ids = [session.id for session in sessions]
+    messages_by_session: Dict[str, List[ChatMessage]] = {session_id: [] for session_id in session_ids}
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id.in_(session_ids))
+        .order_by(ChatMessage.session_id, ChatMessage.created_at.asc())
+        .all()
+    )
+    for message in messages:
+        messages_by_session[message.session_id].append(message)
+
+    by_file: Dict[Path, List[str]] = {}
+    for session in sessions:
+        line = json.dumps(_serialize_session(session, messages_by_session[session.id]), ensure_ascii=False)
+        by_file.setdefault(_archive_path(archive_dir, session.updated_at), []).append(line)
+
+    for path, lines in by_file.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Appending adds a new gzip member; readers see one continuous JSONL stream
+        with gzip.open(path, "at", encoding="utf-8") as fp:
+            fp.write("\n".join(lines) + "\n")
+        if str(path) not in stats.archive_files:
+            stats.archive_files.append(str(path))
+
+    stats.sessions_archived += len(sessions)
+    stats.messages_archived += len(messages)
+
+
+def retention_lock_path(sqlite_path: Path) -> Path:
+    return sqlite_path.with_name(sqlite_path.name + ".retention.lock")
+
+
+@contextmanager
+def _exclusive_run(lock_path: Optional[Path]) -> Iterator[bool]:
+    """Hold an exclusive file lock across processes; yields False if another process holds it."""
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - Windows: only the scheduler's in-process lock applies
+        yield True
+        return
+    if lock_path is None:
+        yield True
+        return
+
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def run_retention(
+    session_factory: Callable[[], Session],
+    retention_days: int,
+    archive_dir: Optional[Path],
+    batch_size: int = 500,
+    vacuum_pages: int = 2000,
+    now: Optional[datetime] = None,
+    lock_path: Optional[Path] = None,
+) -> RetentionStats:
+    """Archive and delete sessions idle for longer than ``retention_days``.
+
+    Work is split into batches, each committed in its own short transaction so
+    the chat endpoints never wait long for SQLite's write lock. Sessions are
+    written to the archive before they are deleted; if a run is interrupted
+    between the two steps the next run archives that batch again.
+
+    With ``lock_path`` only one process runs at a time: every uvicorn worker
+    has its own scheduler, and two runs over the same sessions would archive
+    them twice. A run that finds the lock taken returns at once with
+    ``skipped`` set.
+    """
+    stats = RetentionStats()
+    stats.cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+
+    with _exclusive_run(lock_path) as acquired:
+        if not acquired:
+            stats.skipped = True
+            stats.finished_at = datetime.utcnow()
+            LOGGER.info("Retention is already running in another process; skipped")
+            return stats
+        _delete_expired(session_factory, archive_dir, batch_size, vacuum_pages, stats)
+
+    stats.finished_at = datetime.utcnow()
+    LOGGER.info(
+        "Retention removed %s sessions / %s messages in %s batches",
+        stats.sessions_deleted,
+        stats.messages_deleted,
+        stats.batches,
+    )
+    return stats
+
+
+def _delete_expired(
+    session_factory: Callable[[], Session],
+    archive_dir: Optional[Path],
+    batch_size: int,
+    vacuum_pages: int,
+    stats: RetentionStats,
+) -> None:
+    bind: Optional[Engine] = None
+    while True:
+        db = session_factory()
+        bind = db.get_bind()
+        try:
+            sessions = (
+                db.query(ChatSession)
+                .filter(ChatSession.updated_at < stats.cutoff)
+                .order_by(ChatSession.updated_at.asc())
+                .limit(batch_size)
+                .all()
+            )
+            if not sessions:
+                break
+            if archive_dir is not None:
+                _archive_batch(db, sessions, archive_dir, stats)
+
+            session_ids = [session.id for session in sessions]
+            stats.messages_deleted += (
+                db.query(ChatMessage)
+                .filter(ChatMessage.session_id.in_(session_ids))
+                .delete(synchronize_session=False)
+            )
+            stats.sessions_deleted += (
+                db.query(ChatSession).filter(ChatSession.id.in_(session_ids)).delete(synchronize_session=False)
+            )
+            db.commit()
+            stats.batches += 1
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    if stats.batches and vacuum_pages > 0 and bind is not None:
+        stats.pages_freed = incremental_vacuum(bind, vacuum_pages)
+
+
+def incremental_vacuum(engine: Engine, max_pages: int) -> int:
+    """Return up to ``max_pages`` free pages to the filesystem when auto_vacuum is INCREMENTAL."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        before = connection.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+        # The pragma frees one page per step and returns no rows, so cursor.execute()
+        # would stop after the first page; executescript() steps it to completion.
+        connection.connection.dbapi_connection.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        after = connection.exec_driver_sql("PRAGMA freelist_count").scalar() or 0
+        return int(before - after)
+
+
+def enable_incremental_vacuum(engine: Engine) -> None:
+    """Switch an existing database to incremental auto-vacuum (rewrites the whole file once)."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+
+
+class RetentionScheduler:
+    """Runs the retention job periodically on a daemon thread and keeps the last result."""
+
+    def __init__(self, job: Callable[[], RetentionStats], interval_seconds: float):
+        self.job = job
+        self.interval_seconds = interval_seconds
+        self.last_stats: Optional[RetentionStats] = None
+        self.last_error: Optional[str] = None
+        self.totals: Dict[str, int] = {"runs": 0, "sessions_deleted": 0, "messages_deleted": 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> RetentionStats:
+        with self._lock:
+            try:
+                stats = self.job()
+            except Exception as exc:
+                LOGGER.exception("Retention job failed")
+                self.last_error = str(exc)
+                raise
+            self.last_stats = stats
+            self.last_error = None
+            if stats.skipped:
+                return stats
+            self.totals["runs"] += 1
+            self.totals["sessions_deleted"] += stats.sessions_deleted
+            self.totals["messages_deleted"] += stats.messages_deleted
+            return stats
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception:  # noqa: BLE001 - logged in run_once, try again next interval
+                pass
+            LOGGER.debug("Retention run took %.1fs", time.monotonic() - started)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_scheduler: Optional[RetentionScheduler] = None
+
+
+def get_retention_scheduler() -> RetentionScheduler:
+    global _scheduler
+    if _scheduler is None:
+        from ..database import SessionLocal
+
+        settings = get_settings()
+
+        def job() -> RetentionStats:
+            if settings.retention_days is None:
+                raise ValueError("Retention is disabled; set RETENTION_DAYS to enable it")
+            return run_retention(
+                SessionLocal,
+                retention_days=settings.retention_days,
+                archive_dir=settings.archive_dir,
+                batch_size=settings.retention_batch_size,
+                lock_path=retention_lock_path(settings.sqlite_path),
+            )
+
+        _scheduler = RetentionScheduler(job, interval_seconds=settings.retention_interval_minutes * 60)
+    return _scheduler
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+LOGGER = logging.getLogger(__name__)
+
+FTS_TABLE = "chat_messages_fts"
+SNIPPET_TOKENS = 12
+SNIPPET_OPEN = "**"
+SNIPPET_CLOSE = "**"
+SNIPPET_ELLIPSIS = "…"
+
+# External-content FTS5 table: the index stores only tokens and reads the text
+# back from chat_messages, so message bodies are not duplicated on disk.
+# remove_diacritics folds ç/ğ/ö/ş/ü so "ogrenci" also finds "öğrenci"; the
+# prefix indexes keep the type-ahead style "last word as prefix" query cheap.
+_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='chat_messages',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF text ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+_TERM_PATTERN = re.compile(r"[^\W_]+")
+
+
+@dataclass
+class SearchHit:
+    message_id: int
+    session_id: str
+    session_title: Optional[str]
+    sender: str
+    snippet: str
+    score: float
+    created_at: datetime
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Create the FTS table and sync triggers if missing.
+
+    Returns False when the SQLite build has no FTS5 support; search is then
+    unavailable but the rest of the API keeps working. Rows that existed before
+    the table was created are indexed with ``python manage.py search-index``.
+    """
+    with engine.begin() as connection:
+        existed = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first()
+        try:
+            for statement in _SCHEMA:
+                connection.exec_driver_sql(statement)
+        except OperationalError as exc:
+            LOGGER.warning("Full-text search disabled, SQLite FTS5 is not available: %s", exc)
+            return False
+        if not existed and connection.exec_driver_sql("SELECT 1 FROM chat_messages LIMIT 1").first():
+            LOGGER.warning(
+                "Created %s for an existing database; run 'python manage.py search-index' to index old messages",
+                FTS_TABLE,
+            )
+    return True
+
+
+def rebuild_search_index(engine: Engine) -> int:
+    """Re-index every message from chat_messages and merge the index b-trees."""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        return connection.exec_driver_sql("SELECT count(*) FROM chat_messages").scalar() or 0
+
+
+def _fold(word: str) -> str:
+    """Mirror the FTS tokenizer: drop diacritics, then lowercase."""
+    decomposed = unicodedata.normalize("NFKD", word)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def query_terms(query: str) -> List[str]:
+    return _TERM_PATTERN.findall(query)
+
+
+def build_match_query(terms: List[str]) -> Optional[str]:
+    """Turn words into an FTS5 expression: all must match, the last one as a prefix.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax
+    (column filters, NEAR, unbalanced quotes...).
+    """
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def make_snippet(text_value: str, terms: List[str], max_tokens: int = SNIPPET_TOKENS) -> str:
+    """Cut a window of ``max_tokens`` words around the first hit and mark every hit.
+
+    Done in Python rather than with FTS5's snippet(): that needs a second MATCH
+    per page, which re-expands prefix terms and costs more than the ranking itself.
+    """
+    folded_terms = [_fold(term) for term in terms]
+    exact, prefix = set(folded_terms[:-1]), folded_terms[-1] if folded_terms else None
+    words = list(_TERM_PATTERN.finditer(text_value))
+
+    def is_hit(word: str) -> bool:
+        folded = _fold(word)
+        return folded in exact or (prefix is not None and folded.startswith(prefix))
+
+    hits = [index for index, match in enumerate(words) if is_hit(match.group())]
+    if not words:
+        return text_value[:200]
+    first = hits[0] if hits else 0
+    begin = max(0, min(first - max_tokens // 3, len(words) - max_tokens))
+    end = min(len(words), begin + max_tokens)
+
+    parts: List[str] = []
+    cursor = words[begin].start()
+    for index in range(begin, end):
+        match = words[index]
+        parts.append(text_value[cursor : match.start()])
+        parts.append(f"{SNIPPET_OPEN}{match.group()}{SNIPPET_CLOSE}" if index in hits else match.group())
+        cursor = match.end()
+    tail_end = words[end].start() if end < len(words) else len(text_value)
+    parts.append(text_value[cursor:tail_end].rstrip())
+
+    snippet = "".join(parts).strip()
+    if begin > 0:
+        snippet = SNIPPET_ELLIPSIS + snippet
+    if end < len(words):
+        snippet += SNIPPET_ELLIPSIS
+    return snippet
+
+
+def search_messages(
+    db: Session,
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    sender: Optional[str] = None,
+    candidate_limit: int = 5000,
+) -> tuple[int, List[SearchHit]]:
+    """Return the total hit count and one page of messages ranked by BM25.
+
+    Scoring every match of a common word (hundreds of thousands of rows on a
+    large history) dominates latency, so only the newest ``candidate_limit``
+    matches are scored and paged through; ``total`` still counts all of them.
+    """
+    terms = query_terms(query)
+    match = build_match_query(terms)
+    if match is None:
+        return 0, []
+
+    sender_join = f"JOIN chat_messages AS m ON m.id = {FTS_TABLE}.rowid" if sender else ""
+    sender_filter = "AND m.sender = :sender" if sender else ""
+    params = {
+        "match": match,
+        "sender": sender,
+        "limit": limit,
+        "offset": offset,
+        "candidates": candidate_limit,
+    }
+
+    total = db.execute(
+        text(f"SELECT count(*) FROM {FTS_TABLE} {sender_join} WHERE {FTS_TABLE} MATCH :match {sender_filter}"),
+        params,
+    ).scalar()
+
+    rows = db.execute(
+        text(
+            f"""
+            SELECT m.id, m.session_id, s.title, m.sender, m.text, m.created_at, page.score
+            FROM (
+                SELECT rowid, score FROM (
+                    SELECT {FTS_TABLE}.rowid AS rowid, bm25({FTS_TABLE}) AS score
+                    FROM {FTS_TABLE} {sender_join}
+                    WHERE {FTS_TABLE} MATCH :match {sender_filter}
+                    ORDER BY {FTS_TABLE}.rowid DESC
+                    LIMIT :candidates
+                )
+                ORDER BY score, rowid DESC
+                LIMIT :limit OFFSET :offset
+            ) AS page
+            JOIN chat_messages AS m ON m.id = page.rowid
+            JOIN chat_sessions AS s ON s.id = m.session_id
+            ORDER BY page.score, m.id DESC
+            """
+        ),
+        params,
+    ).all()
+
+    hits = [
+        SearchHit(
+            message_id=row.id,
+            session_id=row.session_id,
+            session_title=row.title,
+            sender=row.sender,
+            snippet=make_snippet(row.text, terms),
+            # bm25() is lower-is-better; flip it so clients can sort descending
+            score=-float(row.score),
+            # Raw SQL bypasses the ORM's DateTime type, so SQLite hands back the stored string
+            created_at=datetime.fromisoformat(row.created_at) if isinstance(row.created_at, str) else row.created_at,
+        )
+        for row in rows
+    ]
+    return int(total or 0), hits
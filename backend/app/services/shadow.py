@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, Optional
+
+import numpy as np
+
+from ..config import get_settings
+from .nlp import NLPService, load_nlp_service
+
+LOGGER = logging.getLogger(__name__)
+
+# Niceness of the shadow worker thread; the scheduler favours request threads when the CPU is busy
+SHADOW_NICENESS = 10
+
+
+@dataclass
+class ShadowSample:
+    question: str
+    answer: str
+    category: Optional[str]
+    confidence: Optional[float]
+    seconds: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class ShadowDisagreement:
+    question: str
+    primary_category: Optional[str]
+    candidate_category: Optional[str]
+    primary_confidence: Optional[float]
+    candidate_confidence: Optional[float]
+    at: datetime = field(default_factory=datetime.utcnow)
+
+
+class ShadowEvaluator:
+    """Replays a sample of live questions against a candidate model, off the request path.
+
+    ``offer`` is called by the chat endpoints after the primary answer is
+    ready. It never blocks: a question is sampled with ``sample_rate`` and put
+    on a queue of at most ``queue_size`` entries, and is dropped when the queue
+    is full. A single low-priority worker thread answers queued questions with
+    the candidate and records agreement with the primary answer, the
+    confidence delta and both latencies. Questions that waited longer than
+    ``max_delay_seconds`` are skipped, so a backlog built up under load is
+    discarded instead of competing with the traffic that caused it. After
+    each prediction the worker rests long enough to stay busy for at most
+    ``duty_cycle`` of the time; niceness alone does not cover the torch
+    intra-op threads the candidate shares with the primary model.
+    """
+
+    def __init__(
+        self,
+        candidate: NLPService,
+        bot_id: str,
+        sample_rate: float,
+        queue_size: int,
+        max_delay_seconds: float,
+        duty_cycle: float = 0.25,
+        window: int = 1000,
+        disagreements_kept: int = 20,
+    ):
+        self.candidate = candidate
+        self.bot_id = bot_id
+        self.sample_rate = sample_rate
+        self.max_delay_seconds = max_delay_seconds
+        self.duty_cycle = min(max(duty_cycle, 0.01), 1.0)
+        self.started_at = datetime.utcnow()
+        self.counts: Dict[str, int] = {
+            "sampled": 0,
+            "evaluated": 0,
+            "agreed": 0,
+            "dropped": 0,
+            "stale": 0,
+            "failed": 0,
+        }
+        self._queue: "queue.Queue[ShadowSample]" = queue.Queue(maxsize=max(1, queue_size))
+        # Rolling windows for the latency percentiles and confidence deltas
+        self._primary_seconds: Deque[float] = deque(maxlen=window)
+        self._candidate_seconds: Deque[float] = deque(maxlen=window)
+        self._confidence_deltas: Deque[float] = deque(maxlen=window)
+        self.disagreements: Deque[ShadowDisagreement] = deque(maxlen=disagreements_kept)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.maxsize
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def offer(
+        self,
+        question: str,
+        answer: str,
+        category: Optional[str],
+        confidence: Optional[float],
+        seconds: float,
+    ) -> bool:
+        """Queue a served question for the candidate; returns False if it was not sampled or the queue is full."""
+        if self._stop.is_set() or random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait(ShadowSample(question, answer, category, confidence, seconds))
+        except queue.Full:
+            self.counts["dropped"] += 1
+            return False
+        self.counts["sampled"] += 1
+        return True
+
+    def evaluate(self, sample: ShadowSample) -> None:
+        started = time.perf_counter()
+        answer = self.candidate.predict(sample.question)
+        elapsed = time.perf_counter() - started
+
+        self.counts["evaluated"] += 1
+        self._primary_seconds.append(sample.seconds)
+        self._candidate_seconds.append(elapsed)
+        if sample.confidence is not None and answer.confidence is not None:
+            self._confidence_deltas.append(answer.confidence - sample.confidence)
+        # Same label means same answer text; categories alone are shared by many labels
+        if answer.text == sample.answer:
+            self.counts["agreed"] += 1
+        else:
+            self.disagreements.append(
+                ShadowDisagreement(
+                    question=sample.question,
+                    primary_category=sample.category,
+                    candidate_category=answer.category,
+                    primary_confidence=sample.confidence,
+                    candidate_confidence=answer.confidence,
+                )
+            )
+
+    def _loop(self) -> None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SHADOW_NICENESS)
+        except (AttributeError, OSError):  # pragma: no cover - per-thread niceness is Linux only
+            pass
+        while not self._stop.is_set():
+            try:
+                sample = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if time.monotonic() - sample.enqueued_at > self.max_delay_seconds:
+                self.counts["stale"] += 1
+                continue
+            started = time.perf_counter()
+            try:
+                self.evaluate(sample)
+            except Exception:  # noqa: BLE001 - a failing candidate must not stop the worker
+                LOGGER.exception("Shadow prediction failed")
+                self.counts["failed"] += 1
+            busy = time.perf_counter() - started
+            self._stop.wait(busy * (1.0 / self.duty_cycle - 1.0))
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="shadow", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Agreement rate, confidence deltas (candidate minus primary) and latency percentiles in ms."""
+        evaluated = self.counts["evaluated"]
+        deltas = np.array(self._confidence_deltas, dtype=np.float64)
+        primary = np.array(self._primary_seconds, dtype=np.float64) * 1000
+        candidate = np.array(self._candidate_seconds, dtype=np.float64) * 1000
+
+        def percentile(values: np.ndarray, q: float) -> Optional[float]:
+            return float(np.percentile(values, q)) if values.size else None
+
+        return {
+            "agreement_rate": self.counts["agreed"] / evaluated if evaluated else None,
+            "mean_confidence_delta": float(deltas.mean()) if deltas.size else None,
+            "mean_abs_confidence_delta": float(np.abs(deltas).mean()) if deltas.size else None,
+            "primary_p50_ms": percentile(primary, 50),
+            "primary_p95_ms": percentile(primary, 95),
+            "candidate_p50_ms": percentile(candidate, 50),
+            "candidate_p95_ms": percentile(candidate, 95),
+        }
+
+
+class ShadowController:
+    """Holds the one shadow evaluation that may run at a time and its load state.
+
+    ``bot_id`` and ``model_dir`` always describe the running evaluator; a
+    candidate being loaded is kept in the ``pending_*`` fields until it
+    replaces it, so a failed load leaves the running evaluation untouched.
+    """
+
+    def __init__(self) -> None:
+        self.evaluator: Optional[ShadowEvaluator] = None
+        self.state = "idle"  # idle | loading | running | failed
+        self.bot_id: Optional[str] = None
+        self.model_dir: Optional[Path] = None
+        self.pending_bot_id: Optional[str] = None
+        self.pending_model_dir: Optional[Path] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def offer(
+        self,
+        bot_id: str,
+        question: str,
+        answer: str,
+        category: Optional[str],
+        confidence: Optional[float],
+        seconds: float,
+    ) -> None:
+        evaluator = self.evaluator
+        if evaluator is not None and evaluator.bot_id == bot_id:
+            evaluator.offer(question, answer, category, confidence, seconds)
+
+    def begin(self, bot_id: str, model_dir: Path) -> bool:
+        """Mark a candidate as loading; returns False if one is already loading."""
+        with self._lock:
+            if self.state == "loading":
+                return False
+            self.state, self.pending_bot_id, self.pending_model_dir, self.error = "loading", bot_id, model_dir, None
+            return True
+
+    def _is_pending(self, bot_id: str, model_dir: Path) -> bool:
+        """Whether this candidate is still the one expected (caller holds ``_lock``); False after ``stop``."""
+        return self.state == "loading" and (self.pending_bot_id, self.pending_model_dir) == (bot_id, model_dir)
+
+    def start(
+        self,
+        bot_id: str,
+        model_dir: Path,
+        vector_store_path: Optional[Path] = None,
+        sample_rate: Optional[float] = None,
+    ) -> None:
+        """Load the candidate and replace the running shadow with it. Must follow a successful ``begin``."""
+        settings = get_settings()
+        try:
+            candidate = load_nlp_service(model_dir, vector_store_path=vector_store_path)
+        except Exception as exc:  # noqa: BLE001 - reported through the status endpoint
+            LOGGER.exception("Loading shadow candidate from %s failed", model_dir)
+            with self._lock:
+                if self._is_pending(bot_id, model_dir):
+                    self.pending_bot_id, self.pending_model_dir, self.error = None, None, str(exc)
+                    # A running evaluation keeps going; only the failed candidate is reported
+                    self.state = "running" if self.evaluator is not None else "failed"
+            return
+        evaluator = ShadowEvaluator(
+            candidate,
+            bot_id=bot_id,
+            sample_rate=settings.shadow_sample_rate if sample_rate is None else sample_rate,
+            queue_size=settings.shadow_queue_size,
+            max_delay_seconds=settings.shadow_max_delay_seconds,
+            duty_cycle=settings.shadow_duty_cycle,
+        )
+        with self._lock:
+            if not self._is_pending(bot_id, model_dir):
+                # Stopped while the candidate was loading
+                return
+            previous, self.evaluator = self.evaluator, evaluator
+            self.state, self.bot_id, self.model_dir = "running", bot_id, model_dir
+            self.pending_bot_id = self.pending_model_dir = None
+            evaluator.start()
+        if previous is not None:
+            previous.stop()
+        LOGGER.info("Shadowing bot %s with %s (sample rate %.2f)", bot_id, model_dir, evaluator.sample_rate)
+
+    def stop(self) -> None:
+        with self._lock:
+            previous, self.evaluator = self.evaluator, None
+            self.state, self.bot_id, self.model_dir, self.error = "idle", None, None, None
+            self.pending_bot_id = self.pending_model_dir = None
+        if previous is not None:
+            previous.stop()
+
+
+_controller = ShadowController()
+
+
+def get_shadow_controller() -> ShadowController:
+    return _controller
@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+
+from .preprocessing import fold_ascii
+from .vector_store import SimilarQuestion
+
+# Words shorter than this are only restored from their ASCII-folded form, never edited:
+# "ders" is one substitution away from too many other short words
+MIN_CORRECTION_LENGTH = 4
+# Words up to this length allow a single edit, longer ones the index's maximum
+SHORT_WORD_LENGTH = 5
+# Character trigrams are taken from the folded question padded with one space on each side
+NGRAM_SIZE = 3
+
+
+def _deletes(word: str, max_distance: int) -> set[str]:
+    """Every string reachable from ``word`` by removing up to ``max_distance`` characters."""
+    found = {word}
+    frontier = [word]
+    for _ in range(max_distance):
+        next_frontier = []
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for position in range(len(item)):
+                shorter = item[:position] + item[position + 1 :]
+                if shorter not in found:
+                    found.add(shorter)
+                    next_frontier.append(shorter)
+        frontier = next_frontier
+    return found
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent swaps), capped at ``limit + 1``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def char_ngrams(folded: str) -> set[str]:
+    padded = f" {folded} "
+    return {padded[start : start + NGRAM_SIZE] for start in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+@dataclass
+class CorrectedQuery:
+    text: str
+    # (typed word, replacement, edit distance on the folded forms)
+    corrections: List[Tuple[str, str, int]] = field(default_factory=list)
+
+
+class TypoIndex:
+    """Precomputed lookups that make ASCII-typed or misspelled queries match the training data.
+
+    Two structures are built from the normalized training questions:
+
+    * a symmetric-delete spelling index over their words. Words are keyed by
+      their ASCII-folded form, so "baslangic" is restored to "başlangıç" with a
+      dictionary lookup, and every folded word is stored under all strings
+      reachable by deleting up to ``max_distance`` characters from its first
+      ``prefix_length`` characters. A misspelling shares at least one of those
+      deletes with the intended word, so candidates come from a few dictionary
+      lookups instead of a scan over the vocabulary.
+    * an inverted index of character trigrams of the folded questions, used to
+      find near-identical questions by Dice similarity when whole words are
+      still garbled after correction.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Sequence[str],
+        canonical: Dict[str, str],
+        frequency: Dict[str, int],
+        deletes: Dict[str, Tuple[str, ...]],
+        gram_ids: Dict[str, int],
+        gram_offsets: np.ndarray,
+        gram_rows: np.ndarray,
+        question_grams: np.ndarray,
+        metadata: List[Dict[str, Any]],
+        max_distance: int = 2,
+        prefix_length: int = 7,
+        cache_size: int = 8192,
+    ):
+        self.vocabulary = tuple(vocabulary)
+        self.canonical = canonical
+        self.frequency = frequency
+        self.deletes = deletes
+        self.gram_ids = gram_ids
+        self.gram_offsets = gram_offsets
+        self.gram_rows = gram_rows
+        self.question_grams = question_grams
+        self.metadata = metadata
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # Every spelling seen in training is kept as typed, not only the canonical one per folded key
+        self.known_words = frozenset(self.vocabulary)
+        # Query words repeat far more often than whole queries, so corrections are cached per word
+        self._correct_word = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @classmethod
+    def load(cls, path: Path | str) -> Optional["TypoIndex"]:
+        file_path = Path(path)
+        if not file_path.exists():
+            return None
+        return cls(**joblib.load(file_path))
+
+    def save(self, path: Path | str) -> None:
+        joblib.dump(
+            {
+                "vocabulary": self.vocabulary,
+                "canonical": self.canonical,
+                "frequency": self.frequency,
+                "deletes": self.deletes,
+                "gram_ids": self.gram_ids,
+                "gram_offsets": self.gram_offsets,
+                "gram_rows": self.gram_rows,
+                "question_grams": self.question_grams,
+                "metadata": self.metadata,
+                "max_distance": self.max_distance,
+                "prefix_length": self.prefix_length,
+            },
+            Path(path),
+        )
+
+    def _lookup(self, word: str) -> Tuple[str, int]:
+        folded = fold_ascii(word)
+        if folded in self.canonical:
+            return self.canonical[folded], 0
+        if len(folded) < MIN_CORRECTION_LENGTH or not folded.isalpha():
+            return word, 0
+
+        max_limit = min(self.max_distance, 1) if len(folded) <= SHORT_WORD_LENGTH else self.max_distance
+        # Most typos are a single edit; the wider distance-2 neighbourhood is only searched when needed
+        for limit in range(1, max_limit + 1):
+            candidates: set[str] = set()
+            for key in _deletes(folded[: self.prefix_length], limit):
+                candidates.update(self.deletes.get(key, ()))
+
+            best: Optional[Tuple[int, int, str]] = None
+            for candidate in candidates:
+                distance = edit_distance(folded, candidate, limit)
+                if distance > limit:
+                    continue
+                rank = (distance, -self.frequency[candidate], candidate)
+                if best is None or rank < best:
+                    best = rank
+            if best is not None:
+                return self.canonical[best[2]], best[0]
+        return word, 0
+
+    def correct(self, normalized: str) -> CorrectedQuery:
+        """Restore Turkish letters and fix misspelled words of a normalized query.
+
+        Words that already occur in the training questions are left alone, as are
+        words with no vocabulary entry within the allowed edit distance.
+        """
+        words = normalized.split()
+        corrections: List[Tuple[str, str, int]] = []
+        for position, word in enumerate(words):
+            if word in self.known_words:
+                continue
+            replacement, distance = self._correct_word(word)
+            if replacement != word:
+                corrections.append((word, replacement, distance))
+                words[position] = replacement
+        if not corrections:
+            return CorrectedQuery(normalized)
+        return CorrectedQuery(" ".join(words), corrections)
+
+    def match(self, normalized: str, top_k: int = 3, min_similarity: float = 0.6) -> List[SimilarQuestion]:
+        """Training questions whose folded character trigrams overlap the query's (Dice coefficient)."""
+        query_grams = char_ngrams(fold_ascii(normalized))
+        grams = [self.gram_ids[gram] for gram in query_grams if gram in self.gram_ids]
+        if not grams:
+            return []
+        rows = np.concatenate([self.gram_rows[self.gram_offsets[g] : self.gram_offsets[g + 1]] for g in grams])
+        shared = np.bincount(rows, minlength=len(self.question_grams))
+        similarity = 2.0 * shared / (self.question_grams + len(query_grams))
+
+        candidates = np.flatnonzero(similarity >= min_similarity)
+        best = candidates[np.lexsort((candidates, -similarity[candidates]))][:top_k]
+        results: List[SimilarQuestion] = []
+        for idx in best:
+            item = self.metadata[idx]
+            results.append(
+                SimilarQuestion(
+                    question=item.get("question", ""),
+                    answer=item.get("answer", ""),
+                    category=item.get("category"),
+                    subcategory=item.get("subcategory"),
+                    score=float(similarity[idx]),
+                    tags=item.get("tags", []),
+                    suggested_links=item.get("suggested_links", []),
+                )
+            )
+        return results
+
+    def cache_info(self):
+        return self._correct_word.cache_info()
+
+
+def build_typo_index(
+    normalized_questions: Sequence[str],
+    metadata: List[Dict[str, Any]],
+    max_distance: int = 2,
+    prefix_length: int = 7,
+) -> TypoIndex:
+    """Build the spelling and trigram indexes from normalized training questions."""
+    counts: Counter[str] = Counter()
+    for question in normalized_questions:
+        counts.update(question.split())
+
+    # Several spellings can fold to the same key ("süre" and "sure"); the most frequent one wins
+    canonical: Dict[str, str] = {}
+    frequency: Dict[str, int] = defaultdict(int)
+    for word, count in counts.most_common():
+        if any(char.isdigit() for char in word):
+            continue
+        folded = fold_ascii(word)
+        canonical.setdefault(folded, word)
+        frequency[folded] += count
+
+    deletes: Dict[str, List[str]] = defaultdict(list)
+    for folded in canonical:
+        for key in _deletes(folded[:prefix_length], max_distance):
+            deletes[key].append(folded)
+
+    gram_ids: Dict[str, int] = {}
+    postings: Dict[int, List[int]] = defaultdict(list)
+    question_grams = np.zeros(len(normalized_questions), dtype=np.int32)
+    for row, question in enumerate(normalized_questions):
+        grams = char_ngrams(fold_ascii(question))
+        question_grams[row] = len(grams)
+        for gram in grams:
+            postings[gram_ids.setdefault(gram, len(gram_ids))].append(row)
+    sizes = np.array([len(postings[g]) for g in range(len(gram_ids))], dtype=np.int64)
+    gram_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    gram_rows = np.fromiter(
+        (row for g in range(len(gram_ids)) for row in postings[g]), dtype=np.int32, count=int(sizes.sum())
+    )
+
+    return TypoIndex(
+        vocabulary=sorted(counts),
+        canonical=canonical,
+        frequency=dict(frequency),
+        deletes={key: tuple(words) for key, words in deletes.items()},
+        gram_ids=gram_ids,
+        gram_offsets=gram_offsets,
+        gram_rows=gram_rows,
+        question_grams=question_grams,
+        metadata=metadata,
+        max_distance=max_distance,
+        prefix_length=prefix_length,
+    )
+
+
+def load_typo_index(path: Path | str | None) -> Optional[TypoIndex]:
+    if not path:
+        return None
+    return TypoIndex.load(path)
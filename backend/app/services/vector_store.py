@@ -9,6 +9,7 @@ import numpy as np
 from sklearn.metrics.pairwise import linear_kernel
 
 from .preprocessing import normalize_text
+from .query_encoder import QueryEncoder
 
 
 @dataclass
@@ -23,10 +24,13 @@ class SimilarQuestion:
 
 
 class VectorStore:
-    def __init__(self, vectorizer, matrix, metadata: List[Dict[str, Any]]):
+    def __init__(self, vectorizer, matrix, metadata: List[Dict[str, Any]], fast_queries: bool = True):
         self.vectorizer = vectorizer
         self.matrix = matrix
         self.metadata = metadata
+        self.encoder = QueryEncoder.from_vectorizer(vectorizer) if fast_queries else None
+        # Column-major copy: a query touches a handful of terms, so scores are summed per term column
+        self._columns = matrix.tocsc() if self.encoder is not None else None
 
     @classmethod
     def load(cls, path: Path | str) -> Optional["VectorStore"]:
@@ -40,19 +44,32 @@ class VectorStore:
             metadata=payload["metadata"],
         )
 
+    def scores(self, normalized: str) -> np.ndarray:
+        """Cosine similarity of a normalized query to every stored question."""
+        if self.encoder is None:
+            return linear_kernel(self.vectorizer.transform([normalized]), self.matrix).flatten()
+        indices, weights = self.encoder.encode(normalized)
+        if len(indices) == 0:
+            return np.zeros(self.matrix.shape[0])
+        columns = self._columns
+        starts, ends = columns.indptr[indices], columns.indptr[indices + 1]
+        rows = np.concatenate([columns.indices[start:end] for start, end in zip(starts, ends)])
+        values = np.concatenate(
+            [columns.data[start:end] * weight for start, end, weight in zip(starts, ends, weights)]
+        )
+        return np.bincount(rows, weights=values, minlength=self.matrix.shape[0])
+
     def search(self, query: str, top_k: int = 5, score_threshold: float = 0.3) -> List[SimilarQuestion]:
         if not query.strip():
             return []
-        normalized = normalize_text(query)
-        query_vector = self.vectorizer.transform([normalized])
-        scores = linear_kernel(query_vector, self.matrix).flatten()
-        top_indices = np.argsort(scores)[::-1][:top_k]
+        scores = self.scores(normalize_text(query))
+        # Only questions above the threshold can be returned; sort just those
+        candidates = np.flatnonzero(scores >= score_threshold)
+        top_indices = candidates[np.lexsort((-candidates, -scores[candidates]))][:top_k]
 
         results: List[SimilarQuestion] = []
         for idx in top_indices:
             score = float(scores[idx])
-            if score < score_threshold:
-                continue
             item = self.metadata[idx]
             results.append(
                 SimilarQuestion(
@@ -0,0 +1,13 @@
+from .artifacts import model_artifact_hash
+from .cpu import active_topology, apply_topology, available_cpus, plan_topology, CpuTopology
+from .singleflight import SingleFlight
+
+__all__ = [
+    "model_artifact_hash",
+    "active_topology",
+    "apply_topology",
+    "available_cpus",
+    "plan_topology",
+    "CpuTopology",
+    "SingleFlight",
+]
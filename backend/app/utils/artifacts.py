@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+# Files that determine what the classifier predicts. Retrieval artifacts such as
+# vector_store.joblib are left out on purpose: they do not change the label. The
+# typo index is included because it rewrites the query the classifier sees.
+MODEL_ARTIFACT_PATTERNS = (
+    "config.json",
+    "label_mapping.json",
+    "inference_config.json",
+    "early_exit.json",
+    "early_exit_heads.pt",
+    "typo_index.joblib",
+    "*.safetensors",
+    "*.bin",
+    "tokenizer*.json",
+    "vocab.txt",
+    "special_tokens_map.json",
+)
+
+
+def model_artifact_hash(model_dir: Path) -> str:
+    """Return a content hash of the classification artifacts in ``model_dir``."""
+    if not model_dir.exists():
+        raise FileNotFoundError(f"Model directory not found: {model_dir}")
+
+    files = sorted({path for pattern in MODEL_ARTIFACT_PATTERNS for path in model_dir.glob(pattern) if path.is_file()})
+    if not files:
+        raise FileNotFoundError(f"No model artifacts found in {model_dir}")
+
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(path.name.encode("utf-8"))
+        with path.open("rb") as fp:
+            for block in iter(lambda: fp.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
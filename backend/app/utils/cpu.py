@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+# Keeps the slot lock file open (and locked) for the lifetime of the worker
+_slot_handle = None
+_active: Optional["CpuTopology"] = None
+
+
+def cgroup_cpu_limit(root: Path = _CGROUP_ROOT) -> Optional[float]:
+    """Return the container CPU quota in cores, or None when unlimited or unknown."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        quota, period = (root / "cpu.max").read_text().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        quota = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def usable_cores() -> List[int]:
+    """CPU ids this process may run on (affinity mask), falling back to 0..cpu_count-1."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def available_cpus() -> int:
+    """Cores the process can actually use: affinity mask capped by the cgroup quota."""
+    cores = len(usable_cores())
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cores = min(cores, max(1, math.floor(limit)))
+    return max(1, cores)
+
+
+@dataclass
+class CpuTopology:
+    cpus: int
+    workers: int
+    intra_op_threads: int
+    inter_op_threads: int
+    tokenizer_threads: int
+    max_concurrent_inference: int
+    worker_slot: Optional[int] = None
+    pinned_cores: List[int] = field(default_factory=list)
+
+
+def plan_topology(
+    cpus: int,
+    workers: int,
+    intra_op_threads: Optional[int] = None,
+    inter_op_threads: Optional[int] = None,
+    tokenizer_threads: Optional[int] = None,
+    max_concurrent_inference: Optional[int] = None,
+) -> CpuTopology:
+    """Split ``cpus`` between ``workers`` processes; unset values are derived.
+
+    Each worker gets an equal share of cores for torch's intra-op pool and runs
+    as many forward passes at once as fit in that share, so workers x threads
+    never exceeds the cores available.
+    """
+    workers = max(1, workers)
+    share = max(1, cpus // workers)
+    intra = intra_op_threads or share
+    return CpuTopology(
+        cpus=cpus,
+        workers=workers,
+        intra_op_threads=intra,
+        # A single request is one sequential forward pass; inter-op parallelism only adds threads
+        inter_op_threads=inter_op_threads or 1,
+        # Queries are tokenized one at a time, Rayon's pool would sit idle
+        tokenizer_threads=tokenizer_threads or 1,
+        max_concurrent_inference=max_concurrent_inference or max(1, share // intra),
+    )
+
+
+def claim_worker_slot(workers: int, lock_dir: Optional[Path] = None) -> Optional[int]:
+    """Take the first free slot 0..workers-1 with an exclusive file lock.
+
+    uvicorn does not tell a worker its index, so workers race for lock files
+    instead; a slot is released automatically when its process exits.
+    """
+    global _slot_handle
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - Windows
+        return None
+
+    lock_dir = lock_dir or Path(tempfile.gettempdir()) / f"chatbot-cpu-slots-{os.getppid()}"
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    for slot in range(workers):
+        handle = open(lock_dir / f"slot-{slot}.lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _slot_handle = handle
+        return slot
+    return None
+
+
+def cores_for_slot(cores: List[int], slot: int, workers: int) -> List[int]:
+    share = max(1, len(cores) // max(1, workers))
+    begin = (slot * share) % len(cores)
+    return cores[begin : begin + share]
+
+
+def set_thread_env(topology: CpuTopology) -> None:
+    """Thread limits for native pools that read the environment when they start."""
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(topology.intra_op_threads)
+    os.environ["RAYON_NUM_THREADS"] = str(topology.tokenizer_threads)
+    if topology.tokenizer_threads <= 1:
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+
+def apply_topology(topology: CpuTopology, pin: bool = False) -> CpuTopology:
+    """Configure torch, the tokenizer and (optionally) core affinity for this process.
+
+    Must run before the model is loaded: torch fixes its inter-op pool size on
+    first use and Rayon reads its thread count once.
+    """
+    global _active
+    import torch
+
+    set_thread_env(topology)
+    torch.set_num_threads(topology.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(topology.inter_op_threads)
+    except RuntimeError:
+        LOGGER.warning("torch inter-op pool already started; keeping %s threads", torch.get_num_interop_threads())
+        topology.inter_op_threads = torch.get_num_interop_threads()
+
+    if pin and hasattr(os, "sched_setaffinity"):
+        slot = claim_worker_slot(topology.workers)
+        if slot is not None:
+            cores = cores_for_slot(usable_cores(), slot, topology.workers)
+            os.sched_setaffinity(0, cores)
+            topology.worker_slot = slot
+            topology.pinned_cores = cores
+
+    LOGGER.info(
+        "CPU topology: %s cores, %s workers, %s intra-op / %s inter-op threads, %s concurrent inference, cores %s",
+        topology.cpus,
+        topology.workers,
+        topology.intra_op_threads,
+        topology.inter_op_threads,
+        topology.max_concurrent_inference,
+        topology.pinned_cores or "unpinned",
+    )
+    _active = topology
+    return topology
+
+
+def active_topology() -> Optional[CpuTopology]:
+    """The topology applied to this process, if ``apply_topology`` has run."""
+    return _active
@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import json
+import logging
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Request ids end up in file names; anything else is replaced by a generated id
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+ARTIFACTS = {"flamegraph": ".folded", "pstats": ".pstats", "torch": ".trace.json"}
+
+_ROOT_PREFIX = Path(__file__).resolve().parents[2].as_posix() + "/"
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+# The torch profiler is process-wide; concurrent profiled requests skip the trace instead of failing
+_torch_lock = threading.Lock()
+
+
+def _short_path(filename: str) -> str:
+    filename = filename.replace("\\", "/")
+    if "site-packages/" in filename:
+        return filename.split("site-packages/", 1)[1]
+    if filename.startswith(_ROOT_PREFIX):
+        return filename[len(_ROOT_PREFIX) :]
+    return "/".join(filename.rsplit("/", 2)[-2:])
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame) -> str:
+    """Root-first ``a;b;c`` stack, the collapsed format flamegraph.pl and speedscope read."""
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples the Python stacks of registered threads at a fixed interval.
+
+    Only runs while a profiled request is attached, so unprofiled traffic never
+    pays for it.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self._threads: set[int] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, ident: int) -> None:
+        with self._lock:
+            self._threads.add(ident)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def discard(self, ident: int) -> None:
+        with self._lock:
+            self._threads.discard(ident)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                idents = list(self._threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.counts[fold_stack(frame)] += 1
+                    self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class RequestProfile:
+    """Profiling state of one request; work is captured in whichever threads attach to it."""
+
+    def __init__(self, request_id: str, method: str, path: str, trigger: str, interval: float, torch_trace: bool):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.torch_trace = torch_trace
+        self.started_at = datetime.utcnow()
+        self.status_code: Optional[int] = None
+        self.duration_ms = 0.0
+        self.attached = False
+        self.sampler = StackSampler(interval)
+        self._started = time.perf_counter()
+        self._profilers: List[cProfile.Profile] = []
+        self._torch_profilers: list = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def attach(self) -> Iterator[None]:
+        """Profile the calling thread (cProfile, stack samples and torch ops) until the block exits."""
+        self.attached = True
+        # Torch first and last, so starting and stopping it stays out of the Python profiles
+        torch_profiler = self._start_torch()
+        ident = threading.get_ident()
+        self.sampler.add(ident)
+        profiler: Optional[cProfile.Profile] = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler already owns this thread
+            profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                with self._lock:
+                    self._profilers.append(profiler)
+            self.sampler.discard(ident)
+            if torch_profiler is not None:
+                self._stop_torch(torch_profiler)
+
+    def _start_torch(self):
+        if not self.torch_trace or not _torch_lock.acquire(blocking=False):
+            return None
+        try:
+            import torch
+
+            torch_profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+            torch_profiler.start()
+            return torch_profiler
+        except Exception:  # noqa: BLE001 - a broken trace must not fail the request
+            _torch_lock.release()
+            LOGGER.exception("Could not start torch profiler")
+            return None
+
+    def _stop_torch(self, torch_profiler) -> None:
+        try:
+            torch_profiler.stop()
+            with self._lock:
+                self._torch_profilers.append(torch_profiler)
+        except Exception:  # noqa: BLE001
+            LOGGER.exception("Could not stop torch profiler")
+        finally:
+            _torch_lock.release()
+
+    def finish(self, status_code: Optional[int]) -> None:
+        self.sampler.stop()
+        self.status_code = status_code
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+
+    def stats(self) -> Optional[pstats.Stats]:
+        if not self._profilers:
+            return None
+        stats = pstats.Stats(self._profilers[0])
+        for profiler in self._profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+    def trace(self) -> Optional[dict]:
+        """Chrome trace of all torch ops; exported only when the profile is stored, off the request path."""
+        events: List[dict] = []
+        for torch_profiler in self._torch_profilers:
+            if not torch_profiler.events():
+                continue
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "trace.json"
+                torch_profiler.export_chrome_trace(str(path))
+                with path.open("r", encoding="utf-8") as fp:
+                    events.extend(json.load(fp).get("traceEvents", []))
+        return {"traceEvents": events} if events else None
+
+
+def top_functions(stats: Optional[pstats.Stats], limit: int = 30) -> List[Dict[str, Any]]:
+    """Functions with the largest cumulative time, from merged cProfile stats."""
+    if stats is None:
+        return []
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append(
+            {
+                "function": f"{name} ({_short_path(filename)}:{line})",
+                "calls": calls,
+                "total_ms": total * 1000,
+                "cumulative_ms": cumulative * 1000,
+            }
+        )
+    return sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[:limit]
+
+
+class ProfileStore:
+    """Profiles on disk, one set of files per request id, so every worker can serve them."""
+
+    def __init__(self, directory: Path, keep: int):
+        self.directory = directory
+        self.keep = keep
+
+    def _path(self, request_id: str, suffix: str) -> Path:
+        return self.directory / f"{request_id}{suffix}"
+
+    def save(self, profile: RequestProfile) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stats = profile.stats()
+        trace = profile.trace()
+        if stats is not None:
+            stats.dump_stats(self._path(profile.request_id, ARTIFACTS["pstats"]))
+        self._path(profile.request_id, ARTIFACTS["flamegraph"]).write_text(profile.sampler.folded(), encoding="utf-8")
+        if trace is not None:
+            with self._path(profile.request_id, ARTIFACTS["torch"]).open("w", encoding="utf-8") as fp:
+                json.dump(trace, fp)
+        record = {
+            "request_id": profile.request_id,
+            "method": profile.method,
+            "path": profile.path,
+            "trigger": profile.trigger,
+            "status_code": profile.status_code,
+            "started_at": profile.started_at.isoformat(),
+            "duration_ms": profile.duration_ms,
+            "samples": profile.sampler.samples,
+            "sample_interval_ms": profile.sampler.interval * 1000,
+            "has_torch_trace": trace is not None,
+            "top_functions": top_functions(stats),
+        }
+        # Metadata last: a profile is listed only once all of its files exist
+        with self._path(profile.request_id, ".json").open("w", encoding="utf-8") as fp:
+            json.dump(record, fp, ensure_ascii=False, indent=2)
+        self._prune()
+
+    def _prune(self) -> None:
+        records = sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+        records = [path for path in records if not path.name.endswith(ARTIFACTS["torch"])]
+        for path in records[self.keep :]:
+            request_id = path.name[: -len(".json")]
+            for suffix in (".json", *ARTIFACTS.values()):
+                self._path(request_id, suffix).unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        records = []
+        for path in self.directory.glob("*.json"):
+            if path.name.endswith(ARTIFACTS["torch"]):
+                continue
+            with path.open("r", encoding="utf-8") as fp:
+                records.append(json.load(fp))
+        return sorted(records, key=lambda record: record["started_at"], reverse=True)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        if not REQUEST_ID_PATTERN.match(request_id):
+            return None
+        path = self._path(request_id, ".json")
+        if not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as fp:
+            return json.load(fp)
+
+    def artifact(self, request_id: str, artifact: str) -> Optional[Path]:
+        if not REQUEST_ID_PATTERN.match(request_id) or artifact not in ARTIFACTS:
+            return None
+        path = self._path(request_id, ARTIFACTS[artifact])
+        return path if path.exists() else None
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles a request when asked to or when sampled.
+
+    ``X-Profile: 1`` together with a valid ``X-Admin-Token`` always profiles;
+    otherwise a ``sample_rate`` fraction of requests is. The profile id is
+    returned in ``X-Profile-Id``; only admin-triggered profiles may choose it
+    with ``X-Request-ID``, so an anonymous sampled request cannot overwrite an
+    existing profile. Unprofiled requests are passed straight through.
+    """
+
+    def __init__(
+        self,
+        app,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        admin_token: Optional[str] = None,
+        interval: float = 0.002,
+        torch_trace: bool = True,
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token.encode() if admin_token else None
+        self.interval = interval
+        self.torch_trace = torch_trace
+
+    def _trigger(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        if self.admin_token and headers.get(b"x-profile") in (b"1", b"true") and headers.get(b"x-admin-token") == self.admin_token:
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        trigger = self._trigger(headers)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        requested_id = headers.get(b"x-request-id", b"").decode("latin-1") if trigger == "header" else ""
+        request_id = requested_id if REQUEST_ID_PATTERN.match(requested_id) else uuid.uuid4().hex
+        profile = RequestProfile(request_id, scope["method"], scope["path"], trigger, self.interval, self.torch_trace)
+        status: Dict[str, int] = {}
+
+        async def send_with_id(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", request_id.encode())]}
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            profile.finish(status.get("code"))
+            # Sampled requests to endpoints without profiling hooks have nothing worth keeping
+            if profile.attached or trigger == "header":
+                try:
+                    await run_in_threadpool(self.store.save, profile)
+                except Exception:  # noqa: BLE001
+                    LOGGER.exception("Could not store profile %s", request_id)
+
+
+def profiled(func: Callable[..., T]) -> Callable[..., T]:
+    """Capture a sync endpoint's work in the current request profile, if there is one."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        with profile.attach():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def profiled_iterator(iterator: Iterator[T]) -> Iterator[T]:
+    """Profile each step of a streaming body, which Starlette runs outside the endpoint call."""
+    profile = _current.get()
+    if profile is None:
+        return iterator
+    return _attached_steps(profile, iterator)
+
+
+def _attached_steps(profile: RequestProfile, iterator: Iterator[T]) -> Iterator[T]:
+    while True:
+        with profile.attach():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
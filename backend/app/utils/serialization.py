@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+from datetime import date, datetime
+from typing import Any, Sequence
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up, the stdlib encoder gives the same JSON
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, datetime) and value.utcoffset() is not None and not value.utcoffset():
+        return value.replace(tzinfo=None).isoformat() + "Z"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode plain dicts, lists and datetimes to compact UTF-8 JSON.
+
+    Output matches what FastAPI produces for the equivalent response model:
+    no ASCII escaping, ISO 8601 datetimes and "Z" for UTC offsets.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for content that is already in the shape of its response model.
+
+    Returning a response object makes FastAPI skip ``response_model``
+    validation and serialization, so handlers that build trusted payloads from
+    row tuples or their own service objects pay for a single encoding pass.
+    Keep ``response_model`` on the route for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_keys(model: type[BaseModel], fields: Sequence[str]) -> tuple[str, ...]:
+    """JSON keys (aliases) a model gives ``fields``, so hand-built payloads stay in sync with the schema."""
+    keys = []
+    for name in fields:
+        field = model.model_fields[name]
+        keys.append(field.serialization_alias or field.alias or name)
+    return tuple(keys)
@@ -0,0 +1,155 @@
+"""CPU eğitim profilini tam ince ayarla aynı veri bölmesinde karşılaştırır.
+
+İki model aynı başlangıç ağırlıklarından, aynı tohum ve aynı eğitim/doğrulama
+bölmesiyle eğitilir:
+
+* Tam ince ayar: bütün parametreler eğitilir, her soru --max-length'e doldurulur.
+* CPU profili: train_classifier.py --cpu-profile ile aynı ayarlar (gömme katmanı
+  ve kodlayıcının alt yarısı dondurulur, yığın bazında doldurma, destekleyen
+  işlemcilerde bf16, boşta çekirdek varsa veri yükleyici işçileri).
+
+Her biri için saniyedeki örnek sayısı, eğitim süresi, eğitilen parametre sayısı
+ve doğrulama kümesindeki doğruluk ile ağırlıklı F1 raporlanır. Dondurulan
+katmanlar daha yavaş öğrendiğinden eşit süreli bir karşılaştırma için profile
+daha fazla epoch verilebilir (--profile-args "--epochs 6"). Hızlı bir ölçüm
+için --max-rows ile veri alt kümesi kullanılabilir.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import shlex
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pandas as pd
+from transformers import AutoModelForSequenceClassification, AutoTokenizer, Trainer, set_seed
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.services.preprocessing import batch_normalize
+from training.train_classifier import (
+    build_label_mapping,
+    build_training_args,
+    compute_metrics,
+    freeze_lower_layers,
+    load_dataset,
+    parse_args,
+    prepare_datasets,
+    resolve_cpu_profile,
+    training_report,
+)
+
+
+def train_variant(df: pd.DataFrame, argv: List[str], output_dir: Path) -> Dict[str, Any]:
+    args = parse_args([*argv, "--output-dir", str(output_dir)])
+    resolve_cpu_profile(args)
+    set_seed(args.seed)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    datasets, id2label, label2id = prepare_datasets(
+        df=df,
+        test_size=args.test_size,
+        seed=args.seed,
+        tokenizer=tokenizer,
+        max_length=args.max_length,
+        dynamic_padding=args.dynamic_padding,
+    )
+    model = AutoModelForSequenceClassification.from_pretrained(
+        args.model_name,
+        num_labels=len(id2label),
+        id2label=id2label,
+        label2id=label2id,
+    )
+    freezing = freeze_lower_layers(model, args)
+    # Only the final model is compared: no per-epoch evaluation or checkpoints
+    trainer = Trainer(
+        model=model,
+        args=build_training_args(
+            args, False, logging_strategy="no", save_strategy="no", report_to=[], disable_tqdm=True
+        ),
+        train_dataset=datasets["train"],
+        eval_dataset=datasets["validation"],
+        tokenizer=tokenizer,
+        compute_metrics=compute_metrics,
+    )
+    train_output = trainer.train()
+    return training_report(train_output, args, freezing, trainer.evaluate())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="CPU eğitim profilini tam ince ayarla karşılaştır")
+    parser.add_argument("--model-name", type=str, default="dbmdz/bert-base-turkish-cased")
+    parser.add_argument("--data-path", type=Path, default=ROOT_DIR / "data" / "raw" / "train.csv")
+    parser.add_argument("--max-rows", type=int, default=0, help="Rastgele seçilen satır sayısı (0 = hepsi)")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--learning-rate", type=float, default=5e-5)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--profile-args",
+        type=str,
+        default="",
+        help='CPU profiline eklenecek train_classifier seçenekleri, ör. "--freeze-layers 8 --epochs 6"',
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    df = load_dataset(args.data_path)
+    if args.max_rows and len(df) > args.max_rows:
+        df = df.sample(n=args.max_rows, random_state=args.seed).reset_index(drop=True)
+    df["question_normalized"] = batch_normalize(df["question"].tolist())
+    df, _ = build_label_mapping(df)
+
+    common = [
+        "--model-name", args.model_name,
+        "--epochs", str(args.epochs),
+        "--batch-size", str(args.batch_size),
+        "--learning-rate", str(args.learning_rate),
+        "--max-length", str(args.max_length),
+        "--seed", str(args.seed),
+    ]
+    variants = [
+        ("Tam ince ayar", common),
+        ("CPU profili", [*common, "--cpu-profile", *shlex.split(args.profile_args)]),
+    ]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (name, argv) in enumerate(variants):
+            print(f"{name} eğitiliyor...", flush=True)
+            results.append((name, train_variant(df, argv, Path(tmp) / str(index))))
+
+    print(f"\n{len(df)} satır, yığın {args.batch_size}")
+    for name, report in results:
+        print(f"\n{name}")
+        print(
+            f"  Eğitilen parametre : {report['trainable_parameters']:,} / {report['total_parameters']:,} "
+            f"(dondurulan katman {report['frozen_layers']}/{report['total_layers']}, "
+            f"gömme {'donuk' if report['frozen_embeddings'] else 'eğitiliyor'})"
+        )
+        print(
+            f"  Ayarlar            : bf16 {'açık' if report['bf16'] else 'kapalı'} | "
+            f"etkin yığın {report['effective_batch_size']} | işçi {report['dataloader_workers']} | "
+            f"yığın bazında doldurma {'açık' if report['dynamic_padding'] else 'kapalı'}"
+        )
+        print(
+            f"  Hız                : {report['train_samples_per_second']:.1f} örnek/sn "
+            f"({report['epochs']} epoch, {report['train_runtime_seconds']:.1f} sn)"
+        )
+        print(f"  Doğrulama          : doğruluk %{report['eval_accuracy'] * 100:.1f} | F1 {report['eval_f1']:.4f}")
+
+    (_, full), (_, profile) = results
+    print(
+        f"\nCPU profili {profile['train_samples_per_second'] / full['train_samples_per_second']:.1f}x hızlı, "
+        f"F1 farkı {profile['eval_f1'] - full['eval_f1']:+.4f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
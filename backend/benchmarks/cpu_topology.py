@@ -0,0 +1,184 @@
+"""Bu makine için en iyi işçi (worker) x torch thread dağılımını tarar.
+
+Her yapılandırmada uvicorn işçilerini taklit eden ayrı süreçler başlatılır;
+her süreç uygulamanın kullandığı apply_topology ile thread sayılarını ayarlar,
+modeli yükler ve Starlette thread havuzunu taklit eden --clients-per-worker
+istemci thread'i ile --duration saniye boyunca sorgu sınıflandırır. Sonuçta
+toplam verim (sorgu/sn) ve gecikme yüzdelikleri karşılaştırılır; en iyi
+değerler WEB_CONCURRENCY ve TORCH_THREADS olarak önerilir.
+
+"Varsayılan" satırı torch'un kendi ayarını (her işçide tüm çekirdekler) gösterir;
+birden çok işçide aşırı abonelik (oversubscription) etkisi burada görünür.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+
+def _worker(
+    model_dir: str,
+    queries: list[str],
+    workers: int,
+    threads: Optional[int],
+    cpus: int,
+    clients: int,
+    duration: float,
+    pin: bool,
+    barrier,
+    results,
+) -> None:
+    from app.services.nlp import NLPService
+    from app.utils.cpu import apply_topology, plan_topology
+
+    if threads is not None:
+        topology = apply_topology(plan_topology(cpus, workers, intra_op_threads=threads), pin=pin)
+        concurrency = topology.max_concurrent_inference
+    else:
+        concurrency = None
+    nlp = NLPService(model_dir=Path(model_dir), max_concurrent_inference=concurrency)
+    for query in queries[:10]:
+        nlp.classify(query)
+
+    latencies: list[float] = []
+    lock = threading.Lock()
+    barrier.wait()
+    deadline = time.perf_counter() + duration
+
+    def client(offset: int) -> None:
+        local: list[float] = []
+        index = offset
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            nlp.classify(queries[index % len(queries)])
+            local.append((time.perf_counter() - started) * 1000)
+            index += clients
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=client, args=(offset,)) for offset in range(clients)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(latencies)
+
+
+def run_config(
+    model_dir: Path,
+    queries: list[str],
+    workers: int,
+    threads: Optional[int],
+    cpus: int,
+    clients: int,
+    duration: float,
+    pin: bool,
+) -> dict[str, float]:
+    context = mp.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = []
+    for worker_index in range(workers):
+        # Each worker walks the query list from a different offset so caches are not shared artificially
+        shifted = queries[worker_index::workers] + queries[:worker_index:workers]
+        process = context.Process(
+            target=_worker,
+            args=(str(model_dir), shifted, workers, threads, cpus, clients, duration, pin, barrier, results),
+        )
+        process.start()
+        processes.append(process)
+
+    latencies: list[float] = []
+    for _ in processes:
+        latencies.extend(results.get())
+    for process in processes:
+        process.join()
+
+    return {
+        "qps": len(latencies) / duration,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+    }
+
+
+def candidate_configs(cpus: int, max_workers: Optional[int]) -> list[tuple[int, int]]:
+    configs = []
+    for workers in range(1, min(cpus, max_workers or cpus) + 1):
+        threads = 1
+        while workers * threads <= cpus:
+            configs.append((workers, threads))
+            threads *= 2
+        share = cpus // workers
+        if (workers, share) not in configs:
+            configs.append((workers, share))
+    return configs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="İşçi x thread dağılımı taraması")
+    parser.add_argument("--model-dir", type=Path, default=None, help="Model dizini (varsayılan: ayarlar)")
+    parser.add_argument(
+        "--queries-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "raw" / "train.csv",
+        help="Sorguların örnekleneceği CSV",
+    )
+    parser.add_argument("--num-queries", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=15.0, help="Her yapılandırmanın ölçüm süresi (sn)")
+    parser.add_argument("--clients-per-worker", type=int, default=8, help="İşçi başına eşzamanlı istek")
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Öneri için p95 gecikme üst sınırı")
+    parser.add_argument("--pin", action="store_true", help="İşçileri çekirdek kümelerine sabitle")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app.config import get_settings
+    from app.utils.cpu import available_cpus
+    from benchmarks.tokenization import load_queries
+
+    model_dir = args.model_dir or get_settings().model_dir
+    queries = load_queries(args.queries_path, args.num_queries, args.seed)
+    cpus = available_cpus()
+    print(f"Kullanılabilir çekirdek (affinity + cgroup kotası): {cpus}")
+
+    rows = []
+    for workers in sorted({1, min(cpus, args.max_workers or cpus)}):
+        stats = run_config(model_dir, queries, workers, None, cpus, args.clients_per_worker, args.duration, False)
+        rows.append(("varsayılan", workers, None, stats))
+        print(f"varsayılan  işçi {workers:>2} | {stats['qps']:8.1f} sorgu/sn | p50 {stats['p50']:7.1f} ms | p95 {stats['p95']:7.1f} ms")
+
+    for workers, threads in candidate_configs(cpus, args.max_workers):
+        stats = run_config(model_dir, queries, workers, threads, cpus, args.clients_per_worker, args.duration, args.pin)
+        rows.append(("ayarlı", workers, threads, stats))
+        print(
+            f"ayarlı      işçi {workers:>2} x thread {threads:>2} | {stats['qps']:8.1f} sorgu/sn | "
+            f"p50 {stats['p50']:7.1f} ms | p95 {stats['p95']:7.1f} ms"
+        )
+
+    eligible = [
+        row for row in rows
+        if row[2] is not None and (args.max_p95_ms is None or row[3]["p95"] <= args.max_p95_ms)
+    ]
+    if not eligible:
+        print("p95 sınırını karşılayan yapılandırma yok.")
+        return
+    _, workers, threads, stats = max(eligible, key=lambda row: row[3]["qps"])
+    print(
+        f"\nÖneri: WEB_CONCURRENCY={workers} TORCH_THREADS={threads} "
+        f"({stats['qps']:.1f} sorgu/sn, p95 {stats['p95']:.1f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Sohbet geçmişi aramasında FTS5 ile LIKE taramasının gecikmesini karşılaştırır.
+
+Eğitim verisindeki soru/cevap çiftlerinden milyonlarca mesajlık sentetik bir
+veritabanı üretir (varsayılan 2.000.000 mesaj), mesajları toplu yükledikten
+sonra FTS indeksini `rebuild` ile doldurur ve aynı sorgu kümesini iki yoldan
+ölçer. Üretilen dosya --db-path ile saklanabilir; var olan dosya yeniden
+kullanılır, böylece tekrar ölçümler üretim süresini beklemez.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.database import Base
+from app.models import ChatMessage, ChatSession  # noqa: F401 - registers the tables on Base
+from app.services.search import ensure_search_index, rebuild_search_index, search_messages
+
+MESSAGES_PER_SESSION = 20
+INSERT_BATCH = 50_000
+
+
+def load_pairs(path: Path) -> list[tuple[str, str]]:
+    df = pd.read_csv(path).dropna(subset=["question", "answer"])
+    questions = df["question"].astype(str).str.replace("_", " ", regex=False)
+    return list(zip(questions, df["answer"].astype(str)))
+
+
+def populate(db_path: Path, pairs: list[tuple[str, str]], num_messages: int, seed: int) -> None:
+    rng = random.Random(seed)
+    connection = sqlite3.connect(db_path)
+    start = datetime(2025, 1, 1)
+    sessions, messages = [], []
+    for index in range(num_messages // 2):
+        if index % (MESSAGES_PER_SESSION // 2) == 0:
+            session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            created = start + timedelta(minutes=index)
+            sessions.append((session_id, None, created, created))
+        question, answer = rng.choice(pairs)
+        at = start + timedelta(minutes=index)
+        messages.append((session_id, "user", question, None, None, None, at))
+        messages.append((session_id, "bot", answer, None, None, 0.9, at))
+        if len(messages) >= INSERT_BATCH:
+            _flush(connection, sessions, messages)
+            sessions, messages = [], []
+    _flush(connection, sessions, messages)
+    connection.close()
+
+
+def _flush(connection: sqlite3.Connection, sessions: list, messages: list) -> None:
+    with connection:
+        connection.executemany(
+            "INSERT INTO chat_sessions (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)", sessions
+        )
+        connection.executemany(
+            "INSERT INTO chat_messages (session_id, sender, text, category, subcategory, confidence, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            messages,
+        )
+
+
+def build_queries(pairs: list[tuple[str, str]], count: int, seed: int) -> list[str]:
+    """Pick 1-3 consecutive words from random questions, like a support agent would type."""
+    rng = random.Random(seed + 1)
+    queries = []
+    while len(queries) < count:
+        words = [word for word in rng.choice(pairs)[0].split() if len(word) > 2]
+        if not words:
+            continue
+        length = rng.randint(1, min(3, len(words)))
+        begin = rng.randint(0, len(words) - length)
+        queries.append(" ".join(words[begin : begin + length]))
+    return queries
+
+
+def time_queries(fn, queries: list[str]) -> dict[str, float]:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "max": float(np.max(latencies)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="FTS5 ve LIKE arama gecikmesini ölç")
+    parser.add_argument("--db-path", type=Path, default=Path("/tmp/chat_history_search_bench.db"))
+    parser.add_argument(
+        "--data-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "raw" / "train.csv",
+        help="Mesaj metinlerinin örnekleneceği CSV",
+    )
+    parser.add_argument("--num-messages", type=int, default=2_000_000)
+    parser.add_argument("--num-queries", type=int, default=200, help="FTS ile ölçülecek sorgu sayısı")
+    parser.add_argument("--like-queries", type=int, default=10, help="LIKE ile ölçülecek sorgu sayısı (yavaş)")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--candidate-limit", type=int, default=5000, help="BM25 ile sıralanan en yeni eşleşme sayısı")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rebuild", action="store_true", help="Var olan veritabanında FTS indeksini yeniden kur")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.data_path)
+    engine = create_engine(f"sqlite:///{args.db_path}")
+    fresh = not args.db_path.exists()
+    Base.metadata.create_all(bind=engine)
+
+    if fresh:
+        print(f"{args.num_messages} mesajlık sentetik veritabanı üretiliyor: {args.db_path}")
+        started = time.perf_counter()
+        populate(args.db_path, pairs, args.num_messages, args.seed)
+        print(f"Yükleme: {time.perf_counter() - started:.1f} sn")
+
+    ensure_search_index(engine)
+    if fresh or args.rebuild:
+        started = time.perf_counter()
+        rebuild_search_index(engine)
+        print(f"FTS indeksleme (rebuild): {time.perf_counter() - started:.1f} sn")
+
+    with engine.connect() as connection:
+        total = connection.execute(text("SELECT count(*) FROM chat_messages")).scalar()
+        fts_bytes = (
+            connection.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name LIKE 'chat_messages_fts%'")).scalar()
+            if _has_dbstat(connection)
+            else None
+        )
+    print(f"Mesaj sayısı: {total}")
+    if fts_bytes is not None:
+        print(f"FTS indeks boyutu: {fts_bytes / 1e6:.1f} MB")
+
+    queries = build_queries(pairs, args.num_queries, args.seed)
+    db = sessionmaker(bind=engine)()
+
+    def fts(query: str) -> None:
+        search_messages(db, query, limit=args.page_size, candidate_limit=args.candidate_limit)
+
+    def like(query: str) -> None:
+        pattern = f"%{query}%"
+        db.execute(
+            text("SELECT count(*) FROM chat_messages WHERE text LIKE :pattern"), {"pattern": pattern}
+        ).scalar()
+        db.execute(
+            text(
+                "SELECT id FROM chat_messages WHERE text LIKE :pattern ORDER BY created_at DESC LIMIT :limit"
+            ),
+            {"pattern": pattern, "limit": args.page_size},
+        ).all()
+
+    # Isınma: sayfa önbelleği her iki yol için de dolu olsun
+    fts(queries[0])
+    like(queries[0])
+
+    fts_stats = time_queries(fts, queries)
+    like_stats = time_queries(like, queries[: args.like_queries])
+    db.close()
+
+    print(f"Sorgu sayısı: FTS {len(queries)}, LIKE {min(len(queries), args.like_queries)}")
+    for name, stats in (("FTS5", fts_stats), ("LIKE", like_stats)):
+        print(f"{name:>5}: p50 {stats['p50']:.2f} ms | p95 {stats['p95']:.2f} ms | max {stats['max']:.2f} ms")
+
+
+def _has_dbstat(connection) -> bool:
+    try:
+        connection.execute(text("SELECT 1 FROM dbstat LIMIT 1"))
+    except Exception:  # noqa: BLE001 - dbstat is an optional SQLite extension
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Sohbet ve geçmiş yanıtlarının serileştirme maliyetini eski ve yeni yolda ölçer.
+
+Eski yol, uç noktaların önceki hâlini taklit eder: ORM satırları tek tek
+`model_validate` ile şemaya çevrilir, FastAPI de dönen modeli `response_model`
+ile yeniden doğrulayıp JSON'a döker. Yeni yol doğrudan uç nokta fonksiyonlarını
+çağırır: sütun demetleri sözlüğe çevrilip tek geçişte (orjson varsa onunla)
+kodlanır. İki yolun ürettiği JSON'un aynı olduğu da kontrol edilir.
+
+Geçici bir SQLite dosyasında --sessions kadar oturum ve mesaj sınırına (200)
+kadar mesaj içeren büyük bir oturum üretilir; sonuçlar mesaj/oturum başına
+mikro saniye olarak raporlanır. Geçmiş süreleri veritabanı sorgusunu da içerir.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, desc, func
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.database import Base
+from app.models import ChatMessage, ChatSession
+from app.routers.chat import _CHAT_RESPONSE_KEYS
+from app.routers.history import get_history, list_histories
+from app.schemas import (
+    ChatMessageSchema,
+    ChatResponse,
+    ChatSessionSchema,
+    GeneratedAnswer,
+    SessionHistoryResponse,
+    SessionListItem,
+)
+from app.utils.serialization import FastJSONResponse
+
+HISTORY_LIMIT = 200
+
+
+def populate(db: Session, answers: list[str], num_sessions: int, messages_per_session: int) -> str:
+    start = datetime(2025, 1, 1, 8, 0, 0, 123456)
+    for index in range(num_sessions):
+        created = start + timedelta(minutes=index)
+        db.add(ChatSession(id=f"bench-{index:06d}", title=f"Oturum {index}", created_at=created, updated_at=created))
+        count = HISTORY_LIMIT if index == 0 else messages_per_session
+        for position in range(count):
+            bot = position % 2 == 1
+            db.add(
+                ChatMessage(
+                    session_id=f"bench-{index:06d}",
+                    sender="bot" if bot else "user",
+                    text=answers[(index + position) % len(answers)],
+                    category="genel" if bot else None,
+                    confidence=0.9 if bot else None,
+                    created_at=created + timedelta(seconds=position),
+                )
+            )
+    db.commit()
+    return "bench-000000"
+
+
+def legacy_list(db: Session, adapter: TypeAdapter) -> bytes:
+    rows = (
+        db.query(
+            ChatSession.id,
+            ChatSession.title,
+            ChatSession.updated_at.label("last_updated"),
+            func.count(ChatMessage.id).label("message_count"),
+        )
+        .join(ChatMessage, ChatMessage.session_id == ChatSession.id)
+        .group_by(ChatSession.id)
+        .order_by(desc(ChatSession.updated_at))
+        .all()
+    )
+    items = [
+        SessionListItem(id=row.id, title=row.title, last_updated=row.last_updated, message_count=row.message_count)
+        for row in rows
+    ]
+    # FastAPI'nin response_model adımı: yeniden doğrula, alias'larla JSON'a dök
+    return adapter.dump_json(adapter.validate_python(items), by_alias=True)
+
+
+def legacy_history(db: Session, session_id: str, adapter: TypeAdapter) -> bytes:
+    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.created_at.asc())
+        .limit(HISTORY_LIMIT)
+        .all()
+    )
+    response = SessionHistoryResponse(
+        session=ChatSessionSchema.model_validate(session),
+        messages=[ChatMessageSchema.model_validate(m) for m in messages],
+    )
+    return adapter.dump_json(adapter.validate_python(response), by_alias=True)
+
+
+def legacy_chat(answer: dict, adapter: TypeAdapter) -> bytes:
+    generated = GeneratedAnswer(**answer)
+    response = ChatResponse(
+        session_id="bench-000000",
+        message=generated.text,
+        category=generated.category,
+        subcategory=generated.subcategory,
+        confidence=generated.confidence,
+        similar_questions=generated.similar_questions,
+        suggested_links=generated.suggested_links,
+    )
+    return adapter.dump_json(adapter.validate_python(response), by_alias=True)
+
+
+def fast_chat(answer: dict) -> bytes:
+    generated = GeneratedAnswer.model_construct(**answer)
+    values = (
+        "bench-000000",
+        generated.text,
+        generated.category,
+        generated.subcategory,
+        generated.confidence,
+        generated.similar_questions,
+        generated.suggested_links,
+    )
+    return FastJSONResponse(dict(zip(_CHAT_RESPONSE_KEYS, values))).body
+
+
+def time_call(fn, repeat: int) -> float:
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Yanıt serileştirme maliyetini eski ve yeni yolda ölç")
+    parser.add_argument("--data-path", type=Path, default=ROOT_DIR / "data" / "raw" / "train.csv")
+    parser.add_argument("--sessions", type=int, default=5000, help="Geçmiş listesindeki oturum sayısı")
+    parser.add_argument("--messages-per-session", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=30, help="Her ölçümün tekrar sayısı (medyan alınır)")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data_path).dropna(subset=["question", "answer"])
+    answers = df["answer"].astype(str).tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        session_id = populate(db, answers, args.sessions, args.messages_per_session)
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+        list_adapter = TypeAdapter(list[SessionListItem])
+        history_adapter = TypeAdapter(SessionHistoryResponse)
+        chat_adapter = TypeAdapter(ChatResponse)
+        answer = {
+            "text": answers[0],
+            "category": "genel",
+            "subcategory": None,
+            "confidence": 0.93,
+            "similar_questions": df["question"].astype(str).tolist()[:3],
+            "suggested_links": ["https://www.iste.edu.tr"],
+        }
+
+        checks = {
+            "liste": (legacy_list(db, list_adapter), list_histories(request, db).body),
+            "oturum": (legacy_history(db, session_id, history_adapter), get_history(session_id, request, db).body),
+            "sohbet": (legacy_chat(answer, chat_adapter), fast_chat(answer)),
+        }
+        for name, (before, after) in checks.items():
+            if json.loads(before) != json.loads(after):
+                print(f"{name}: eski ve yeni yolun JSON çıktısı farklı!")
+                sys.exit(1)
+
+        results = [
+            (
+                f"Geçmiş listesi ({args.sessions} oturum)",
+                args.sessions,
+                "oturum",
+                time_call(lambda: legacy_list(db, list_adapter), args.repeat),
+                time_call(lambda: list_histories(request, db), args.repeat),
+            ),
+            (
+                f"Oturum geçmişi ({HISTORY_LIMIT} mesaj)",
+                HISTORY_LIMIT,
+                "mesaj",
+                time_call(lambda: legacy_history(db, session_id, history_adapter), args.repeat),
+                time_call(lambda: get_history(session_id, request, db), args.repeat),
+            ),
+            (
+                "Sohbet yanıtı",
+                1,
+                "yanıt",
+                time_call(lambda: legacy_chat(answer, chat_adapter), args.repeat * 100),
+                time_call(lambda: fast_chat(answer), args.repeat * 100),
+            ),
+        ]
+        db.close()
+        engine.dispose()
+
+    print("JSON çıktıları eski yolla aynı.")
+    for title, count, unit, before, after in results:
+        print(f"\n{title}")
+        print(f"  Eski yol : {before:10.1f} µs toplam | {before / count:7.2f} µs/{unit}")
+        print(f"  Yeni yol : {after:10.1f} µs toplam | {after / count:7.2f} µs/{unit}")
+        print(f"  Hızlanma : {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
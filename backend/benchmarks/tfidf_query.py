@@ -0,0 +1,134 @@
+"""Hızlı TF-IDF sorgu kodlayıcısını sklearn yoluyla karşılaştırır.
+
+Eğitim verisindeki her soru için QueryEncoder'ın ürettiği seyrek vektör ve
+tüm sorulara olan benzerlik skorları, sklearn'ün transform + linear_kernel
+yoluyla karşılaştırılır (parite). Ardından tek sorguluk VectorStore.search
+süresi iki yolda ölçülür. --hashing-features verilirse eğitim verisinden
+hashing tabanlı bir vektör deposu da kurulup aynı kontroller onda da yapılır.
+Parite bozulursa betik sıfırdan farklı kodla çıkar.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import linear_kernel
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.config import get_settings
+from app.services.preprocessing import batch_normalize
+from app.services.vector_store import VectorStore
+from training.train_classifier import build_question_metadata, make_vectorizer
+
+
+def check_parity(store: VectorStore, questions: list[str], tolerance: float) -> dict[str, float]:
+    max_vector_delta = 0.0
+    max_score_delta = 0.0
+    different_results = 0
+    for question in questions:
+        expected = store.vectorizer.transform([question])
+        indices, weights = store.encoder.encode(question)
+        dense = np.zeros(expected.shape[1])
+        dense[indices] = weights
+        max_vector_delta = max(max_vector_delta, float(np.abs(expected.toarray().ravel() - dense).max(initial=0.0)))
+
+        expected_scores = linear_kernel(expected, store.matrix).ravel()
+        scores = store.scores(question)
+        max_score_delta = max(max_score_delta, float(np.abs(expected_scores - scores).max(initial=0.0)))
+        # Sonuç listeleri: skorlar tolerans içinde aynı olmalı (eşit skorlu soruların sırası serbest)
+        expected_top = np.sort(expected_scores[expected_scores >= 0.3])[::-1][:5]
+        fast_top = np.sort(scores[scores >= 0.3])[::-1][:5]
+        if len(expected_top) != len(fast_top) or not np.allclose(expected_top, fast_top, atol=tolerance):
+            different_results += 1
+    return {
+        "max_vector_delta": max_vector_delta,
+        "max_score_delta": max_score_delta,
+        "different_results": different_results,
+    }
+
+
+def time_search(store: VectorStore, queries: list[str]) -> dict[str, float]:
+    for query in queries[:50]:
+        store.search(query, top_k=3)
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        store.search(query, top_k=3)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return {"p50": float(np.percentile(timings, 50)), "p95": float(np.percentile(timings, 95))}
+
+
+def evaluate(name: str, vectorizer, matrix, metadata, questions, queries, tolerance) -> bool:
+    fast = VectorStore(vectorizer, matrix, metadata)
+    if fast.encoder is None:
+        print(f"[{name}] Bu vektörleştirici hızlı kodlayıcıyla desteklenmiyor.")
+        return False
+    legacy = VectorStore(vectorizer, matrix, metadata, fast_queries=False)
+
+    parity = check_parity(fast, questions, tolerance)
+    before, after = time_search(legacy, queries), time_search(fast, queries)
+    passed = (
+        parity["max_vector_delta"] <= tolerance
+        and parity["max_score_delta"] <= tolerance
+        and parity["different_results"] == 0
+    )
+    print(f"\n[{name}] {len(questions)} soru, {matrix.shape[1]} sütun")
+    print(f"  En büyük vektör farkı : {parity['max_vector_delta']:.2e}")
+    print(f"  En büyük skor farkı   : {parity['max_score_delta']:.2e}")
+    print(f"  Farklı sonuç listesi  : {parity['different_results']}")
+    print(f"  sklearn search        : p50 {before['p50']:8.1f} µs | p95 {before['p95']:8.1f} µs")
+    print(f"  Hızlı search          : p50 {after['p50']:8.1f} µs | p95 {after['p95']:8.1f} µs")
+    print(f"  Hızlanma (p50)        : {before['p50'] / after['p50']:.1f}x")
+    print(f"  Parite                : {'GEÇTİ' if passed else 'BAŞARISIZ'}")
+    return passed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TF-IDF sorgu kodlayıcısı parite ve hız ölçümü")
+    parser.add_argument("--vector-store-path", type=Path, default=None, help="Vektör deposu (varsayılan: ayarlar)")
+    parser.add_argument("--data-path", type=Path, default=ROOT_DIR / "data" / "raw" / "train.csv")
+    parser.add_argument("--num-queries", type=int, default=2000, help="Süre ölçümündeki sorgu sayısı")
+    parser.add_argument(
+        "--hashing-features",
+        type=int,
+        default=0,
+        help="Verilirse bu boyutta hashing tabanlı bir depo kurulup o da kontrol edilir",
+    )
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data_path).dropna(subset=["question", "answer"])
+    df["question_normalized"] = batch_normalize(df["question"].astype(str).tolist())
+    questions = df["question_normalized"].tolist()
+    queries = df["question_normalized"].sample(n=args.num_queries, replace=True, random_state=args.seed).tolist()
+
+    results = []
+    store = VectorStore.load(args.vector_store_path or get_settings().vector_store_path)
+    if store is None:
+        print("Vektör deposu bulunamadı, yalnızca hashing deposu kontrol edilecek.")
+    else:
+        results.append(
+            evaluate("kayıtlı depo", store.vectorizer, store.matrix, store.metadata, questions, queries, args.tolerance)
+        )
+
+    if args.hashing_features:
+        vectorizer = make_vectorizer(args.hashing_features)
+        matrix = vectorizer.fit_transform(questions)
+        results.append(
+            evaluate("hashing", vectorizer, matrix, build_question_metadata(df), questions, queries, args.tolerance)
+        )
+
+    if not results or not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
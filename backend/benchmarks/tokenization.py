@@ -0,0 +1,105 @@
+"""NLPService çıkarımında tokenizer süre payını token önbelleği öncesi/sonrası ölçer.
+
+"Önce" eski yolu taklit eder (her sorguda tokenizer, max_length=256); "sonra"
+NLPService'in kullandığı önbellekli ve eğitimle aynı max_length'li yoldur.
+Sorgu karışımı tekrarlı örnekleme ile üretilir; gerçek trafik kaydı varsa
+--queries-path ile verilebilir (question veya text sütunu).
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.config import get_settings
+from app.services.nlp import NLPService
+from app.services.preprocessing import normalize_text
+
+LEGACY_MAX_LENGTH = 256
+
+
+def load_queries(path: Path, num_queries: int, seed: int) -> list[str]:
+    df = pd.read_csv(path)
+    column = "question" if "question" in df.columns else "text"
+    questions = df[column].dropna().astype(str)
+    return questions.sample(n=num_queries, replace=True, random_state=seed).tolist()
+
+
+def run(nlp: NLPService, queries: list[str], cached: bool) -> dict[str, float]:
+    tokenize_ms: list[float] = []
+    model_ms: list[float] = []
+    with torch.no_grad():
+        for query in queries:
+            started = time.perf_counter()
+            normalized = normalize_text(query)
+            if cached:
+                encoded = nlp._encode_cached(normalized)
+            else:
+                encoded = nlp.tokenizer(
+                    normalized,
+                    padding=True,
+                    truncation=True,
+                    max_length=LEGACY_MAX_LENGTH,
+                    return_tensors="pt",
+                )
+                encoded = {key: value.to(nlp.device) for key, value in encoded.items()}
+            encoded_at = time.perf_counter()
+            nlp.model(**encoded)
+            finished = time.perf_counter()
+            tokenize_ms.append((encoded_at - started) * 1000)
+            model_ms.append((finished - encoded_at) * 1000)
+
+    tokenize_total, model_total = float(np.sum(tokenize_ms)), float(np.sum(model_ms))
+    return {
+        "tokenize_ms": float(np.mean(tokenize_ms)),
+        "model_ms": float(np.mean(model_ms)),
+        "tokenizer_share": tokenize_total / (tokenize_total + model_total),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tokenizer süre payını ölç")
+    parser.add_argument("--model-dir", type=Path, default=None, help="Model dizini (varsayılan: ayarlar)")
+    parser.add_argument(
+        "--queries-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "raw" / "train.csv",
+        help="Sorgu karışımının örnekleneceği CSV",
+    )
+    parser.add_argument("--num-queries", type=int, default=2000, help="Ölçülecek sorgu sayısı")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    nlp = NLPService(model_dir=args.model_dir or settings.model_dir, token_cache_size=settings.token_cache_size)
+    queries = load_queries(args.queries_path, args.num_queries, args.seed)
+
+    # Isınma: ilk çağrıların tahsis maliyeti ölçüme karışmasın
+    run(nlp, queries[:20], cached=False)
+    nlp._encode_cached.cache_clear()
+
+    before = run(nlp, queries, cached=False)
+    after = run(nlp, queries, cached=True)
+    info = nlp.token_cache_info()
+
+    print(f"Sorgu sayısı: {len(queries)} ({len(set(queries))} farklı)")
+    print(f"max_length: önce {LEGACY_MAX_LENGTH}, sonra {nlp.max_length}")
+    for name, stats in (("Önce", before), ("Sonra", after)):
+        print(
+            f"{name:>5}: tokenizer {stats['tokenize_ms']:.3f} ms | model {stats['model_ms']:.3f} ms | "
+            f"tokenizer payı {stats['tokenizer_share']:.1%}"
+        )
+    print(f"Önbellek isabeti: {info.hits}/{info.hits + info.misses}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Yazım düzeltme dizininin isabetini ve gecikmesini ölçer.
+
+Eğitim verisinden örneklenen sorular Türkçe karakterleri olmadan yazılmış gibi
+ASCII'ye katlanır ve bir kısmına rastgele bir yazım hatası (harf silme, ekleme,
+değiştirme ya da yer değiştirme) eklenir. Ardından:
+
+* düzeltilen sorgunun özgün soruyla birebir aynı olma oranı,
+* TF-IDF aramasında ilk sonucun doğru cevabı getirme oranı (düzeltmeden önce ve sonra),
+* TypoIndex.correct ve TypoIndex.match süreleri
+
+raporlanır. Kayıtlı dizin bulunamazsa eğitim verisinden yeniden kurulur.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.config import get_settings
+from app.services.preprocessing import batch_normalize, fold_ascii
+from app.services.typo_index import build_typo_index, load_typo_index
+from app.services.vector_store import VectorStore, load_vector_store
+from training.train_classifier import build_question_metadata
+
+LETTERS = string.ascii_lowercase
+
+
+def add_typo(word: str, rng: random.Random) -> str:
+    position = rng.randrange(len(word) - 1)
+    kind = rng.choice(("delete", "insert", "replace", "swap"))
+    if kind == "delete":
+        return word[:position] + word[position + 1 :]
+    if kind == "insert":
+        return word[:position] + rng.choice(LETTERS) + word[position:]
+    if kind == "replace":
+        return word[:position] + rng.choice(LETTERS.replace(word[position], "")) + word[position + 1 :]
+    return word[:position] + word[position + 1] + word[position] + word[position + 2 :]
+
+
+def make_queries(questions: list[str], count: int, typo_rate: float, seed: int) -> list[tuple[int, str]]:
+    """(soru satırı, ASCII'ye katlanmış ve belki hatalı yazılmış sorgu) çiftleri."""
+    rng = random.Random(seed)
+    queries = []
+    for row in rng.choices(range(len(questions)), k=count):
+        words = fold_ascii(questions[row]).split()
+        long_words = [i for i, word in enumerate(words) if len(word) >= 6 and word.isalpha()]
+        if long_words and rng.random() < typo_rate:
+            i = rng.choice(long_words)
+            words[i] = add_typo(words[i], rng)
+        queries.append((row, " ".join(words)))
+    return queries
+
+
+def top1_hits(store: VectorStore, queries: list[str], answers: list[str]) -> float:
+    hits = 0
+    for query, answer in zip(queries, answers):
+        results = store.search(query, top_k=1)
+        hits += bool(results) and results[0].answer == answer
+    return hits / max(len(queries), 1)
+
+
+def percentiles(timings: list[float]) -> str:
+    return f"p50 {np.percentile(timings, 50):7.1f} µs | p95 {np.percentile(timings, 95):7.1f} µs"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Yazım düzeltme dizini isabet ve gecikme ölçümü")
+    parser.add_argument("--typo-index-path", type=Path, default=None, help="Yazım dizini (varsayılan: ayarlar)")
+    parser.add_argument("--vector-store-path", type=Path, default=None, help="Vektör deposu (varsayılan: ayarlar)")
+    parser.add_argument("--data-path", type=Path, default=ROOT_DIR / "data" / "raw" / "train.csv")
+    parser.add_argument("--num-queries", type=int, default=2000, help="Üretilecek bozuk sorgu sayısı")
+    parser.add_argument("--typo-rate", type=float, default=0.5, help="Yazım hatası eklenen sorgu oranı")
+    parser.add_argument("--max-distance", type=int, default=2, help="Dizin yeniden kurulursa en büyük düzenleme uzaklığı")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    df = pd.read_csv(args.data_path).dropna(subset=["question", "answer"]).reset_index(drop=True)
+    df["question_normalized"] = batch_normalize(df["question"].astype(str).tolist())
+    questions = df["question_normalized"].tolist()
+
+    index = load_typo_index(args.typo_index_path or settings.typo_index_path)
+    if index is None:
+        print("Yazım dizini bulunamadı, eğitim verisinden kuruluyor.")
+        started = time.perf_counter()
+        index = build_typo_index(questions, build_question_metadata(df), max_distance=args.max_distance)
+        print(f"Kurulum süresi: {time.perf_counter() - started:.2f} sn")
+    print(f"Sözlük: {len(index.vocabulary)} kelime, {len(index.deletes)} silme anahtarı, {len(index.gram_ids)} trigram")
+
+    samples = make_queries(questions, args.num_queries, args.typo_rate, args.seed)
+    noisy = [query for _, query in samples]
+    expected = [questions[row] for row, _ in samples]
+
+    cold, warm, corrected = [], [], []
+    for query in noisy:
+        started = time.perf_counter()
+        corrected.append(index.correct(query).text)
+        cold.append((time.perf_counter() - started) * 1e6)
+    for query in noisy:
+        started = time.perf_counter()
+        index.correct(query)
+        warm.append((time.perf_counter() - started) * 1e6)
+    match_timings = []
+    for query in corrected:
+        started = time.perf_counter()
+        index.match(query)
+        match_timings.append((time.perf_counter() - started) * 1e6)
+
+    restored = sum(fixed == original for fixed, original in zip(corrected, expected)) / len(samples)
+    print(f"\n{len(samples)} sorgu (%{args.typo_rate * 100:.0f}'inde yazım hatası, tümü ASCII)")
+    print(f"  Özgün soruya birebir dönen : %{restored * 100:.1f}")
+    print(f"  correct (ilk geçiş)        : {percentiles(cold)}")
+    print(f"  correct (önbellekli)       : {percentiles(warm)}")
+    print(f"  match                      : {percentiles(match_timings)}")
+
+    store = load_vector_store(args.vector_store_path or settings.vector_store_path)
+    if store is None:
+        print("Vektör deposu bulunamadı, TF-IDF isabeti ölçülmedi.")
+        return
+    answers = [df["answer"].iloc[row] for row, _ in samples]
+    before, after = top1_hits(store, noisy, answers), top1_hits(store, corrected, answers)
+    print(f"  TF-IDF ilk sonuç doğru     : düzeltmesiz %{before * 100:.1f} | düzeltmeli %{after * 100:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.config import get_settings
+from app.database import Base, SessionLocal, engine
+from app.services.analytics import ensure_monotonic_message_ids, rebuild_rollups, refresh_rollups
+from app.services.retention import enable_incremental_vacuum, retention_lock_path, run_retention
+from app.services.search import ensure_search_index, rebuild_search_index
+
+
+def cmd_retention(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    if args.enable_incremental_vacuum:
+        print("Veritabanı incremental auto-vacuum moduna alınıyor (tam VACUUM)...")
+        enable_incremental_vacuum(engine)
+
+    days = args.days if args.days is not None else settings.retention_days
+    if days is None:
+        print("Saklama süresi tanımlı değil: --days verin veya RETENTION_DAYS ayarlayın.")
+        return
+
+    stats = run_retention(
+        SessionLocal,
+        retention_days=days,
+        archive_dir=None if args.no_archive else (args.archive_dir or settings.archive_dir),
+        batch_size=args.batch_size or settings.retention_batch_size,
+        vacuum_pages=args.vacuum_pages,
+        lock_path=retention_lock_path(settings.sqlite_path),
+    )
+    if stats.skipped:
+        print("Saklama işi başka bir süreçte (sunucu işçisi) zaten çalışıyor; atlandı.")
+        return
+    print(json.dumps(stats.to_dict(), ensure_ascii=False, indent=2, default=str))
+
+
+def cmd_search_index(args: argparse.Namespace) -> None:
+    if not ensure_search_index(engine):
+        print("Bu SQLite sürümünde FTS5 desteği yok; arama indeksi oluşturulamadı.")
+        return
+    print("Tam metin arama indeksi mesajlardan yeniden oluşturuluyor...")
+    started = time.perf_counter()
+    indexed = rebuild_search_index(engine)
+    print(f"{indexed} mesaj indekslendi ({time.perf_counter() - started:.1f} sn).")
+
+
+def cmd_analytics(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    threshold = settings.low_confidence_threshold
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            processed = rebuild_rollups(db, threshold, batch_size=args.batch_size)
+        else:
+            processed = 0
+            while True:
+                result = refresh_rollups(db, threshold, max_messages=args.batch_size)
+                processed += result.processed
+                if result.caught_up:
+                    break
+    finally:
+        db.close()
+    print(f"{processed} mesaj özet tablolara işlendi ({time.perf_counter() - started:.1f} sn).")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Sohbet geçmişi veritabanı bakım komutları")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    retention = subparsers.add_parser(
+        "retention",
+        help="Süresi dolan oturumları arşivle, sil ve veritabanını sıkıştır",
+    )
+    retention.add_argument("--days", type=int, default=None, help="Saklama süresi (gün); varsayılan RETENTION_DAYS")
+    retention.add_argument("--archive-dir", type=Path, default=None, help="Arşiv dizini")
+    retention.add_argument("--no-archive", action="store_true", help="Arşivlemeden sil")
+    retention.add_argument("--batch-size", type=int, default=None, help="İşlem başına oturum sayısı")
+    retention.add_argument(
+        "--vacuum-pages",
+        type=int,
+        default=2000,
+        help="Silme sonrası incremental_vacuum ile bırakılacak en fazla sayfa",
+    )
+    retention.add_argument(
+        "--enable-incremental-vacuum",
+        action="store_true",
+        help="Mevcut veritabanını bir kereliğine incremental auto-vacuum moduna çevir",
+    )
+    retention.set_defaults(func=cmd_retention)
+
+    search_index = subparsers.add_parser(
+        "search-index",
+        help="Sohbet araması için FTS5 indeksini oluştur ve mevcut mesajları indeksle",
+    )
+    search_index.set_defaults(func=cmd_search_index)
+
+    analytics = subparsers.add_parser(
+        "analytics",
+        help="Analitik özet tablolarını son işlenen mesajdan itibaren güncelle",
+    )
+    analytics.add_argument("--batch-size", type=int, default=50_000, help="İşlem başına mesaj sayısı")
+    analytics.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Özetleri sıfırdan hesapla (saklama süresiyle silinmiş mesajlar kaybolur)",
+    )
+    analytics.set_defaults(func=cmd_analytics)
+    return parser
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    Base.metadata.create_all(bind=engine)
+    if ensure_monotonic_message_ids(engine):
+        # The rebuild drops the full-text triggers together with the old table
+        ensure_search_index(engine)
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
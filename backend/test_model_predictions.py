@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import shutil
+import sqlite3
 import sys
-from collections import defaultdict
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
@@ -13,23 +19,80 @@ ROOT_DIR = Path(__file__).resolve().parent
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
-from app.services.nlp import get_nlp_service
+from app.services.nlp import NLPService
+from app.services.preprocessing import batch_normalize
+from app.services.typo_index import load_typo_index
 from app.config import get_settings
+from app.utils.artifacts import model_artifact_hash
 
 
-def test_all_questions(
-    csv_path: Path,
-    output_dir: Path,
-    sample_size: int | None = None,
-    show_correct: bool = False,
-) -> None:
-    """Tüm soruları test eder ve sonuçları raporlar."""
-    
-    print("Model yükleniyor...")
-    nlp = get_nlp_service()
-    print("Model yüklendi!")
-    
-    print(f"Veri seti okunuyor: {csv_path}")
+RESULT_COLUMNS = [
+    "question",
+    "expected_answer",
+    "predicted_answer",
+    "confidence",
+    "is_correct",
+    "category",
+    "subcategory",
+]
+
+CACHE_COLUMNS = ["predicted_answer", "confidence", "category", "subcategory"]
+
+# Her worker süreci kendi modelini bir kez yükler
+_WORKER_NLP: NLPService | None = None
+
+
+class PredictionCache:
+    """(model artefakt hash'i, normalize edilmiş soru) anahtarlı SQLite tahmin önbelleği.
+
+    Model aynı kaldıkça daha önce tahmin edilmiş sorular tekrar modele verilmez;
+    yalnızca yeni veya değişen satırlar değerlendirilir.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS predictions (
+                model_hash TEXT NOT NULL,
+                question_normalized TEXT NOT NULL,
+                predicted_answer TEXT NOT NULL,
+                confidence REAL,
+                category TEXT,
+                subcategory TEXT,
+                PRIMARY KEY (model_hash, question_normalized)
+            )
+            """
+        )
+
+    def lookup(self, model_hash: str) -> pd.DataFrame:
+        return pd.read_sql_query(
+            "SELECT question_normalized, predicted_answer, confidence, category, subcategory "
+            "FROM predictions WHERE model_hash = ?",
+            self.connection,
+            params=(model_hash,),
+        ).set_index("question_normalized")
+
+    def store(self, model_hash: str, results: pd.DataFrame) -> None:
+        # Hata ile sonuçlanan tahminler önbelleğe alınmaz, bir sonraki çalışmada tekrar denenir
+        valid = results[~results["predicted_answer"].str.startswith("HATA:")]
+        rows = [
+            (model_hash, row.question_normalized, row.predicted_answer, row.confidence, row.category, row.subcategory)
+            for row in valid.itertuples(index=False)
+        ]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def read_dataset(csv_path: Path, sample_size: int | None = None) -> pd.DataFrame:
+    """CSV'yi okur, gerekirse örnekler ve soru/cevap sütunlarını temizler."""
     # CSV'yi daha esnek okumak için parametreler
     try:
         df = pd.read_csv(csv_path, quoting=1, on_bad_lines='skip', encoding='utf-8')
@@ -37,72 +100,283 @@ def test_all_questions(
         print(f"CSV okuma hatası: {e}")
         # Alternatif: engine='python' kullan
         df = pd.read_csv(csv_path, engine='python', on_bad_lines='skip', encoding='utf-8')
-    
+
     if sample_size:
         df = df.sample(n=min(sample_size, len(df)), random_state=42)
         print(f"Örnekleme yapıldı: {len(df)} soru test edilecek")
-    
-    print(f"Toplam {len(df)} soru test ediliyor...")
-    
-    results = []
-    errors = []
-    answer_groups = defaultdict(list)
-    
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Test ediliyor"):
-        question = str(row["question"]).strip()
-        expected_answer = str(row["answer"]).strip()
-        
+
+    return pd.DataFrame({
+        "question": df["question"].astype(str).str.strip(),
+        "expected_answer": df["answer"].astype(str).str.strip(),
+    }).reset_index(drop=True)
+
+
+def predict_chunk(nlp: NLPService, chunk: pd.DataFrame, batch_size: int) -> pd.DataFrame:
+    """Bir parça soruyu toplu (batched) çıkarımla tahmin eder."""
+    questions = chunk["question"].tolist()
+    predicted: list[str] = []
+    confidences: list[float] = []
+    categories: list[str | None] = []
+    subcategories: list[str | None] = []
+
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
         try:
-            prediction = nlp.predict(question)
-            predicted_answer = prediction.text.strip()
-            confidence = prediction.confidence
-            
-            is_correct = predicted_answer == expected_answer
-            
-            result = {
-                "question": question,
-                "expected_answer": expected_answer,
-                "predicted_answer": predicted_answer,
-                "confidence": confidence,
-                "is_correct": is_correct,
-                "category": prediction.category,
-                "subcategory": prediction.subcategory,
-            }
-            
-            results.append(result)
-            
-            # Hatalı tahminleri kaydet
-            if not is_correct:
-                errors.append(result)
-            
-            # Doğru veya tüm sonuçları grupla
-            if is_correct or show_correct:
-                answer_groups[expected_answer].append({
-                    "question": question,
-                    "predicted": predicted_answer,
-                    "is_correct": is_correct,
-                    "confidence": confidence,
-                })
-        
-        except Exception as e:
-            error_result = {
-                "question": question,
-                "expected_answer": expected_answer,
-                "predicted_answer": f"HATA: {str(e)}",
-                "confidence": 0.0,
-                "is_correct": False,
-                "category": None,
-                "subcategory": None,
-            }
-            results.append(error_result)
-            errors.append(error_result)
-            print(f"\nHata (satır {idx}): {question} -> {e}")
-    
+            outcomes = nlp.classify_batch(batch)
+        except Exception:
+            # Toplu tahmin başarısızsa hatalı soruyu bulmak için tek tek dene
+            outcomes = []
+            for question in batch:
+                try:
+                    outcomes.append(nlp.classify(question))
+                except Exception as e:
+                    print(f"\nHata: {question} -> {e}")
+                    outcomes.append(e)
+
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                predicted.append(f"HATA: {outcome}")
+                confidences.append(0.0)
+                categories.append(None)
+                subcategories.append(None)
+            else:
+                predicted.append(outcome.metadata.answer.strip())
+                confidences.append(outcome.confidence)
+                categories.append(outcome.metadata.category)
+                subcategories.append(outcome.metadata.subcategory)
+
+    result = chunk[["question", "expected_answer"]].copy()
+    result["predicted_answer"] = predicted
+    result["confidence"] = confidences
+    result["is_correct"] = result["predicted_answer"] == result["expected_answer"]
+    result["category"] = categories
+    result["subcategory"] = subcategories
+    return result[RESULT_COLUMNS]
+
+
+def _write_chunk(result: pd.DataFrame, chunk_path: Path) -> None:
+    # Yarım kalan yazımlar checkpoint sayılmasın diye önce geçici dosyaya yaz
+    tmp_path = chunk_path.with_suffix(".tmp")
+    result.to_csv(tmp_path, index=True, index_label="row", encoding="utf-8")
+    os.replace(tmp_path, chunk_path)
+
+
+def _load_service(model_dir: Path) -> NLPService:
+    # Değerlendirme yalnızca sınıflandırıcıyı kullanır, vektör deposu yüklenmez; yazım
+    # düzeltme dizini ise sınıflandırıcının gördüğü metni değiştirdiği için servisteki gibi yüklenir
+    return NLPService(model_dir=model_dir, typo_index=load_typo_index(model_dir / "typo_index.joblib"))
+
+
+def _init_worker(num_threads: int, model_dir: Path) -> None:
+    global _WORKER_NLP
+    import torch
+
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+    _WORKER_NLP = _load_service(model_dir)
+
+
+def _run_worker_chunk(chunk: pd.DataFrame, batch_size: int, chunk_path: Path) -> int:
+    assert _WORKER_NLP is not None
+    _write_chunk(predict_chunk(_WORKER_NLP, chunk, batch_size), chunk_path)
+    return len(chunk)
+
+
+def _dataset_fingerprint(df: pd.DataFrame, chunk_size: int, model_dir: Path) -> str:
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    digest.update(str(chunk_size).encode())
+    digest.update(str(model_dir).encode())
+    return digest.hexdigest()
+
+
+def _prepare_checkpoint_dir(checkpoint_dir: Path, fingerprint: str, resume: bool) -> None:
+    manifest_path = checkpoint_dir / "manifest.json"
+    if resume and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("fingerprint") == fingerprint:
+            return
+        print("Checkpoint farklı bir veri seti/model için oluşturulmuş, baştan başlanıyor.")
+    if checkpoint_dir.exists():
+        shutil.rmtree(checkpoint_dir)
+    checkpoint_dir.mkdir(parents=True)
+    manifest_path.write_text(json.dumps({"fingerprint": fingerprint}), encoding="utf-8")
+
+
+def run_predictions(
+    df: pd.DataFrame,
+    checkpoint_dir: Path,
+    model_dir: Path | None = None,
+    chunk_size: int = 512,
+    batch_size: int = 32,
+    workers: int = 1,
+    resume: bool = True,
+    cache: PredictionCache | None = None,
+) -> pd.DataFrame:
+    """Veri setini parçalara bölerek tahmin eder; her parça diske yazılır ve
+    yarıda kalan bir çalışma aynı checkpoint dizininden devam ettirilebilir.
+    Önbellek verilirse aynı model için daha önce tahmin edilmiş sorular atlanır."""
+    model_dir = model_dir or get_settings().model_dir
+    df = df.assign(question_normalized=batch_normalize(df["question"].tolist()))
+
+    cached_df = pd.DataFrame(columns=RESULT_COLUMNS)
+    model_hash = None
+    if cache is not None:
+        model_hash = model_artifact_hash(model_dir)
+        cached = cache.lookup(model_hash)
+        hit_mask = df["question_normalized"].isin(cached.index)
+        cached_df = df[hit_mask].join(cached, on="question_normalized")
+        cached_df["is_correct"] = cached_df["predicted_answer"] == cached_df["expected_answer"]
+        df = df[~hit_mask]
+        print(f"Önbellekten {int(hit_mask.sum())} tahmin alındı, {len(df)} soru modele verilecek")
+
+    predicted_df = _predict_with_checkpoints(df, checkpoint_dir, model_dir, chunk_size, batch_size, workers, resume)
+    if cache is not None and model_hash is not None and not predicted_df.empty:
+        cache.store(model_hash, predicted_df.join(df["question_normalized"]))
+
+    frames = [frame for frame in (cached_df[RESULT_COLUMNS], predicted_df) if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    results_df = pd.concat(frames).sort_index()
+    results_df["is_correct"] = results_df["is_correct"].astype(bool)
+    return results_df.reset_index(drop=True)
+
+
+def _predict_with_checkpoints(
+    df: pd.DataFrame,
+    checkpoint_dir: Path,
+    model_dir: Path,
+    chunk_size: int,
+    batch_size: int,
+    workers: int,
+    resume: bool,
+) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    _prepare_checkpoint_dir(checkpoint_dir, _dataset_fingerprint(df, chunk_size, model_dir), resume)
+
+    chunk_paths = []
+    pending = []
+    for chunk_index, start in enumerate(range(0, len(df), chunk_size)):
+        chunk_path = checkpoint_dir / f"chunk_{chunk_index:05d}.csv"
+        chunk_paths.append(chunk_path)
+        if not chunk_path.exists():
+            pending.append((df.iloc[start:start + chunk_size], chunk_path))
+
+    done_rows = len(df) - sum(len(chunk) for chunk, _ in pending)
+    if done_rows:
+        print(f"Checkpoint bulundu: {done_rows} soru atlanıyor")
+
+    with tqdm(total=len(df), initial=done_rows, desc="Test ediliyor") as progress:
+        if workers <= 1:
+            print("Model yükleniyor...")
+            nlp = _load_service(model_dir)
+            print("Model yüklendi!")
+            for chunk, chunk_path in pending:
+                _write_chunk(predict_chunk(nlp, chunk, batch_size), chunk_path)
+                progress.update(len(chunk))
+        elif pending:
+            # Çekirdekleri worker'lar arasında paylaştır, aşırı thread açılmasın
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            print(f"{workers} worker başlatılıyor (worker başına {threads} thread)...")
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(threads, model_dir),
+            ) as executor:
+                futures = [
+                    executor.submit(_run_worker_chunk, chunk, batch_size, chunk_path)
+                    for chunk, chunk_path in pending
+                ]
+                for future in as_completed(futures):
+                    progress.update(future.result())
+
+    results_df = pd.concat(
+        [pd.read_csv(path, encoding="utf-8", keep_default_na=False, index_col="row") for path in chunk_paths]
+    )
+    results_df["is_correct"] = results_df["is_correct"].astype(str) == "True"
+    results_df["confidence"] = pd.to_numeric(results_df["confidence"], errors="coerce").fillna(0.0)
+    return results_df
+
+
+def build_answer_report(results_df: pd.DataFrame, show_correct: bool = False) -> dict[str, Any]:
+    """Cevap tiplerine göre doğruluk raporunu groupby ile hesaplar."""
+    grouped_df = results_df if show_correct else results_df[results_df["is_correct"]]
+    if grouped_df.empty:
+        return {}
+
+    groups = grouped_df.groupby("expected_answer", sort=False)
+    report = groups["is_correct"].agg(total_questions="size", correct_predictions="sum")
+    report["wrong_predictions"] = report["total_questions"] - report["correct_predictions"]
+    report["accuracy"] = report["correct_predictions"] / report["total_questions"] * 100
+
+    # Örnek sorular (doğru ve yanlış)
+    def examples(mask: pd.Series) -> pd.Series:
+        subset = grouped_df[mask]
+        return subset.groupby("expected_answer", sort=False).head(5).groupby(
+            "expected_answer", sort=False
+        )["question"].agg(list)
+
+    empty_list = pd.Series([[]] * len(report), index=report.index)
+    report["example_questions_correct"] = examples(grouped_df["is_correct"]).reindex(report.index)
+    report["example_questions_wrong"] = examples(~grouped_df["is_correct"]).reindex(report.index)
+    for column in ("example_questions_correct", "example_questions_wrong"):
+        report[column] = report[column].where(report[column].notna(), empty_list)
+    report["all_questions"] = groups["question"].agg(list)
+
+    report = report.astype({
+        "total_questions": int,
+        "correct_predictions": int,
+        "wrong_predictions": int,
+        "accuracy": float,
+    })
+    return report.to_dict(orient="index")
+
+
+def test_all_questions(
+    csv_path: Path,
+    output_dir: Path,
+    sample_size: int | None = None,
+    show_correct: bool = False,
+    chunk_size: int = 512,
+    batch_size: int = 32,
+    workers: int = 1,
+    resume: bool = True,
+    model_dir: Path | None = None,
+    cache_path: Path | None = None,
+) -> None:
+    """Tüm soruları test eder ve sonuçları raporlar."""
+
+    print(f"Veri seti okunuyor: {csv_path}")
+    df = read_dataset(csv_path, sample_size)
+
+    print(f"Toplam {len(df)} soru test ediliyor...")
+
+    # Çıktı dizinini oluştur
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_dir = output_dir / "checkpoint"
+
+    cache = PredictionCache(cache_path) if cache_path else None
+    try:
+        results_df = run_predictions(
+            df,
+            checkpoint_dir,
+            model_dir=model_dir,
+            chunk_size=chunk_size,
+            batch_size=batch_size,
+            workers=workers,
+            resume=resume,
+            cache=cache,
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    errors_df = results_df[~results_df["is_correct"]]
+
     # İstatistikler
-    total = len(results)
-    correct = sum(1 for r in results if r["is_correct"])
+    total = len(results_df)
+    correct = int(results_df["is_correct"].sum())
     accuracy = (correct / total * 100) if total > 0 else 0
-    
+
     print(f"\n{'='*60}")
     print(f"TEST SONUÇLARI")
     print(f"{'='*60}")
@@ -112,55 +386,35 @@ def test_all_questions(
     print(f"Doğruluk oranı: {accuracy:.2f}%")
     print(f"Hata oranı: {100 - accuracy:.2f}%")
     print(f"{'='*60}\n")
-    
-    # Çıktı dizinini oluştur
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
+
     # 1. Tüm sonuçları CSV olarak kaydet
-    results_df = pd.DataFrame(results)
     results_csv = output_dir / "all_predictions.csv"
     results_df.to_csv(results_csv, index=False, encoding="utf-8-sig")
     print(f"Tüm sonuçlar kaydedildi: {results_csv}")
-    
+
     # 2. Sadece hatalı tahminleri kaydet
-    if errors:
-        errors_df = pd.DataFrame(errors)
+    if not errors_df.empty:
         errors_csv = output_dir / "errors_only.csv"
         errors_df.to_csv(errors_csv, index=False, encoding="utf-8-sig")
         print(f"Hatalı tahminler kaydedildi: {errors_csv}")
-        print(f"Toplam {len(errors)} hatalı tahmin var")
-    
+        print(f"Toplam {len(errors_df)} hatalı tahmin var")
+
     # 3. Cevap tiplerine göre gruplandırılmış rapor
-    answer_report = {}
-    for answer, questions in answer_groups.items():
-        correct_count = sum(1 for q in questions if q["is_correct"])
-        total_count = len(questions)
-        accuracy = (correct_count / total_count * 100) if total_count > 0 else 0
-        
-        # Örnek sorular (doğru ve yanlış)
-        correct_examples = [q["question"] for q in questions if q["is_correct"]][:5]
-        wrong_examples = [q["question"] for q in questions if not q["is_correct"]][:5]
-        
-        answer_report[answer] = {
-            "total_questions": total_count,
-            "correct_predictions": correct_count,
-            "wrong_predictions": total_count - correct_count,
-            "accuracy": accuracy,
-            "example_questions_correct": correct_examples,
-            "example_questions_wrong": wrong_examples,
-            "all_questions": [q["question"] for q in questions],
-        }
-    
+    answer_report = build_answer_report(results_df, show_correct=show_correct)
+
     # Cevap tiplerine göre raporu kaydet
     report_json = output_dir / "answer_type_report.json"
     with report_json.open("w", encoding="utf-8") as f:
         json.dump(answer_report, f, ensure_ascii=False, indent=2)
     print(f"Cevap tiplerine göre rapor kaydedildi: {report_json}")
-    
+
     # 4. Özet HTML raporu oluştur
     html_report = output_dir / "report.html"
-    create_html_report(results, errors, answer_report, accuracy, html_report)
+    create_html_report(total, correct, len(errors_df), answer_report, accuracy, html_report)
     print(f"HTML rapor oluşturuldu: {html_report}")
+
+    # Raporlar yazıldı, checkpoint'lere artık gerek yok
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
     
     # 5. Konsola özet göster
     print(f"\n{'='*60}")
@@ -189,9 +443,202 @@ def test_all_questions(
     print(f"{'='*60}")
 
 
+def compare_models(
+    csv_path: Path,
+    output_dir: Path,
+    base_model_dir: Path,
+    candidate_model_dir: Path,
+    cache_path: Path | None = None,
+    sample_size: int | None = None,
+    chunk_size: int = 512,
+    batch_size: int = 32,
+    workers: int = 1,
+    resume: bool = True,
+) -> pd.DataFrame:
+    """İki model dizinini aynı veri setinde karşılaştırır ve doğrudan yanlışa
+    (veya tersi) dönen soruları raporlar. Önbellek verildiyse tahminler oradan
+    okunduğu için yalnızca yeni/değişen satırlar ve yeni model modele verilir."""
+
+    print(f"Veri seti okunuyor: {csv_path}")
+    df = read_dataset(csv_path, sample_size)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    cache = PredictionCache(cache_path) if cache_path else None
+    try:
+        runs = {}
+        for name, model_dir in (("base", base_model_dir), ("candidate", candidate_model_dir)):
+            print(f"\n[{name}] {model_dir}")
+            runs[name] = run_predictions(
+                df,
+                output_dir / f"checkpoint_{name}",
+                model_dir=model_dir,
+                chunk_size=chunk_size,
+                batch_size=batch_size,
+                workers=workers,
+                resume=resume,
+                cache=cache,
+            )
+            shutil.rmtree(output_dir / f"checkpoint_{name}", ignore_errors=True)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    base, candidate = runs["base"], runs["candidate"]
+    diff_df = pd.DataFrame({
+        "question": df["question"],
+        "expected_answer": df["expected_answer"],
+        "base_predicted_answer": base["predicted_answer"],
+        "base_confidence": base["confidence"],
+        "base_is_correct": base["is_correct"],
+        "candidate_predicted_answer": candidate["predicted_answer"],
+        "candidate_confidence": candidate["confidence"],
+        "candidate_is_correct": candidate["is_correct"],
+    })
+    diff_df["confidence_delta"] = diff_df["candidate_confidence"] - diff_df["base_confidence"]
+    diff_df["change"] = "unchanged"
+    diff_df.loc[diff_df["base_is_correct"] & ~diff_df["candidate_is_correct"], "change"] = "regression"
+    diff_df.loc[~diff_df["base_is_correct"] & diff_df["candidate_is_correct"], "change"] = "fix"
+
+    flips = diff_df[diff_df["change"] != "unchanged"]
+    flips_csv = output_dir / "model_diff.csv"
+    flips.to_csv(flips_csv, index=False, encoding="utf-8-sig")
+
+    total = len(diff_df)
+    base_accuracy = diff_df["base_is_correct"].mean() * 100 if total else 0
+    candidate_accuracy = diff_df["candidate_is_correct"].mean() * 100 if total else 0
+    regressions = flips[flips["change"] == "regression"]
+
+    print(f"\n{'='*60}")
+    print("MODEL KARŞILAŞTIRMASI")
+    print(f"{'='*60}")
+    print(f"Toplam soru: {total}")
+    print(f"Base doğruluk: {base_accuracy:.2f}%")
+    print(f"Aday doğruluk: {candidate_accuracy:.2f}%")
+    print(f"Doğrudan yanlışa dönen: {len(regressions)}")
+    print(f"Yanlıştan doğruya dönen: {len(flips) - len(regressions)}")
+    print(f"Farklı tahmin edilen: {int((diff_df['base_predicted_answer'] != diff_df['candidate_predicted_answer']).sum())}")
+    if not regressions.empty:
+        print("\nÖrnek gerilemeler:")
+        for row in regressions.head(10).itertuples(index=False):
+            print(f"  - {row.question} -> {row.candidate_predicted_answer[:80]}")
+    print(f"\nDeğişen sorular kaydedildi: {flips_csv}")
+    print(f"{'='*60}")
+    return diff_df
+
+
+def _classify_all(nlp: NLPService, questions: list[str], batch_size: int):
+    outcomes = []
+    for start in range(0, len(questions), batch_size):
+        outcomes.extend(nlp.classify_batch(questions[start:start + batch_size]))
+    return outcomes
+
+
+def _median_latency_ms(nlp: NLPService, questions: list[str]) -> float:
+    # Canlı sistem soruları tek tek sınıflandırır; gecikme de tek soruluk ileri geçişle ölçülür
+    for question in questions[:5]:
+        nlp.classify_batch([question])
+    timings = []
+    for question in questions:
+        started = time.perf_counter()
+        nlp.classify_batch([question])
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings)) if timings else 0.0
+
+
+def early_exit_tradeoff(
+    csv_path: Path,
+    output_dir: Path,
+    model_dir: Path,
+    thresholds: list[float],
+    sample_size: int | None = None,
+    batch_size: int = 32,
+    latency_samples: int = 200,
+) -> pd.DataFrame:
+    """Erken çıkış eşiklerini tam modelle karşılaştırır: doğruluk, tam modelle
+    uyum, ortalama çıkış katmanı, katman başına çıkış oranı ve tek soru gecikmesi."""
+
+    print(f"Veri seti okunuyor: {csv_path}")
+    df = read_dataset(csv_path, sample_size)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    questions = df["question"].tolist()
+    expected = df["expected_answer"].tolist()
+    latency_questions = questions[:latency_samples]
+
+    full = _load_service(model_dir)
+    early = NLPService(model_dir=model_dir, early_exit_threshold=max(thresholds))
+    if early.exit_heads is None:
+        raise SystemExit(f"{model_dir} içinde erken çıkış başlıkları yok (train_classifier.py --exit-layers ile eğitin)")
+    total_layers = full.model.config.num_hidden_layers
+
+    print("\nTam model değerlendiriliyor...")
+    full_outcomes = _classify_all(full, questions, batch_size)
+    full_answers = [outcome.metadata.answer.strip() for outcome in full_outcomes]
+    full_latency = _median_latency_ms(full, latency_questions)
+    rows: list[dict[str, Any]] = [{
+        "threshold": None,
+        "accuracy": float(np.mean([a == e for a, e in zip(full_answers, expected)])) if expected else 0.0,
+        "agreement": 1.0,
+        "mean_exit_layer": float(total_layers),
+        "latency_ms": full_latency,
+        "speedup": 1.0,
+        **{f"exit_layer_{layer}": 0.0 for layer in early.exit_heads.layers},
+        f"exit_layer_{total_layers}": 1.0,
+    }]
+
+    for threshold in sorted(thresholds):
+        print(f"Eşik {threshold:.2f} değerlendiriliyor...")
+        early.early_exit_threshold = threshold
+        outcomes = _classify_all(early, questions, batch_size)
+        answers = [outcome.metadata.answer.strip() for outcome in outcomes]
+        exit_layers = pd.Series([outcome.exit_layer for outcome in outcomes])
+        latency = _median_latency_ms(early, latency_questions)
+        distribution = exit_layers.value_counts(normalize=True)
+        rows.append({
+            "threshold": threshold,
+            "accuracy": float(np.mean([a == e for a, e in zip(answers, expected)])) if expected else 0.0,
+            "agreement": float(np.mean([a == f for a, f in zip(answers, full_answers)])) if answers else 0.0,
+            "mean_exit_layer": float(exit_layers.mean()) if len(exit_layers) else 0.0,
+            "latency_ms": latency,
+            "speedup": full_latency / latency if latency else 0.0,
+            **{
+                f"exit_layer_{layer}": float(distribution.get(layer, 0.0))
+                for layer in [*early.exit_heads.layers, total_layers]
+            },
+        })
+
+    report = pd.DataFrame(rows)
+    report_csv = output_dir / "early_exit_report.csv"
+    report.to_csv(report_csv, index=False, encoding="utf-8-sig")
+    with (output_dir / "early_exit_report.json").open("w", encoding="utf-8") as fp:
+        json.dump(
+            {"model_dir": str(model_dir), "questions": len(df), "total_layers": total_layers, "rows": rows},
+            fp,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    exit_columns = [column for column in report.columns if column.startswith("exit_layer_")]
+    print(f"\n{'='*60}")
+    print("ERKEN ÇIKIŞ: DOĞRULUK / GECİKME")
+    print(f"{'='*60}")
+    print(f"Toplam soru: {len(df)} | Katman sayısı: {total_layers}")
+    print(f"{'Eşik':>6} {'Doğruluk':>9} {'Uyum':>7} {'Ort.katman':>10} {'ms':>7} {'Hızlanma':>9}  Çıkış dağılımı")
+    for row in rows:
+        label = "tam" if row["threshold"] is None else f"{row['threshold']:.2f}"
+        exits = " ".join(f"L{column.rsplit('_', 1)[1]}:{row[column] * 100:.0f}%" for column in exit_columns)
+        print(
+            f"{label:>6} {row['accuracy'] * 100:8.2f}% {row['agreement'] * 100:6.2f}% "
+            f"{row['mean_exit_layer']:10.2f} {row['latency_ms']:7.2f} {row['speedup']:8.2f}x  {exits}"
+        )
+    print(f"\nRapor kaydedildi: {report_csv}")
+    print(f"{'='*60}")
+    return report
+
+
 def create_html_report(
-    results: list[dict[str, Any]],
-    errors: list[dict[str, Any]],
+    total: int,
+    correct: int,
+    wrong: int,
     answer_report: dict[str, Any],
     overall_accuracy: float,
     output_path: Path,
@@ -323,15 +770,15 @@ def create_html_report(
         
         <div class="stats">
             <div class="stat-card">
-                <h3>{len(results)}</h3>
+                <h3>{total}</h3>
                 <p>Toplam Soru</p>
             </div>
             <div class="stat-card">
-                <h3>{sum(1 for r in results if r['is_correct'])}</h3>
+                <h3>{correct}</h3>
                 <p>Doğru Tahmin</p>
             </div>
             <div class="stat-card">
-                <h3>{len(errors)}</h3>
+                <h3>{wrong}</h3>
                 <p>Yanlış Tahmin</p>
             </div>
             <div class="stat-card">
@@ -433,13 +880,95 @@ if __name__ == "__main__":
         action="store_true",
         help="Doğru tahminleri de raporlara dahil et",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=512,
+        help="Diske yazılan (checkpoint) her parçadaki soru sayısı",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Tek ileri geçişte modele verilen soru sayısı",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Paralel tahmin yapan süreç sayısı (her biri kendi modelini yükler)",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Mevcut checkpoint'leri yok sayıp baştan başla",
+    )
+    parser.add_argument(
+        "--model-dir",
+        type=Path,
+        default=None,
+        help="Test edilecek model dizini (varsayılan: ayarlardaki model_dir)",
+    )
+    parser.add_argument(
+        "--compare-model-dir",
+        type=Path,
+        default=None,
+        help="Verilirse --model-dir ile bu aday model karşılaştırılır (diff modu)",
+    )
+    parser.add_argument(
+        "--cache-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "prediction_cache.db",
+        help="Model hash'ine göre tahmin önbelleği dosyası",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Tahmin önbelleğini kullanma",
+    )
+    parser.add_argument(
+        "--early-exit-thresholds",
+        type=str,
+        default=None,
+        help="Virgülle ayrılmış erken çıkış eşikleri (ör. 0.5,0.7,0.9); verilirse doğruluk/gecikme raporu üretilir",
+    )
     
     args = parser.parse_args()
-    
-    test_all_questions(
-        csv_path=args.data_path,
-        output_dir=args.output_dir,
-        sample_size=args.sample_size,
-        show_correct=args.show_correct,
-    )
+    cache_path = None if args.no_cache else args.cache_path
+
+    if args.early_exit_thresholds:
+        early_exit_tradeoff(
+            csv_path=args.data_path,
+            output_dir=args.output_dir,
+            model_dir=args.model_dir or get_settings().model_dir,
+            thresholds=[float(value) for value in args.early_exit_thresholds.split(",") if value.strip()],
+            sample_size=args.sample_size,
+            batch_size=args.batch_size,
+        )
+    elif args.compare_model_dir:
+        compare_models(
+            csv_path=args.data_path,
+            output_dir=args.output_dir,
+            base_model_dir=args.model_dir or get_settings().model_dir,
+            candidate_model_dir=args.compare_model_dir,
+            cache_path=cache_path,
+            sample_size=args.sample_size,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            resume=not args.no_resume,
+        )
+    else:
+        test_all_questions(
+            csv_path=args.data_path,
+            output_dir=args.output_dir,
+            sample_size=args.sample_size,
+            show_correct=args.show_correct,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            resume=not args.no_resume,
+            model_dir=args.model_dir,
+            cache_path=cache_path,
+        )
 
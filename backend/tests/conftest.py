@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Importing app.* creates the tables of SQLITE_PATH; keep the tracked database out of the tests
+os.environ["SQLITE_PATH"] = str(Path(tempfile.mkdtemp(prefix="chatbot-tests-")) / "chat_history.db")
+os.environ.setdefault("PRELOAD_MODEL", "false")
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
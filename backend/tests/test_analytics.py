@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import ChatMessage, ChatSession, PredictionRollup, RollupWatermark
+from app.services.analytics import ensure_monotonic_message_ids, refresh_rollups
+
+THRESHOLD = 0.5
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    yield engine
+    engine.dispose()
+
+
+def add_session(db, session_id: str, answers: int) -> None:
+    db.add(ChatSession(id=session_id, title=session_id))
+    for position in range(answers):
+        db.add(ChatMessage(session_id=session_id, sender="user", text=f"soru {position}"))
+        db.add(ChatMessage(session_id=session_id, sender="bot", text=f"cevap {position}", category="genel", confidence=0.9))
+    db.commit()
+
+
+def answers_rolled_up(db) -> int:
+    return db.query(func.coalesce(func.sum(PredictionRollup.answer_count), 0)).scalar()
+
+
+def test_refresh_counts_messages_written_after_newest_session_is_deleted(engine):
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    add_session(db, "eski", answers=1)
+    refresh_rollups(db, THRESHOLD)
+    add_session(db, "yeni", answers=1)
+    refresh_rollups(db, THRESHOLD)
+    watermark = db.get(RollupWatermark, "predictions").last_message_id
+
+    # Deleting the newest session frees the highest ids
+    db.delete(db.get(ChatSession, "yeni"))
+    db.commit()
+    add_session(db, "sonra", answers=1)
+
+    assert db.query(func.min(ChatMessage.id)).filter(ChatMessage.session_id == "sonra").scalar() > watermark
+    result = refresh_rollups(db, THRESHOLD)
+    assert result.processed == 2
+    assert answers_rolled_up(db) == 3
+    db.close()
+
+
+def test_legacy_table_is_rebuilt_with_ids_above_the_watermark(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE chat_sessions (id VARCHAR(36) PRIMARY KEY, title VARCHAR(160), "
+            "created_at DATETIME NOT NULL, updated_at DATETIME NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE chat_messages (id INTEGER NOT NULL PRIMARY KEY, "
+            "session_id VARCHAR(36) NOT NULL REFERENCES chat_sessions (id), sender VARCHAR(16) NOT NULL, "
+            "text TEXT NOT NULL, category VARCHAR(64), subcategory VARCHAR(128), confidence FLOAT, "
+            "created_at DATETIME NOT NULL)"
+        )
+        connection.exec_driver_sql("CREATE INDEX ix_chat_messages_id ON chat_messages (id)")
+        connection.exec_driver_sql("CREATE INDEX ix_chat_messages_session_id ON chat_messages (session_id)")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    add_session(db, "eski", answers=2)
+    # Watermark past the last id, as after an earlier delete of the newest session
+    db.add(RollupWatermark(name="predictions", last_message_id=10, updated_at=datetime.utcnow()))
+    db.commit()
+    db.close()
+
+    assert ensure_monotonic_message_ids(engine)
+    assert not ensure_monotonic_message_ids(engine)
+
+    db = sessionmaker(bind=engine)()
+    assert db.query(ChatMessage).count() == 4
+    add_session(db, "yeni", answers=1)
+    assert db.query(func.min(ChatMessage.id)).filter(ChatMessage.session_id == "yeni").scalar() == 11
+    db.close()
+
+
+def test_concurrent_first_refresh_backs_off_instead_of_failing(engine, monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    add_session(db, "eski", answers=2)
+
+    # Another worker finished the first refresh after this one read "no watermark yet"
+    other = sessionmaker(bind=engine)()
+    refresh_rollups(other, THRESHOLD)
+    other.close()
+    add_session(db, "yeni", answers=1)
+    real_get = db.get
+    monkeypatch.setattr(db, "get", lambda model, key: None if model is RollupWatermark else real_get(model, key))
+
+    result = refresh_rollups(db, THRESHOLD)
+    assert result.processed == 0 and not result.caught_up
+    assert answers_rolled_up(db) == 2
+
+    monkeypatch.setattr(db, "get", real_get)
+    assert refresh_rollups(db, THRESHOLD).processed == 2
+    assert answers_rolled_up(db) == 3
+    db.close()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services import model_manager
+from app.services.model_manager import BotConfig, ModelRegistry
+
+MODEL_BYTES = 100
+
+
+class LoadTracker:
+    """Stands in for load_nlp_service and records how many models were in memory at once."""
+
+    def __init__(self, seconds: float = 0.2):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.in_memory = 0
+        self.peak = 0
+
+    def load(self, model_dir, **kwargs):
+        with self.lock:
+            self.in_memory += 1
+            self.peak = max(self.peak, self.in_memory)
+        time.sleep(self.seconds)
+        return FakeService(self, Path(model_dir))
+
+
+class FakeService:
+    def __init__(self, tracker: LoadTracker, model_dir: Path):
+        self.tracker = tracker
+        self.model_dir = model_dir
+
+    def __del__(self):
+        with self.tracker.lock:
+            self.tracker.in_memory -= 1
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = LoadTracker()
+    monkeypatch.setattr(model_manager, "load_nlp_service", tracker.load)
+    monkeypatch.setattr(model_manager, "estimate_memory_bytes", lambda service: MODEL_BYTES)
+    return tracker
+
+
+def make_registry(bot_ids, **limits) -> ModelRegistry:
+    bots = [BotConfig(bot_id=bot_id, model_dir=Path(f"/models/{bot_id}")) for bot_id in bot_ids]
+    return ModelRegistry(bots, default_bot_id=bot_ids[0], **limits)
+
+
+def load_concurrently(registry: ModelRegistry, bot_ids) -> None:
+    threads = [threading.Thread(target=registry.get, args=(bot_id,)) for bot_id in bot_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_first_loads_respect_max_resident(tracker):
+    registry = make_registry(["a", "b", "c"], max_resident=1)
+    load_concurrently(registry, ["a", "b", "c"])
+
+    assert tracker.peak == 1
+    assert len(registry.resident()) == 1
+
+
+def test_concurrent_loads_respect_memory_budget(tracker):
+    registry = make_registry(["a", "b", "c", "d"], max_resident=4, memory_budget_bytes=2 * MODEL_BYTES)
+    # Measure every bot once so their sizes are known
+    for bot_id in ["a", "b", "c", "d"]:
+        registry.get(bot_id)
+    tracker.peak = tracker.in_memory
+
+    load_concurrently(registry, ["a", "b", "c", "d"])
+    assert tracker.peak <= 2
+    assert len(registry.resident()) == 2
+
+
+def test_failed_load_releases_its_reservation(tracker, monkeypatch):
+    registry = make_registry(["a", "b"], max_resident=1)
+
+    def fail(model_dir, **kwargs):
+        raise OSError("missing model")
+
+    monkeypatch.setattr(model_manager, "load_nlp_service", fail)
+    with pytest.raises(OSError):
+        registry.get("b")
+    assert registry.resident() == []
+
+    monkeypatch.setattr(model_manager, "load_nlp_service", tracker.load)
+    registry.get("a")
+    assert registry.resident() == ["a"]
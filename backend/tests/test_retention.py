@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import fcntl
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import ChatMessage, ChatSession
+from app.services.retention import retention_lock_path, run_retention
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    old = datetime.utcnow() - timedelta(days=90)
+    for index in range(3):
+        db.add(ChatSession(id=f"eski-{index}", title="eski", created_at=old, updated_at=old))
+        db.add(ChatMessage(session_id=f"eski-{index}", sender="user", text="merhaba", created_at=old))
+    db.add(ChatSession(id="yeni", title="yeni"))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def archived_sessions(archive_dir) -> int:
+    lines = 0
+    for path in archive_dir.rglob("*.jsonl.gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as fp:
+            lines += sum(1 for line in fp if line.strip())
+    return lines
+
+
+def test_run_is_skipped_while_another_process_holds_the_lock(session_factory, tmp_path):
+    lock_path = retention_lock_path(tmp_path / "chat.db")
+    with open(lock_path, "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        stats = run_retention(session_factory, 30, tmp_path / "archive", lock_path=lock_path)
+    assert stats.skipped
+    assert stats.sessions_deleted == 0
+
+    stats = run_retention(session_factory, 30, tmp_path / "archive", lock_path=lock_path)
+    assert not stats.skipped
+    assert stats.sessions_deleted == 3
+    assert archived_sessions(tmp_path / "archive") == 3
+
+    db = session_factory()
+    assert [session.id for session in db.query(ChatSession)] == ["yeni"]
+    db.close()
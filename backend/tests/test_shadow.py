@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.services import shadow
+from app.services.shadow import ShadowController
+
+
+class FakeCandidate:
+    def __init__(self, model_dir: Path):
+        self.model_dir = model_dir
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    def load(model_dir, **kwargs):
+        if model_dir.name == "bozuk":
+            raise OSError("model yok")
+        return FakeCandidate(model_dir)
+
+    monkeypatch.setattr(shadow, "load_nlp_service", load)
+    controller = ShadowController()
+    yield controller
+    controller.stop()
+
+
+def test_failed_candidate_leaves_running_evaluation_alone(controller):
+    assert controller.begin("default", Path("/models/aday"))
+    controller.start("default", Path("/models/aday"))
+    running = controller.evaluator
+
+    assert controller.begin("ikinci", Path("/models/bozuk"))
+    assert (controller.bot_id, controller.model_dir) == ("default", Path("/models/aday"))
+    assert controller.pending_bot_id == "ikinci"
+
+    controller.start("ikinci", Path("/models/bozuk"))
+    assert controller.state == "running"
+    assert controller.evaluator is running
+    assert (controller.bot_id, controller.model_dir) == ("default", Path("/models/aday"))
+    assert controller.pending_bot_id is None and controller.pending_model_dir is None
+    assert controller.error == "model yok"
+
+
+def test_failed_first_candidate_is_reported(controller):
+    assert controller.begin("default", Path("/models/bozuk"))
+    controller.start("default", Path("/models/bozuk"))
+    assert controller.state == "failed"
+    assert controller.evaluator is None and controller.bot_id is None
+
+
+def test_stop_while_loading_discards_candidate(controller):
+    assert controller.begin("default", Path("/models/aday"))
+    controller.stop()
+    controller.start("default", Path("/models/aday"))
+    assert controller.state == "idle"
+    assert controller.evaluator is None
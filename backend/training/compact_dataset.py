@@ -0,0 +1,325 @@
+"""Deduplicate and compact the question/answer training data.
+
+Many rows of train.csv are the same question written with underscores, other
+casing or a changed suffix. They add training steps and vector store rows
+without teaching the model anything new. This stage:
+
+* drops rows whose normalized question and answer repeat an earlier row,
+* finds near-duplicates of the remaining questions with MinHash signatures
+  over ASCII-folded character shingles, bucketed with locality-sensitive
+  hashing, and drops a near-duplicate only when it has the same answer and
+  every word it contains is already present in the kept questions of that
+  answer, so no answer loses vocabulary,
+* reports normalized questions or near-duplicates that point to different
+  answers (label conflicts) and the per-answer class balance before and after,
+* checks coverage: every answer keeps at least one question, and a TF-IDF
+  index over the kept questions should still rank a dropped question's answer
+  first.
+
+train_classifier.py runs it as the first stage of training; this script
+writes the compacted CSV and the report on their own.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.utils import murmurhash3_32
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.services.preprocessing import batch_normalize, fold_ascii
+
+LOGGER = logging.getLogger("compact_dataset")
+
+# Smallest prime above 2**32 for the universal hash family h(x) = (a * x + b) mod p over
+# 32-bit shingle hashes; with a, b < 2**32 the products fit in uint64 without wrapping
+_PRIME = 4294967311
+# Examples kept per list in the report
+_REPORT_EXAMPLES = 20
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Deduplicate and compact the training dataset")
+    parser.add_argument(
+        "--data-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "raw" / "train.csv",
+        help="CSV dataset with question/answer columns.",
+    )
+    parser.add_argument("--output-path", type=Path, required=True, help="Where to write the compacted CSV.")
+    parser.add_argument(
+        "--report-path",
+        type=Path,
+        default=None,
+        help="Where to write the JSON report (default: next to the output CSV).",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=0.8,
+        help="Character-shingle Jaccard similarity above which two questions count as near-duplicates (0 = exact only).",
+    )
+    parser.add_argument("--shingle-size", type=int, default=4, help="Characters per shingle.")
+    parser.add_argument("--num-permutations", type=int, default=64, help="MinHash signature length.")
+    parser.add_argument("--bands", type=int, default=16, help="LSH bands; must divide --num-permutations.")
+    parser.add_argument(
+        "--min-examples",
+        type=int,
+        default=5,
+        help="Answers with fewer questions than this are listed as under-represented in the report.",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the MinHash permutations.")
+    return parser.parse_args()
+
+
+def shingles(text: str, size: int) -> set[str]:
+    padded = f" {fold_ascii(text)} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[start : start + size] for start in range(len(padded) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures over string sets using one universal hash per permutation."""
+
+    def __init__(self, num_permutations: int = 64, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 32, size=num_permutations, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_permutations, dtype=np.uint64)
+
+    def signature(self, items: set[str]) -> np.ndarray:
+        hashes = np.fromiter(
+            (murmurhash3_32(item, seed=0, positive=True) for item in items), dtype=np.uint64, count=len(items)
+        )
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(_PRIME)
+        return permuted.min(axis=1)
+
+
+def jaccard(left: set[str], right: set[str]) -> float:
+    return len(left & right) / len(left | right) if left or right else 1.0
+
+
+def class_balance(counts: pd.Series, min_examples: int) -> Dict[str, Any]:
+    if counts.empty:
+        return {"answers": 0}
+    return {
+        "answers": int(counts.size),
+        "rows": int(counts.sum()),
+        "min": int(counts.min()),
+        "median": float(counts.median()),
+        "max": int(counts.max()),
+        "imbalance_ratio": float(counts.max() / counts.min()),
+        "under_represented": int((counts < min_examples).sum()),
+    }
+
+
+def _top1_answers(index: pd.DataFrame, queries: pd.DataFrame, exclude_self: bool = False) -> np.ndarray:
+    # Same settings as the vector store built by train_classifier.make_vectorizer
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=25000)
+    matrix = vectorizer.fit_transform(index["question_normalized"])
+    scores = (vectorizer.transform(queries["question_normalized"]) @ matrix.T).toarray()
+    if exclude_self:
+        positions = index.index.get_indexer(queries.index)
+        scores[np.arange(len(queries)), positions] = -1.0
+    return index["answer"].to_numpy()[scores.argmax(axis=1)]
+
+
+def coverage_check(full: pd.DataFrame, kept: pd.DataFrame, dropped: pd.DataFrame) -> Dict[str, Any]:
+    """Share of dropped questions whose answer is the top TF-IDF match, among the kept questions and
+    (as the baseline) among all other questions of the full dataset."""
+    if dropped.empty:
+        return {"checked": 0, "top1_answer_match": 1.0, "baseline_top1_answer_match": 1.0}
+    expected = dropped["answer"].to_numpy()
+    matched = _top1_answers(kept, dropped) == expected
+    baseline = _top1_answers(full, dropped, exclude_self=True) == expected
+    return {
+        "checked": int(len(dropped)),
+        "top1_answer_match": float(matched.mean()),
+        "baseline_top1_answer_match": float(baseline.mean()),
+        "missed_examples": dropped.loc[matched < baseline, "question"].head(_REPORT_EXAMPLES).tolist(),
+    }
+
+
+def find_near_duplicates(
+    questions: Sequence[str],
+    answers: Sequence[str],
+    threshold: float,
+    shingle_size: int = 4,
+    num_permutations: int = 64,
+    bands: int = 16,
+    seed: int = 42,
+) -> Tuple[List[int], List[Tuple[int, int, float]]]:
+    """Return (rows to drop, near-duplicate pairs with different answers) for normalized questions.
+
+    Rows are visited in order and only compared with rows kept so far, so the
+    first phrasing of a question is the one that stays.
+    """
+    if num_permutations % bands:
+        raise ValueError("--bands must divide --num-permutations")
+    rows_per_band = num_permutations // bands
+    hasher = MinHasher(num_permutations, seed)
+
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    kept_shingles: Dict[int, set[str]] = {}
+    kept_words: Dict[str, set[str]] = defaultdict(set)
+    dropped: List[int] = []
+    conflicts: List[Tuple[int, int, float]] = []
+
+    for row, (question, answer) in enumerate(zip(questions, answers)):
+        items = shingles(question, shingle_size)
+        words = set(question.split())
+        signature = hasher.signature(items)
+        keys = [(band, signature[band * rows_per_band : (band + 1) * rows_per_band].tobytes()) for band in range(bands)]
+
+        candidates = {other for key in keys for other in buckets.get(key, ())}
+        duplicate = False
+        for other in sorted(candidates):
+            other_items = kept_shingles[other]
+            # Jaccard can never exceed the size ratio of the two sets
+            if min(len(items), len(other_items)) < threshold * max(len(items), len(other_items)):
+                continue
+            similarity = jaccard(items, other_items)
+            if similarity < threshold:
+                continue
+            if answers[other] != answer:
+                conflicts.append((other, row, similarity))
+            elif words <= kept_words[answer]:
+                duplicate = True
+        if duplicate:
+            dropped.append(row)
+            continue
+
+        kept_shingles[row] = items
+        kept_words[answer] |= words
+        for key in keys:
+            buckets[key].append(row)
+    return dropped, conflicts
+
+
+def compact_dataset(
+    df: pd.DataFrame,
+    near_duplicate_threshold: float = 0.8,
+    shingle_size: int = 4,
+    num_permutations: int = 64,
+    bands: int = 16,
+    min_examples: int = 5,
+    seed: int = 42,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Deduplicate a dataset with question, answer and question_normalized columns.
+
+    Returns the compacted frame (original row order and columns) and a JSON-ready report.
+    """
+    df = df.reset_index(drop=True)
+    before_counts = df["answer"].value_counts()
+
+    exact = df.duplicated(subset=["question_normalized", "answer"], keep="first")
+    answers_per_question = df.groupby("question_normalized")["answer"].nunique()
+    exact_conflicts = answers_per_question[answers_per_question > 1].index.tolist()
+    deduplicated = df[~exact]
+
+    near_dropped: List[int] = []
+    near_conflicts: List[Tuple[int, int, float]] = []
+    if near_duplicate_threshold > 0:
+        near_dropped, near_conflicts = find_near_duplicates(
+            deduplicated["question_normalized"].tolist(),
+            deduplicated["answer"].tolist(),
+            near_duplicate_threshold,
+            shingle_size=shingle_size,
+            num_permutations=num_permutations,
+            bands=bands,
+            seed=seed,
+        )
+    near_mask = np.zeros(len(deduplicated), dtype=bool)
+    near_mask[near_dropped] = True
+    compacted = deduplicated[~near_mask]
+
+    after_counts = compacted["answer"].value_counts()
+    lost_answers = sorted(set(before_counts.index) - set(after_counts.index))
+    if lost_answers:
+        raise RuntimeError(f"Compaction removed every question of {len(lost_answers)} answers")
+
+    questions = deduplicated["question"].tolist()
+    per_answer = pd.DataFrame({"before": before_counts, "after": after_counts}).fillna(0).astype(int)
+    report = {
+        "rows_before": int(len(df)),
+        "rows_after": int(len(compacted)),
+        "exact_duplicates": int(exact.sum()),
+        "near_duplicates": len(near_dropped),
+        "near_duplicate_threshold": near_duplicate_threshold,
+        "shingle_size": shingle_size,
+        "num_permutations": num_permutations,
+        "bands": bands,
+        "exact_conflicts": len(exact_conflicts),
+        "exact_conflict_examples": exact_conflicts[:_REPORT_EXAMPLES],
+        "near_conflicts": len(near_conflicts),
+        "near_conflict_examples": [
+            {"kept": questions[kept], "question": questions[row], "similarity": round(similarity, 3)}
+            for kept, row, similarity in near_conflicts[:_REPORT_EXAMPLES]
+        ],
+        "near_duplicate_examples": [questions[row] for row in near_dropped[:_REPORT_EXAMPLES]],
+        "class_balance": {
+            "before": class_balance(before_counts, min_examples),
+            "after": class_balance(after_counts, min_examples),
+        },
+        "under_represented_answers": per_answer[per_answer["after"] < min_examples].index.tolist(),
+        "per_answer": [
+            {"answer": answer, "before": int(row["before"]), "after": int(row["after"])}
+            for answer, row in per_answer.sort_values("after").iterrows()
+        ],
+        "coverage": coverage_check(df, compacted, pd.concat([df[exact], deduplicated[near_mask]])),
+    }
+    return compacted.reset_index(drop=True), report
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    df = pd.read_csv(args.data_path).dropna(subset=["question", "answer"])
+    df["question"] = df["question"].astype(str)
+    df["answer"] = df["answer"].astype(str)
+    df["question_normalized"] = batch_normalize(df["question"].tolist())
+
+    compacted, report = compact_dataset(
+        df,
+        near_duplicate_threshold=args.near_duplicate_threshold,
+        shingle_size=args.shingle_size,
+        num_permutations=args.num_permutations,
+        bands=args.bands,
+        min_examples=args.min_examples,
+        seed=args.seed,
+    )
+    report["source"] = str(args.data_path)
+
+    args.output_path.parent.mkdir(parents=True, exist_ok=True)
+    compacted.drop(columns=["question_normalized"]).to_csv(args.output_path, index=False, encoding="utf-8")
+    report_path = args.report_path or args.output_path.with_suffix(".report.json")
+    with report_path.open("w", encoding="utf-8") as fp:
+        json.dump(report, fp, ensure_ascii=False, indent=2)
+    LOGGER.info(
+        "Rows %s -> %s (%s exact, %s near duplicates), %s label conflicts; "
+        "dropped questions still matched: %.1f%% (%.1f%% before compaction)",
+        report["rows_before"],
+        report["rows_after"],
+        report["exact_duplicates"],
+        report["near_duplicates"],
+        report["exact_conflicts"] + report["near_conflicts"],
+        100 * report["coverage"]["top1_answer_match"],
+        100 * report["coverage"]["baseline_top1_answer_match"],
+    )
+    LOGGER.info("Compacted dataset written to %s, report to %s", args.output_path, report_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Shrink a fine-tuned model's vocabulary to the tokens the FAQ domain actually uses.
+
+The word-embedding matrix of a 32k-token BERT is a large share of its weights,
+while the training questions touch only a few thousand of those tokens. This
+export step keeps the tokens the normalized training questions produce, plus a
+safety margin for unseen queries (special tokens, every single-character piece
+so new words still split into characters instead of [UNK], and the
+--keep-top lowest ids, which WordPiece assigns to the most frequent pieces).
+The embedding rows and tokenizer vocabulary are remapped to the new ids and the
+pruned model is checked against the original on the training data before it is
+kept.
+
+WordPiece picks the longest matching piece greedily, so removing pieces that
+never win for a training word cannot change how those words are tokenized.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import pandas as pd
+import torch
+from torch import nn
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.services.nlp import NLPService
+from app.services.preprocessing import batch_normalize
+
+LOGGER = logging.getLogger("prune_vocabulary")
+
+# Rewritten from the remapped vocabulary; everything else in the model directory is copied as is
+TOKENIZER_FILES = ("vocab.txt", "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json")
+WEIGHT_PATTERNS = ("*.safetensors", "*.bin")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prune the tokenizer vocabulary and word embeddings of a model")
+    parser.add_argument("--model-dir", type=Path, required=True, help="Fine-tuned model directory to prune.")
+    parser.add_argument("--output-dir", type=Path, required=True, help="Directory for the pruned model (must not exist).")
+    parser.add_argument(
+        "--data-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "raw" / "train.csv",
+        help="CSV whose questions define the used token set and the verification set.",
+    )
+    parser.add_argument(
+        "--keep-top",
+        type=int,
+        default=2000,
+        help="Also keep the N lowest token ids (the most frequent WordPiece pieces) as a margin for unseen queries.",
+    )
+    parser.add_argument(
+        "--no-characters",
+        action="store_true",
+        help="Do not keep single-character pieces that are unused in the training data.",
+    )
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size for the verification pass.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1e-5,
+        help="Largest allowed absolute difference between original and pruned confidences.",
+    )
+    return parser.parse_args()
+
+
+def used_token_ids(tokenizer, texts: Sequence[str]) -> set[int]:
+    used: set[int] = set()
+    for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]:
+        used.update(ids)
+    return used
+
+
+def select_vocabulary(tokenizer, used: set[int], keep_top: int, keep_characters: bool) -> List[int]:
+    """Old token ids to keep, in their original order."""
+    vocab = tokenizer.get_vocab()
+    kept = set(used) | set(tokenizer.all_special_ids) | {token_id for token_id in vocab.values() if token_id < keep_top}
+    if keep_characters:
+        kept |= {token_id for token, token_id in vocab.items() if len(token.removeprefix("##")) == 1}
+    return sorted(kept)
+
+
+def _remap_post_processor(processor: Dict[str, Any] | None, remap: Dict[int, int]) -> None:
+    if processor is None:
+        return
+    kind = processor.get("type")
+    if kind == "TemplateProcessing":
+        for special in processor["special_tokens"].values():
+            special["ids"] = [remap[token_id] for token_id in special["ids"]]
+    elif kind in ("BertProcessing", "RobertaProcessing"):
+        for key in ("sep", "cls"):
+            processor[key][1] = remap[processor[key][1]]
+    elif kind == "Sequence":
+        for inner in processor["processors"]:
+            _remap_post_processor(inner, remap)
+    elif kind != "ByteLevel":
+        raise ValueError(f"Unsupported tokenizer post-processor: {kind}")
+
+
+def write_pruned_tokenizer(model_dir: Path, output_dir: Path, tokenizer, kept: List[int]) -> Dict[int, int]:
+    """Write tokenizer files whose vocabulary only holds ``kept``; returns old id -> new id."""
+    remap = {old_id: new_id for new_id, old_id in enumerate(kept)}
+    id_to_token = {token_id: token for token, token_id in tokenizer.get_vocab().items()}
+
+    with (model_dir / "tokenizer.json").open("r", encoding="utf-8") as fp:
+        spec = json.load(fp)
+    if spec["model"].get("type") != "WordPiece":
+        raise ValueError(f"Only WordPiece tokenizers can be pruned, got {spec['model'].get('type')}")
+    spec["model"]["vocab"] = {id_to_token[old_id]: new_id for old_id, new_id in remap.items()}
+    for added in spec.get("added_tokens", []):
+        added["id"] = remap[added["id"]]
+    _remap_post_processor(spec.get("post_processor"), remap)
+    if spec.get("padding") and "pad_id" in spec["padding"]:
+        spec["padding"]["pad_id"] = remap[spec["padding"]["pad_id"]]
+    with (output_dir / "tokenizer.json").open("w", encoding="utf-8") as fp:
+        json.dump(spec, fp, ensure_ascii=False)
+
+    # The slow tokenizer reads ids from line numbers
+    with (output_dir / "vocab.txt").open("w", encoding="utf-8") as fp:
+        for old_id in kept:
+            fp.write(id_to_token[old_id] + "\n")
+
+    config_path = model_dir / "tokenizer_config.json"
+    if config_path.exists():
+        with config_path.open("r", encoding="utf-8") as fp:
+            config = json.load(fp)
+        if "added_tokens_decoder" in config:
+            config["added_tokens_decoder"] = {
+                str(remap[int(token_id)]): value for token_id, value in config["added_tokens_decoder"].items()
+            }
+        with (output_dir / "tokenizer_config.json").open("w", encoding="utf-8") as fp:
+            json.dump(config, fp, ensure_ascii=False, indent=2)
+    if (model_dir / "special_tokens_map.json").exists():
+        shutil.copy2(model_dir / "special_tokens_map.json", output_dir / "special_tokens_map.json")
+    return remap
+
+
+def prune_embeddings(model, kept: List[int], remap: Dict[int, int]) -> None:
+    if model.get_output_embeddings() is not None:
+        raise ValueError("Models with an output projection over the vocabulary cannot be pruned")
+    old = model.get_input_embeddings()
+    pad_id = model.config.pad_token_id
+    new_pad_id = remap.get(pad_id) if pad_id is not None else None
+    pruned = nn.Embedding(len(kept), old.embedding_dim, padding_idx=new_pad_id)
+    with torch.no_grad():
+        pruned.weight.copy_(old.weight[torch.tensor(kept)])
+    model.set_input_embeddings(pruned)
+    model.config.vocab_size = len(kept)
+    model.config.pad_token_id = new_pad_id
+
+
+def copy_other_artifacts(model_dir: Path, output_dir: Path) -> None:
+    skipped = set(TOKENIZER_FILES) | {"config.json"}
+    weights = {path for pattern in WEIGHT_PATTERNS for path in model_dir.glob(pattern)}
+    for path in model_dir.iterdir():
+        if path.is_file() and path.name not in skipped and path not in weights:
+            shutil.copy2(path, output_dir / path.name)
+
+
+def verify_predictions(
+    original_dir: Path, pruned_dir: Path, questions: List[str], batch_size: int, tolerance: float
+) -> Dict[str, Any]:
+    """Classify every question with both models through the serving code path and compare."""
+    original = NLPService(model_dir=original_dir)
+    pruned = NLPService(model_dir=pruned_dir)
+    mismatched: List[str] = []
+    max_delta = 0.0
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start : start + batch_size]
+        for question, before, after in zip(batch, original.classify_batch(batch), pruned.classify_batch(batch)):
+            max_delta = max(max_delta, abs(before.confidence - after.confidence))
+            if before.metadata.id != after.metadata.id:
+                mismatched.append(question)
+    return {
+        "questions": len(questions),
+        "mismatched": len(mismatched),
+        "mismatched_examples": mismatched[:10],
+        "max_confidence_delta": max_delta,
+        "passed": not mismatched and max_delta <= tolerance,
+    }
+
+
+def directory_weight_bytes(model_dir: Path) -> int:
+    return sum(path.stat().st_size for pattern in WEIGHT_PATTERNS for path in model_dir.glob(pattern))
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.output_dir.exists():
+        raise SystemExit(f"Output directory already exists: {args.output_dir}")
+
+    df = pd.read_csv(args.data_path)
+    questions = df["question"].dropna().astype(str).tolist()
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model_dir)
+    original_vocab = len(tokenizer)
+    original_parameters = sum(p.numel() for p in model.parameters())
+
+    used = used_token_ids(tokenizer, batch_normalize(questions))
+    kept = select_vocabulary(tokenizer, used, args.keep_top, keep_characters=not args.no_characters)
+    LOGGER.info(
+        "Training questions use %s of %s tokens; keeping %s with the safety margin", len(used), original_vocab, len(kept)
+    )
+
+    args.output_dir.mkdir(parents=True)
+    try:
+        remap = write_pruned_tokenizer(args.model_dir, args.output_dir, tokenizer, kept)
+        prune_embeddings(model, kept, remap)
+        model.save_pretrained(args.output_dir)
+        copy_other_artifacts(args.model_dir, args.output_dir)
+
+        LOGGER.info("Verifying predictions on %s questions", len(questions))
+        started = time.perf_counter()
+        verification = verify_predictions(args.model_dir, args.output_dir, questions, args.batch_size, args.tolerance)
+        LOGGER.info("Verification finished in %.1fs: %s", time.perf_counter() - started, verification)
+        if not verification["passed"]:
+            raise RuntimeError(f"Pruned model predictions differ from the original: {verification}")
+    except BaseException:
+        shutil.rmtree(args.output_dir, ignore_errors=True)
+        raise
+
+    pruned_parameters = sum(p.numel() for p in model.parameters())
+    report = {
+        "source_model_dir": str(args.model_dir),
+        "original_vocab_size": original_vocab,
+        "used_tokens": len(used),
+        "pruned_vocab_size": len(kept),
+        "keep_top": args.keep_top,
+        "keep_characters": not args.no_characters,
+        "original_parameters": original_parameters,
+        "pruned_parameters": pruned_parameters,
+        "original_weight_bytes": directory_weight_bytes(args.model_dir),
+        "pruned_weight_bytes": directory_weight_bytes(args.output_dir),
+        "verification": verification,
+    }
+    with (args.output_dir / "vocab_pruning_report.json").open("w", encoding="utf-8") as fp:
+        json.dump(report, fp, ensure_ascii=False, indent=2)
+    LOGGER.info(
+        "Vocabulary %s -> %s tokens, parameters %s -> %s (%.1f%% smaller), weights %.1f MB -> %.1f MB",
+        original_vocab,
+        len(kept),
+        original_parameters,
+        pruned_parameters,
+        100 * (1 - pruned_parameters / original_parameters),
+        report["original_weight_bytes"] / 1e6,
+        report["pruned_weight_bytes"] / 1e6,
+    )
+
+
+if __name__ == "__main__":
+    main()
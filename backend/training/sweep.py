@@ -0,0 +1,508 @@
+"""Run a grid of fine-tuning trials in parallel and rank them by F1 and latency.
+
+Sweeping by calling train_classifier.py repeatedly loads, normalizes and
+compacts the data, builds the label mapping and tokenizes every question again
+for each run. This script does that work once: the compacted, labelled data is
+split with the usual seed and tokenized once per --max-lengths value, saved
+next to the sweep, and every trial loads the copy it needs.
+
+Trials run in a process pool sized so that workers x --threads-per-trial does
+not exceed the available cores. Each trial is evaluated after every epoch; once
+it has trained --prune-after epochs, a trial whose F1 is below the median of
+the trials that already reached the same epoch is stopped (median pruning), so
+poor learning rates give their cores back early. Every trial saves its final
+model, and latency is measured afterwards in this process one model at a time,
+so the timings are not skewed by trials still training next to it.
+
+The TF-IDF settings only affect the similar-question store, not the
+classifier, so they are swept on their own on the same split: each
+ngram_range/max_features pair is fitted on the training questions and scored
+by how often the best match of a validation question has its answer, next to
+the query latency.
+
+The leaderboard (leaderboard.json / leaderboard.csv) lists the completed
+trials that reach --min-f1 first, then pruned ones that reach it, then the
+rest by F1, each with the train_classifier.py command that reproduces it.
+Trials share one architecture, so latencies within --latency-tolerance of
+each other are treated as timing noise and those trials are ordered by F1.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shlex
+import shutil
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from itertools import product
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+from datasets import load_from_disk
+from sklearn.model_selection import train_test_split
+from transformers import (
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+    PrinterCallback,
+    Trainer,
+    TrainerCallback,
+    set_seed,
+)
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.services.preprocessing import batch_normalize
+from app.services.vector_store import VectorStore
+from training.train_classifier import (
+    build_label_mapping,
+    build_question_metadata,
+    build_training_args,
+    compute_metrics,
+    freeze_lower_layers,
+    load_dataset,
+    make_vectorizer,
+    measure_latency,
+    parse_args as parse_train_args,
+    prepare_datasets,
+    resolve_cpu_profile,
+    run_compaction,
+)
+
+LOGGER = logging.getLogger("sweep")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the ISTE chatbot classifier")
+    parser.add_argument(
+        "--data-path",
+        type=Path,
+        default=ROOT_DIR / "data" / "raw" / "train.csv",
+        help="Path to the CSV dataset containing question/answer pairs.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=ROOT_DIR / "models" / "sweeps" / datetime.now().strftime("%Y%m%d_%H%M%S"),
+        help="Directory for the prepared data, trial outputs and the leaderboard.",
+    )
+    parser.add_argument("--model-name", type=str, default="dbmdz/bert-base-turkish-cased")
+    parser.add_argument("--learning-rates", type=str, default="3e-5,5e-5,1e-4", help="Comma-separated values.")
+    parser.add_argument("--epochs", type=str, default="3", help="Comma-separated values.")
+    parser.add_argument("--max-lengths", type=str, default="32,64,128", help="Comma-separated values.")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--test-size", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-compaction", action="store_true", help="Sweep on every row of the dataset.")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=0.8)
+    parser.add_argument(
+        "--tfidf-ngram-max",
+        type=str,
+        default="1,2,3",
+        help="Comma-separated upper bounds of the TF-IDF word n-gram range (the lower bound is 1).",
+    )
+    parser.add_argument(
+        "--tfidf-max-features",
+        type=str,
+        default="10000,25000,50000",
+        help="Comma-separated TF-IDF vocabulary sizes.",
+    )
+    parser.add_argument(
+        "--train-args",
+        type=str,
+        default="",
+        help='Extra train_classifier.py options for every trial; pass with "=", e.g. --train-args="--cpu-profile".',
+    )
+    parser.add_argument(
+        "--threads-per-trial",
+        type=int,
+        default=1,
+        help="Torch threads each trial uses; small models train faster as several single-threaded trials.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Trials run at once (default: available cores divided by --threads-per-trial).",
+    )
+    parser.add_argument(
+        "--prune-after",
+        type=int,
+        default=1,
+        help="Epochs a trial trains before it can be stopped for trailing the median F1 (0 = never prune).",
+    )
+    parser.add_argument(
+        "--min-f1",
+        type=float,
+        default=0.9,
+        help="Accuracy bar: the fastest completed trial with at least this validation F1 is recommended.",
+    )
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=0.1,
+        help="Relative latency difference below which trials count as equally fast and are ranked by F1.",
+    )
+    parser.add_argument("--latency-samples", type=int, default=200, help="Questions timed per trial.")
+    parser.add_argument(
+        "--keep-models",
+        action="store_true",
+        help="Keep every trial's model under <output-dir>/trials instead of deleting it after timing.",
+    )
+    return parser.parse_args()
+
+
+def parse_values(value: str, cast) -> List[Any]:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def prepare_data(args: argparse.Namespace, train_args: argparse.Namespace) -> pd.DataFrame:
+    """Load, normalize, compact and label the data once, and tokenize it for every max length."""
+    data_dir = args.output_dir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    LOGGER.info("Loading dataset from %s", args.data_path)
+    df = load_dataset(args.data_path)
+    df["question_normalized"] = batch_normalize(df["question"].tolist())
+    if not args.no_compaction:
+        df = run_compaction(args, df)
+    df, label_metadata = build_label_mapping(df)
+    df.to_pickle(data_dir / "questions.pkl")
+    with (data_dir / "label_mapping.json").open("w", encoding="utf-8") as fp:
+        json.dump({"labels": label_metadata}, fp, ensure_ascii=False, indent=2)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    for max_length in parse_values(args.max_lengths, int):
+        LOGGER.info("Tokenizing for max length %s", max_length)
+        datasets, id2label, _ = prepare_datasets(
+            df=df,
+            test_size=args.test_size,
+            seed=args.seed,
+            tokenizer=tokenizer,
+            max_length=max_length,
+            dynamic_padding=train_args.dynamic_padding,
+        )
+        datasets.save_to_disk(data_dir / f"max_length_{max_length}")
+    with (data_dir / "id2label.json").open("w", encoding="utf-8") as fp:
+        json.dump(id2label, fp)
+    return df
+
+
+def sweep_tfidf(args: argparse.Namespace, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Top-1 answer accuracy and query latency of every TF-IDF configuration on the validation questions."""
+    train_df, eval_df = train_test_split(df, test_size=args.test_size, random_state=args.seed, shuffle=True)
+    metadata = build_question_metadata(train_df)
+    queries = eval_df["question_normalized"].tolist()
+    answers = eval_df["answer"].tolist()
+
+    results = []
+    for ngram_max, max_features in product(
+        parse_values(args.tfidf_ngram_max, int), parse_values(args.tfidf_max_features, int)
+    ):
+        vectorizer = make_vectorizer(ngram_range=(1, ngram_max), max_features=max_features)
+        store = VectorStore(vectorizer, vectorizer.fit_transform(train_df["question_normalized"]), metadata)
+        hits, timings = 0, []
+        for query, answer in zip(queries, answers):
+            started = time.perf_counter()
+            top = store.search(query, top_k=1)
+            timings.append((time.perf_counter() - started) * 1000)
+            hits += bool(top) and top[0].answer == answer
+        results.append(
+            {
+                "ngram_max": ngram_max,
+                "max_features": max_features,
+                "vocabulary": len(vectorizer.vocabulary_),
+                "top1_accuracy": hits / max(len(queries), 1),
+                "latency_ms": float(np.median(timings)) if timings else 0.0,
+            }
+        )
+        LOGGER.info("TF-IDF %s", results[-1])
+    return sorted(results, key=lambda row: (-row["top1_accuracy"], row["latency_ms"]))
+
+
+class MedianPruningCallback(TrainerCallback):
+    """Stop a trial whose F1 after an epoch is below the median of the other trials at that epoch."""
+
+    def __init__(self, history, lock, prune_after: int, min_trials: int = 2):
+        self.history = history
+        self.lock = lock
+        self.prune_after = prune_after
+        self.min_trials = min_trials
+        self.curve: List[float] = []
+        self.pruned_at: Optional[int] = None
+
+    def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+        f1 = float((metrics or {}).get("eval_f1", 0.0))
+        self.curve.append(f1)
+        epoch = len(self.curve)
+        # Manager dict values are copies; reassign the list so other processes see the update
+        with self.lock:
+            others = list(self.history.get(epoch, []))
+            self.history[epoch] = others + [f1]
+        if (
+            self.prune_after
+            and epoch >= self.prune_after
+            and epoch < args.num_train_epochs
+            and len(others) >= self.min_trials
+            and f1 < statistics.median(others)
+        ):
+            self.pruned_at = epoch
+            control.should_training_stop = True
+        return control
+
+
+def _init_worker(threads: int) -> None:
+    torch.set_num_threads(threads)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+
+
+def run_trial(trial: Dict[str, Any], data_dir: Path, history, lock, prune_after: int) -> Dict[str, Any]:
+    """Train one configuration on the prepared data, record its F1 per epoch and save the final model."""
+    args = parse_train_args(trial["argv"])
+    resolve_cpu_profile(args)
+    # Parallelism comes from the trial pool; loader processes per trial would oversubscribe the cores
+    args.dataloader_workers = 0
+    set_seed(args.seed)
+
+    started = time.perf_counter()
+    datasets = load_from_disk(str(data_dir / f"max_length_{args.max_length}"))
+    with (data_dir / "id2label.json").open("r", encoding="utf-8") as fp:
+        id2label = {int(key): value for key, value in json.load(fp).items()}
+    tokenizer = AutoTokenizer.from_pretrained(args.model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        args.model_name,
+        num_labels=len(id2label),
+        id2label=id2label,
+        label2id={label: idx for idx, label in id2label.items()},
+    )
+    freezing = freeze_lower_layers(model, args)
+
+    pruning = MedianPruningCallback(history, lock, prune_after)
+    trainer = Trainer(
+        model=model,
+        args=build_training_args(
+            args,
+            True,
+            save_strategy="no",
+            load_best_model_at_end=False,
+            logging_strategy="no",
+            report_to=[],
+            disable_tqdm=True,
+        ),
+        train_dataset=datasets["train"],
+        eval_dataset=datasets["validation"],
+        tokenizer=tokenizer,
+        compute_metrics=compute_metrics,
+        callbacks=[pruning],
+    )
+    # Interleaved metric dicts from parallel trials are noise; the parent logs each result
+    trainer.remove_callback(PrinterCallback)
+    train_output = trainer.train()
+    trainer.save_model(str(args.output_dir))
+    tokenizer.save_pretrained(str(args.output_dir))
+
+    curve = pruning.curve
+    best_epoch = int(np.argmax(curve)) + 1 if curve else None
+    return {
+        **trial["params"],
+        "status": "pruned" if pruning.pruned_at else "completed",
+        "epochs_trained": len(curve),
+        "best_epoch": best_epoch,
+        "f1": max(curve) if curve else None,
+        "f1_curve": curve,
+        "model_dir": str(args.output_dir),
+        "train_samples_per_second": train_output.metrics.get("train_samples_per_second"),
+        "trainable_parameters": freezing["trainable_parameters"],
+        "trial_seconds": time.perf_counter() - started,
+    }
+
+
+def build_trials(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    extra = shlex.split(args.train_args)
+    trials = []
+    for index, (learning_rate, epochs, max_length) in enumerate(
+        product(
+            parse_values(args.learning_rates, float),
+            parse_values(args.epochs, int),
+            parse_values(args.max_lengths, int),
+        )
+    ):
+        params = {"learning_rate": learning_rate, "epochs": epochs, "max_length": max_length}
+        argv = [
+            "--output-dir", str(args.output_dir / "trials" / f"{index:03d}"),
+            "--model-name", args.model_name,
+            "--learning-rate", str(learning_rate),
+            "--epochs", str(epochs),
+            "--max-length", str(max_length),
+            "--batch-size", str(args.batch_size),
+            "--seed", str(args.seed),
+            "--test-size", str(args.test_size),
+            *extra,
+        ]
+        trials.append({"params": params, "argv": argv})
+    return trials
+
+
+def time_trials(args: argparse.Namespace, rows: List[Dict[str, Any]]) -> None:
+    """Measure each saved trial model on the same questions, one at a time with --threads-per-trial threads."""
+    questions = pd.read_pickle(args.output_dir / "data" / "questions.pkl")["question_normalized"]
+    questions = questions.sample(n=min(args.latency_samples, len(questions)), random_state=args.seed).tolist()
+    torch.set_num_threads(args.threads_per_trial)
+    for row in rows:
+        model_dir = Path(row["model_dir"])
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+        row["latency_ms"] = measure_latency(model, tokenizer, questions, row["max_length"])
+        del model
+        if not args.keep_models:
+            shutil.rmtree(model_dir, ignore_errors=True)
+            row["model_dir"] = None
+
+
+def assign_latency_tiers(rows: List[Dict[str, Any]], tolerance: float) -> None:
+    """Group trials whose latency is within ``tolerance`` of the fastest trial of their tier."""
+    tier, tier_start = -1, None
+    for row in sorted(rows, key=lambda row: row["latency_ms"]):
+        if tier_start is None or row["latency_ms"] > tier_start * (1 + tolerance):
+            tier, tier_start = tier + 1, row["latency_ms"]
+        row["latency_tier"] = tier
+
+
+def rank(rows: List[Dict[str, Any]], min_f1: float, latency_tolerance: float) -> List[Dict[str, Any]]:
+    """Completed trials meeting the bar, then pruned ones meeting it, then the rest by F1.
+
+    Trials meeting the bar are ordered by latency tier and, within a tier, by F1.
+    """
+    for row in rows:
+        row["meets_bar"] = row.get("f1") is not None and row["f1"] >= min_f1
+        row["latency_tier"] = None
+    for status in ("completed", "pruned"):
+        assign_latency_tiers(
+            [row for row in rows if row["meets_bar"] and row["status"] == status], latency_tolerance
+        )
+    return sorted(
+        rows,
+        key=lambda row: (
+            not row["meets_bar"],
+            row["meets_bar"] and row["status"] != "completed",
+            row["latency_tier"] or 0,
+            -(row.get("f1") or 0.0),
+        ),
+    )
+
+
+def reproduce_command(args: argparse.Namespace, row: Dict[str, Any], tfidf: Optional[Dict[str, Any]]) -> str:
+    # train_classifier keeps the best epoch, so the full epoch count reproduces it
+    parts = [
+        "python training/train_classifier.py",
+        f"--model-name {shlex.quote(args.model_name)}",
+        f"--learning-rate {row['learning_rate']}",
+        f"--epochs {row['epochs']}",
+        f"--max-length {row['max_length']}",
+        f"--batch-size {args.batch_size}",
+        f"--seed {args.seed}",
+        f"--test-size {args.test_size}",
+    ]
+    if tfidf is not None:
+        parts.append(f"--tfidf-ngram-max {tfidf['ngram_max']} --tfidf-max-features {tfidf['max_features']}")
+    if args.train_args:
+        parts.append(args.train_args)
+    if args.no_compaction:
+        parts.append("--no-compaction")
+    else:
+        parts.append(f"--near-duplicate-threshold {args.near_duplicate_threshold}")
+    return " ".join(parts)
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    train_args = parse_train_args(shlex.split(args.train_args))
+    resolve_cpu_profile(train_args)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    df = prepare_data(args, train_args)
+
+    tfidf_results = sweep_tfidf(args, df)
+    best_tfidf = tfidf_results[0] if tfidf_results else None
+
+    trials = build_trials(args)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    workers = args.workers or max(1, cores // max(args.threads_per_trial, 1))
+    workers = min(workers, len(trials))
+    LOGGER.info("Running %s trials on %s workers x %s threads", len(trials), workers, args.threads_per_trial)
+
+    rows: List[Dict[str, Any]] = []
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        history, lock = manager.dict(), manager.Lock()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_init_worker, initargs=(args.threads_per_trial,)
+        ) as pool:
+            futures = {
+                pool.submit(run_trial, trial, args.output_dir / "data", history, lock, args.prune_after): trial
+                for trial in trials
+            }
+            for future in as_completed(futures):
+                params = futures[future]["params"]
+                try:
+                    row = future.result()
+                except Exception as exc:  # noqa: BLE001 - one failing trial must not end the sweep
+                    LOGGER.exception("Trial %s failed", params)
+                    row = {**params, "status": "failed", "error": str(exc), "f1": None, "latency_ms": None}
+                LOGGER.info("Trial %s %s: F1 %s", params, row["status"], row.get("f1"))
+                rows.append(row)
+
+    LOGGER.info("Timing trial models")
+    time_trials(args, [row for row in rows if row["status"] != "failed"])
+    ranked = rank([row for row in rows if row["status"] != "failed"], args.min_f1, args.latency_tolerance)
+    for row in ranked:
+        row["command"] = reproduce_command(args, row, best_tfidf)
+    leaderboard = ranked + [row for row in rows if row["status"] == "failed"]
+
+    with (args.output_dir / "leaderboard.json").open("w", encoding="utf-8") as fp:
+        json.dump(
+            {
+                "min_f1": args.min_f1,
+                "latency_tolerance": args.latency_tolerance,
+                "trials": leaderboard,
+                "tfidf": tfidf_results,
+            },
+            fp,
+            ensure_ascii=False,
+            indent=2,
+        )
+    pd.DataFrame(leaderboard).drop(columns=["f1_curve"], errors="ignore").to_csv(
+        args.output_dir / "leaderboard.csv", index=False
+    )
+
+    if ranked:
+        columns = [
+            "learning_rate", "epochs", "max_length", "status", "best_epoch",
+            "f1", "latency_ms", "latency_tier", "meets_bar",
+        ]
+        LOGGER.info("Leaderboard:\n%s", pd.DataFrame(ranked)[columns].to_string(index=False))
+    if best_tfidf is not None:
+        LOGGER.info("Best TF-IDF configuration: %s", best_tfidf)
+    recommended = next((row for row in ranked if row["meets_bar"]), None)
+    if recommended is not None:
+        if recommended["status"] != "completed":
+            LOGGER.warning("Only pruned trials reached F1 %.3f; their full run may score differently", args.min_f1)
+        LOGGER.info("Recommended trial with F1 >= %.3f: %s", args.min_f1, recommended["command"])
+    else:
+        best_f1 = max((row["f1"] for row in ranked), default=None)
+        LOGGER.warning("No trial reached F1 %.3f; best F1 was %s", args.min_f1, best_f1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,27 @@
 from __future__ import annotations
 
 import argparse
+import copy
 import json
 import logging
+import os
+import re
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Sequence
 
 import joblib
 import numpy as np
 import pandas as pd
+import torch
+import torch.nn.functional as F
 from datasets import Dataset, DatasetDict
 from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
 from sklearn.metrics import accuracy_score, f1_score, precision_recall_fscore_support
+from sklearn.pipeline import Pipeline
 from transformers import (
     AutoModelForSequenceClassification,
     AutoTokenizer,
@@ -27,13 +34,17 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
+from app.services.early_exit import ExitHeads, masked_mean
+from app.services.embedding_index import build_embedding_index, mean_pool
 from app.services.preprocessing import batch_normalize
+from app.services.typo_index import build_typo_index
+from training.compact_dataset import compact_dataset
 
 
 LOGGER = logging.getLogger(__name__)
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Fine-tune a Turkish BERT model for ISTE chatbot")
     parser.add_argument(
         "--data-path",
@@ -64,7 +75,185 @@ def parse_args() -> argparse.Namespace:
         default=128,
         help="Maximum sequence length for tokenizer padding/truncation.",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--cpu-profile",
+        action="store_true",
+        help="CPU training preset: freeze embeddings and the lower half of the encoder, pad per batch, "
+        "bf16 autocast on CPUs with native bf16 and one dataloader worker per spare core.",
+    )
+    parser.add_argument(
+        "--freeze-embeddings",
+        action="store_true",
+        help="Keep the embedding layer fixed during fine-tuning.",
+    )
+    parser.add_argument(
+        "--freeze-layers",
+        type=int,
+        default=None,
+        help="Number of lowest encoder layers kept fixed (default: half of them with --cpu-profile, else 0).",
+    )
+    parser.add_argument("--bf16", action="store_true", help="Train under bfloat16 autocast (CPU or GPU).")
+    parser.add_argument(
+        "--gradient-accumulation-steps",
+        type=int,
+        default=1,
+        help="Batches accumulated per optimizer step; effective batch size is batch size times this.",
+    )
+    parser.add_argument(
+        "--dataloader-workers",
+        type=int,
+        default=None,
+        help="Worker processes that collate training batches (default: 0, or spare cores with --cpu-profile).",
+    )
+    parser.add_argument(
+        "--dynamic-padding",
+        action="store_true",
+        help="Pad each batch to its longest question instead of every question to --max-length.",
+    )
+    parser.add_argument(
+        "--no-compaction",
+        action="store_true",
+        help="Train on every row instead of dropping exact and near-duplicate questions first.",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=0.8,
+        help="Character-shingle Jaccard similarity for near-duplicate questions of the same answer (0 = exact only).",
+    )
+    parser.add_argument(
+        "--embedding-clusters",
+        type=int,
+        default=0,
+        help="Coarse k-means partitions for the dense question index (0 = exhaustive search; ~sqrt(N) for large corpora).",
+    )
+    parser.add_argument(
+        "--tfidf-hashing-features",
+        type=int,
+        default=0,
+        help="Hash TF-IDF terms into this many columns instead of storing a vocabulary (0 = fitted vocabulary).",
+    )
+    parser.add_argument(
+        "--tfidf-ngram-max",
+        type=int,
+        default=2,
+        help="Longest word n-gram in the TF-IDF store (n-grams from 1 to this).",
+    )
+    parser.add_argument(
+        "--tfidf-max-features",
+        type=int,
+        default=25000,
+        help="Vocabulary size of the TF-IDF store (ignored with --tfidf-hashing-features).",
+    )
+    parser.add_argument(
+        "--typo-max-distance",
+        type=int,
+        default=2,
+        help="Largest edit distance the typo index corrects query words by (0 = only restore Turkish letters).",
+    )
+    parser.add_argument(
+        "--distill-from",
+        type=Path,
+        default=None,
+        help="Fine-tuned teacher model directory; trains a smaller student on its soft labels instead of fine-tuning --model-name.",
+    )
+    parser.add_argument("--student-layers", type=int, default=4, help="Encoder layers kept in the distilled student.")
+    parser.add_argument("--distill-temperature", type=float, default=2.0, help="Softmax temperature for soft labels.")
+    parser.add_argument(
+        "--distill-alpha",
+        type=float,
+        default=0.5,
+        help="Weight of the hard-label loss; the soft-label loss gets 1 - alpha.",
+    )
+    parser.add_argument(
+        "--exit-layers",
+        type=str,
+        default="",
+        help="Comma-separated encoder layers that get an early-exit classifier head, e.g. 3,6,9 (empty = none).",
+    )
+    parser.add_argument("--exit-epochs", type=int, default=20, help="Training epochs for the early-exit heads.")
+    parser.add_argument("--exit-learning-rate", type=float, default=1e-3, help="Learning rate for the early-exit heads.")
+    parser.add_argument(
+        "--exit-heads-only",
+        action="store_true",
+        help=(
+            "Skip fine-tuning; train early-exit heads for the fine-tuned model in --model-name and save them there. "
+            "Pass the --seed, --test-size and --no-compaction of that run so the validation split matches."
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bfloat16 instructions; elsewhere bf16 autocast is emulated and slower."""
+    checks = ("_is_avx512_bf16_supported", "_is_amx_tile_supported")
+    return any(getattr(torch.cpu, name, lambda: False)() for name in checks)
+
+
+def resolve_cpu_profile(args: argparse.Namespace) -> None:
+    """Fill in the ``--cpu-profile`` defaults that the command line left open."""
+    if args.cpu_profile:
+        args.freeze_embeddings = True
+        args.dynamic_padding = True
+        if not torch.cuda.is_available() and cpu_supports_bf16():
+            args.bf16 = True
+        if args.dataloader_workers is None:
+            args.dataloader_workers = min(4, max((os.cpu_count() or 1) - 1, 0))
+    if args.dataloader_workers is None:
+        args.dataloader_workers = 0
+
+
+def freeze_lower_layers(model, args: argparse.Namespace) -> Dict[str, Any]:
+    """Stop gradients for the embeddings and the lowest encoder layers; the classifier head always trains.
+
+    Frozen layers need no weight gradients or optimizer state, and backpropagation
+    stops at the first trainable layer, so each step gets cheaper the more is frozen.
+    """
+    base = getattr(model, model.base_model_prefix)
+    total_layers = model.config.num_hidden_layers
+    num_frozen = args.freeze_layers
+    if num_frozen is None:
+        num_frozen = total_layers // 2 if args.cpu_profile else 0
+    num_frozen = min(max(num_frozen, 0), total_layers)
+    if args.freeze_embeddings:
+        base.embeddings.requires_grad_(False)
+    for layer in base.encoder.layer[:num_frozen]:
+        layer.requires_grad_(False)
+    return {
+        "frozen_embeddings": bool(args.freeze_embeddings),
+        "frozen_layers": num_frozen,
+        "total_layers": total_layers,
+        "trainable_parameters": sum(p.numel() for p in model.parameters() if p.requires_grad),
+        "total_parameters": sum(p.numel() for p in model.parameters()),
+    }
+
+
+def training_report(
+    train_output, args: argparse.Namespace, freezing: Dict[str, Any], metrics: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Throughput and quality of a fine-tuning run, for comparing training profiles."""
+    report: Dict[str, Any] = {
+        "cpu_profile": bool(args.cpu_profile),
+        **freezing,
+        "bf16": bool(args.bf16),
+        "batch_size": args.batch_size,
+        "gradient_accumulation_steps": args.gradient_accumulation_steps,
+        "effective_batch_size": args.batch_size * args.gradient_accumulation_steps,
+        "dataloader_workers": args.dataloader_workers,
+        "dynamic_padding": bool(args.dynamic_padding),
+        "epochs": args.epochs,
+        "train_runtime_seconds": train_output.metrics.get("train_runtime"),
+        "train_samples_per_second": train_output.metrics.get("train_samples_per_second"),
+        "train_loss": train_output.training_loss,
+    }
+    if metrics:
+        report["eval_accuracy"] = metrics.get("eval_accuracy")
+        report["eval_f1"] = metrics.get("eval_f1")
+    return report
+
+
+def parse_exit_layers(value: str) -> List[int]:
+    return sorted({int(part) for part in value.split(",") if part.strip()})
 
 
 def load_dataset(data_path: Path) -> pd.DataFrame:
@@ -83,6 +272,25 @@ def load_dataset(data_path: Path) -> pd.DataFrame:
     return df
 
 
+def run_compaction(args: argparse.Namespace, df: pd.DataFrame, write_report: bool = True) -> pd.DataFrame:
+    """Drop duplicate questions and, unless disabled, write the compaction report into the output directory."""
+    logger = logging.getLogger("train_classifier")
+    df, report = compact_dataset(df, near_duplicate_threshold=args.near_duplicate_threshold, seed=args.seed)
+    logger.info(
+        "Compacted dataset: %s -> %s rows (%s exact, %s near duplicates, %s label conflicts)",
+        report["rows_before"],
+        report["rows_after"],
+        report["exact_duplicates"],
+        report["near_duplicates"],
+        report["exact_conflicts"] + report["near_conflicts"],
+    )
+    if write_report:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        with (args.output_dir / "dataset_report.json").open("w", encoding="utf-8") as fp:
+            json.dump({"source": str(args.data_path), **report}, fp, ensure_ascii=False, indent=2)
+    return df
+
+
 def build_label_mapping(df: pd.DataFrame) -> tuple[pd.DataFrame, List[Dict[str, Any]]]:
     unique_answers = df["answer"].astype(str).unique()
     answer_to_id = {answer: idx for idx, answer in enumerate(unique_answers)}
@@ -110,6 +318,8 @@ def prepare_datasets(
     seed: int,
     tokenizer,
     max_length: int,
+    extra_columns: Sequence[str] = (),
+    dynamic_padding: bool = False,
 ) -> tuple[DatasetDict, Dict[int, str], Dict[str, int]]:
     if len(df) < 2:
         train_df = df.copy()
@@ -145,15 +355,17 @@ def prepare_datasets(
             eval_df = train_df.iloc[0:0].copy()
 
     def tokenize_batch(batch: Dict[str, List[str]]) -> Dict[str, Any]:
+        # Unpadded rows are padded per batch by the Trainer's collator
         return tokenizer(
             batch["question_normalized"],
-            padding="max_length",
+            padding=False if dynamic_padding else "max_length",
             truncation=True,
             max_length=max_length,
         )
 
-    train_dataset = Dataset.from_pandas(train_df[["question", "question_normalized", "label_id"]], preserve_index=False)
-    eval_dataset = Dataset.from_pandas(eval_df[["question", "question_normalized", "label_id"]], preserve_index=False)
+    columns = ["question", "question_normalized", "label_id", *extra_columns]
+    train_dataset = Dataset.from_pandas(train_df[columns], preserve_index=False)
+    eval_dataset = Dataset.from_pandas(eval_df[columns], preserve_index=False)
 
     train_dataset = train_dataset.map(tokenize_batch, batched=True)
     eval_dataset = eval_dataset.map(tokenize_batch, batched=True)
@@ -182,9 +394,7 @@ def compute_metrics(eval_pred):
     return {"accuracy": acc, "f1": f1, "precision": precision, "recall": recall}
 
 
-def build_vector_store(df: pd.DataFrame, output_dir: Path) -> None:
-    vectorizer = TfidfVectorizer(ngram_range=(1, 2), max_features=25000)
-    matrix = vectorizer.fit_transform(df["question_normalized"])  # type: ignore[arg-type]
+def build_question_metadata(df: pd.DataFrame) -> List[Dict[str, Any]]:
     metadata = []
     for _, row in df.iterrows():
         entry = {
@@ -197,14 +407,434 @@ def build_vector_store(df: pd.DataFrame, output_dir: Path) -> None:
         if "subcategory" in row:
             entry["subcategory"] = row["subcategory"]
         metadata.append(entry)
+    return metadata
+
+
+def make_vectorizer(hashing_features: int = 0, ngram_range: tuple[int, int] = (1, 2), max_features: int = 25000):
+    if hashing_features:
+        # No vocabulary to keep in memory: terms are hashed, only the idf per column is stored
+        return Pipeline(
+            [
+                (
+                    "hashing",
+                    HashingVectorizer(
+                        ngram_range=ngram_range, n_features=hashing_features, alternate_sign=False, norm=None
+                    ),
+                ),
+                ("tfidf", TfidfTransformer()),
+            ]
+        )
+    return TfidfVectorizer(ngram_range=ngram_range, max_features=max_features)
+
+
+def build_vector_store(
+    df: pd.DataFrame,
+    output_dir: Path,
+    hashing_features: int = 0,
+    ngram_range: tuple[int, int] = (1, 2),
+    max_features: int = 25000,
+) -> None:
+    vectorizer = make_vectorizer(hashing_features, ngram_range=ngram_range, max_features=max_features)
+    matrix = vectorizer.fit_transform(df["question_normalized"])  # type: ignore[arg-type]
+    metadata = build_question_metadata(df)
     joblib.dump(
         {"vectorizer": vectorizer, "matrix": matrix, "metadata": metadata},
         output_dir / "vector_store.joblib",
     )
 
 
+def build_typo_lookup(df: pd.DataFrame, output_dir: Path, max_distance: int = 2) -> None:
+    index = build_typo_index(
+        df["question_normalized"].tolist(), build_question_metadata(df), max_distance=max_distance
+    )
+    index.save(output_dir / "typo_index.joblib")
+
+
+def build_dense_index(
+    model,
+    tokenizer,
+    df: pd.DataFrame,
+    output_dir: Path,
+    max_length: int,
+    batch_size: int,
+    num_clusters: int = 0,
+) -> None:
+    """Embed every question with the fine-tuned encoder and store a float16 index."""
+    model.eval()
+    device = next(model.parameters()).device
+    questions = df["question_normalized"].tolist()
+    chunks: List[np.ndarray] = []
+    with torch.no_grad():
+        for start in range(0, len(questions), batch_size):
+            encoded = tokenizer(
+                questions[start : start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="pt",
+            ).to(device)
+            outputs = model(**encoded, output_hidden_states=True)
+            chunks.append(mean_pool(outputs.hidden_states[-1], encoded["attention_mask"]))
+    embeddings = np.concatenate(chunks) if chunks else np.zeros((0, model.config.hidden_size), dtype=np.float32)
+    index = build_embedding_index(embeddings, build_question_metadata(df), num_clusters=num_clusters)
+    index.save(output_dir / "embedding_index.joblib")
+
+
+def build_training_args(args: argparse.Namespace, has_eval: bool, **overrides: Any) -> TrainingArguments:
+    options: Dict[str, Any] = dict(
+        output_dir=args.output_dir / "checkpoints",
+        eval_strategy="epoch" if has_eval else "no",
+        save_strategy="epoch" if has_eval else "no",
+        learning_rate=args.learning_rate,
+        per_device_train_batch_size=args.batch_size,
+        per_device_eval_batch_size=args.batch_size,
+        num_train_epochs=args.epochs,
+        weight_decay=0.01,
+        load_best_model_at_end=has_eval,
+        metric_for_best_model="f1",
+        logging_strategy="steps",
+        logging_steps=50,
+        fp16=False,
+        bf16=args.bf16,
+        gradient_accumulation_steps=args.gradient_accumulation_steps,
+        dataloader_num_workers=args.dataloader_workers,
+        dataloader_persistent_workers=args.dataloader_workers > 0,
+        save_total_limit=2,
+    )
+    if args.bf16 and not torch.cuda.is_available():
+        # Trainer only accepts bf16 without a GPU when told to train on the CPU
+        options["use_cpu"] = True
+    options.update(overrides)
+    return TrainingArguments(**options)
+
+
+def export_artifacts(
+    trainer: Trainer,
+    tokenizer,
+    df: pd.DataFrame,
+    label_metadata: List[Dict[str, Any]],
+    metrics: Dict[str, Any],
+    args: argparse.Namespace,
+) -> Path:
+    """Write the model directory layout NLPService expects."""
+    logger = logging.getLogger("train_classifier")
+    output_dir = args.output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info("Saving model to %s", output_dir)
+    trainer.save_model(output_dir)
+    tokenizer.save_pretrained(output_dir)
+
+    label_path = output_dir / "label_mapping.json"
+    with label_path.open("w", encoding="utf-8") as fp:
+        json.dump({"labels": label_metadata, "metrics": metrics}, fp, ensure_ascii=False, indent=2)
+
+    # NLPService reads this so inference truncates exactly like training did
+    with (output_dir / "inference_config.json").open("w", encoding="utf-8") as fp:
+        json.dump({"max_length": args.max_length}, fp, indent=2)
+
+    logger.info("Building TF-IDF vector store")
+    build_vector_store(
+        df,
+        output_dir,
+        hashing_features=args.tfidf_hashing_features,
+        ngram_range=(1, args.tfidf_ngram_max),
+        max_features=args.tfidf_max_features,
+    )
+
+    logger.info("Building typo index")
+    build_typo_lookup(df, output_dir, max_distance=args.typo_max_distance)
+
+    logger.info("Building dense embedding index")
+    build_dense_index(
+        trainer.model,
+        tokenizer,
+        df,
+        output_dir,
+        max_length=args.max_length,
+        batch_size=args.batch_size * 4,
+        num_clusters=args.embedding_clusters,
+    )
+    return output_dir
+
+
+def _pad_batch(values) -> torch.Tensor:
+    """Rows tokenized without padding come back as a list of tensors; pad them with zeros (masked out)."""
+    if isinstance(values, torch.Tensor):
+        return values
+    return torch.nn.utils.rnn.pad_sequence(values, batch_first=True)
+
+
+def pooled_layer_states(
+    model, dataset: Dataset, layers: Sequence[int], batch_size: int
+) -> tuple[Dict[int, torch.Tensor], torch.Tensor]:
+    """Mean-pooled hidden states of ``layers`` for every example, from one pass of the frozen encoder."""
+    model.eval()
+    device = next(model.parameters()).device
+    inputs = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dataset.column_names]
+    rows = dataset.with_format("torch", columns=[*inputs, "labels"])
+    features: Dict[int, List[torch.Tensor]] = {layer: [] for layer in layers}
+    labels: List[torch.Tensor] = []
+    with torch.no_grad():
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            encoded = {name: _pad_batch(batch[name]).to(device) for name in inputs}
+            hidden_states = model(**encoded, output_hidden_states=True).hidden_states
+            for layer in layers:
+                features[layer].append(masked_mean(hidden_states[layer], encoded["attention_mask"]).cpu())
+            labels.append(batch["labels"])
+    return {layer: torch.cat(chunks) for layer, chunks in features.items()}, torch.cat(labels)
+
+
+def train_exit_heads(model, datasets: DatasetDict, args: argparse.Namespace) -> tuple[ExitHeads, Dict[str, Any]]:
+    """Fit one linear head per exit layer on top of the frozen, already fine-tuned encoder.
+
+    The backbone is not updated, so the full-depth predictions stay exactly as
+    trained and each head only learns to read its layer's pooled state.
+    """
+    logger = logging.getLogger("train_classifier")
+    layers = parse_exit_layers(args.exit_layers)
+    total_layers = model.config.num_hidden_layers
+    if not layers or not all(0 < layer < total_layers for layer in layers):
+        raise ValueError(f"Exit layers must be between 1 and {total_layers - 1}, got {args.exit_layers!r}")
+
+    logger.info("Computing pooled states of layers %s", layers)
+    train_features, train_labels = pooled_layer_states(model, datasets["train"], layers, args.batch_size * 4)
+
+    heads = ExitHeads(layers, model.config.hidden_size, model.config.num_labels)
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=args.exit_learning_rate, weight_decay=0.01)
+    generator = torch.Generator().manual_seed(args.seed)
+    heads.train()
+    for epoch in range(args.exit_epochs):
+        order = torch.randperm(len(train_labels), generator=generator)
+        epoch_loss = 0.0
+        for start in range(0, len(order), args.batch_size):
+            batch = order[start : start + args.batch_size]
+            loss = sum(
+                F.cross_entropy(heads(layer, train_features[layer][batch]), train_labels[batch]) for layer in layers
+            )
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            epoch_loss += loss.item() * len(batch)
+        logger.info("Exit heads epoch %s/%s loss %.4f", epoch + 1, args.exit_epochs, epoch_loss / len(order))
+    heads.eval()
+
+    metrics: Dict[str, Any] = {"total_layers": total_layers}
+    if len(datasets["validation"]) > 0:
+        eval_features, eval_labels = pooled_layer_states(model, datasets["validation"], layers, args.batch_size * 4)
+        with torch.no_grad():
+            for layer in layers:
+                preds = heads(layer, eval_features[layer]).argmax(dim=-1)
+                metrics[f"layer_{layer}_accuracy"] = float((preds == eval_labels).float().mean())
+        logger.info("Exit head metrics: %s", metrics)
+    return heads, metrics
+
+
+def export_exit_heads(model, datasets: DatasetDict, args: argparse.Namespace, output_dir: Path) -> None:
+    heads, metrics = train_exit_heads(model, datasets, args)
+    heads.save(output_dir, metrics)
+    logging.getLogger("train_classifier").info("Saved early-exit heads to %s", output_dir)
+
+
+def run_exit_heads_only(args: argparse.Namespace, df: pd.DataFrame) -> None:
+    model_dir = Path(args.model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    with (model_dir / "label_mapping.json").open("r", encoding="utf-8") as fp:
+        label_metadata = json.load(fp)["labels"]
+    # Truncate like the model was trained and is served, not like this invocation's --max-length
+    max_length = args.max_length
+    config_path = model_dir / "inference_config.json"
+    if config_path.exists():
+        with config_path.open("r", encoding="utf-8") as fp:
+            max_length = int(json.load(fp).get("max_length", max_length))
+
+    # Same labels and the same seeded split of the compacted data as the original
+    # fine-tuning run, so the validation rows were not seen by the backbone
+    df = align_to_teacher_labels(df, label_metadata)
+    datasets, _, _ = prepare_datasets(
+        df=df,
+        test_size=args.test_size,
+        seed=args.seed,
+        tokenizer=tokenizer,
+        max_length=max_length,
+    )
+    export_exit_heads(model, datasets, args, model_dir)
+
+
+class DistillationTrainer(Trainer):
+    """Trainer that mixes the hard-label loss with KL divergence to the teacher's soft labels."""
+
+    def __init__(self, *args, temperature: float = 2.0, alpha: float = 0.5, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        teacher_logits = inputs.pop("teacher_logits")
+        outputs = model(**inputs)
+        soft_loss = F.kl_div(
+            F.log_softmax(outputs.logits / self.temperature, dim=-1),
+            F.softmax(teacher_logits / self.temperature, dim=-1),
+            reduction="batchmean",
+        ) * (self.temperature ** 2)
+        loss = self.alpha * outputs.loss + (1 - self.alpha) * soft_loss
+        return (loss, outputs) if return_outputs else loss
+
+
+def align_to_teacher_labels(df: pd.DataFrame, label_metadata: List[Dict[str, Any]]) -> pd.DataFrame:
+    answer_to_id = {item["answer"]: int(item["id"]) for item in label_metadata}
+    label_ids = df["answer"].map(answer_to_id)
+    if missing := int(label_ids.isna().sum()):
+        LOGGER.warning("%s satırın cevabı teacher etiketlerinde yok, distilasyondan çıkarıldı.", missing)
+    df = df.assign(label_id=label_ids).dropna(subset=["label_id"])
+    return df.assign(label_id=df["label_id"].astype(int))
+
+
+def compute_teacher_logits(model, tokenizer, questions: List[str], max_length: int, batch_size: int) -> np.ndarray:
+    model.eval()
+    device = next(model.parameters()).device
+    chunks: List[np.ndarray] = []
+    with torch.no_grad():
+        for start in range(0, len(questions), batch_size):
+            encoded = tokenizer(
+                questions[start : start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="pt",
+            ).to(device)
+            chunks.append(model(**encoded).logits.float().cpu().numpy())
+    return np.concatenate(chunks)
+
+
+def build_student(teacher, num_layers: int):
+    """Copy the teacher with fewer encoder layers, keeping evenly spaced teacher layers."""
+    teacher_layers = teacher.config.num_hidden_layers
+    if not 0 < num_layers < teacher_layers:
+        raise ValueError(f"Student layers must be between 1 and {teacher_layers - 1}, got {num_layers}")
+
+    config = copy.deepcopy(teacher.config)
+    config.num_hidden_layers = num_layers
+    student = AutoModelForSequenceClassification.from_config(config)
+
+    kept = np.linspace(0, teacher_layers - 1, num_layers).round().astype(int).tolist()
+    layer_pattern = re.compile(r"\.layer\.(\d+)\.")
+    state: Dict[str, torch.Tensor] = {}
+    for key, value in teacher.state_dict().items():
+        match = layer_pattern.search(key)
+        if match is None:
+            state[key] = value
+        elif int(match.group(1)) in kept:
+            new_index = kept.index(int(match.group(1)))
+            state[layer_pattern.sub(f".layer.{new_index}.", key, count=1)] = value
+    student.load_state_dict(state)
+    return student
+
+
+def measure_latency(model, tokenizer, questions: List[str], max_length: int, warmup: int = 5) -> float:
+    """Median single-query forward latency in milliseconds."""
+    model.eval()
+    device = next(model.parameters()).device
+    timings: List[float] = []
+    with torch.no_grad():
+        for position, question in enumerate(questions):
+            encoded = tokenizer(question, truncation=True, max_length=max_length, return_tensors="pt").to(device)
+            started = time.perf_counter()
+            model(**encoded)
+            if position >= warmup:
+                timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings)) if timings else 0.0
+
+
+def run_distillation(args: argparse.Namespace, df: pd.DataFrame) -> None:
+    logger = logging.getLogger("train_classifier")
+    teacher_dir: Path = args.distill_from
+
+    logger.info("Loading teacher from %s", teacher_dir)
+    tokenizer = AutoTokenizer.from_pretrained(teacher_dir)
+    teacher = AutoModelForSequenceClassification.from_pretrained(teacher_dir)
+    with (teacher_dir / "label_mapping.json").open("r", encoding="utf-8") as fp:
+        label_metadata = json.load(fp)["labels"]
+
+    df = align_to_teacher_labels(df, label_metadata)
+
+    logger.info("Computing teacher soft labels")
+    teacher_logits = compute_teacher_logits(
+        teacher, tokenizer, df["question_normalized"].tolist(), args.max_length, args.batch_size * 4
+    )
+    df = df.assign(teacher_logits=list(teacher_logits))
+
+    datasets, _, _ = prepare_datasets(
+        df=df,
+        test_size=args.test_size,
+        seed=args.seed,
+        tokenizer=tokenizer,
+        max_length=args.max_length,
+        extra_columns=["teacher_logits"],
+        dynamic_padding=args.dynamic_padding,
+    )
+    has_eval = len(datasets["validation"]) > 0
+
+    logger.info("Initializing %s-layer student from teacher", args.student_layers)
+    student = build_student(teacher, args.student_layers)
+    freezing = freeze_lower_layers(student, args)
+
+    trainer = DistillationTrainer(
+        model=student,
+        args=build_training_args(args, has_eval, remove_unused_columns=False),
+        train_dataset=datasets["train"],
+        eval_dataset=datasets["validation"] if has_eval else None,
+        tokenizer=tokenizer,
+        compute_metrics=compute_metrics,
+        temperature=args.distill_temperature,
+        alpha=args.distill_alpha,
+    )
+
+    logger.info("Starting distillation")
+    train_output = trainer.train()
+
+    metrics: Dict[str, Any] = {}
+    report: Dict[str, Any] = {
+        "teacher_dir": str(teacher_dir),
+        "teacher_layers": teacher.config.num_hidden_layers,
+        "student_layers": args.student_layers,
+        "teacher_parameters": sum(p.numel() for p in teacher.parameters()),
+        "student_parameters": sum(p.numel() for p in trainer.model.parameters()),
+    }
+    if has_eval:
+        metrics = trainer.evaluate()
+        validation = datasets["validation"]
+        labels = np.asarray(validation["labels"])
+        teacher_preds = np.asarray(validation["teacher_logits"]).argmax(axis=-1)
+        report["teacher_accuracy"] = float(accuracy_score(labels, teacher_preds))
+        report["teacher_f1"] = float(f1_score(labels, teacher_preds, average="weighted", zero_division=0))
+        report["student_accuracy"] = float(metrics.get("eval_accuracy", 0.0))
+        report["student_f1"] = float(metrics.get("eval_f1", 0.0))
+        report["agreement"] = float(
+            (trainer.predict(validation).predictions.argmax(axis=-1) == teacher_preds).mean()
+        )
+
+    latency_questions = df["question_normalized"].sample(n=min(200, len(df)), random_state=args.seed).tolist()
+    report["teacher_latency_ms"] = measure_latency(teacher, tokenizer, latency_questions, args.max_length)
+    report["student_latency_ms"] = measure_latency(trainer.model, tokenizer, latency_questions, args.max_length)
+    if report["student_latency_ms"]:
+        report["speedup"] = report["teacher_latency_ms"] / report["student_latency_ms"]
+    logger.info("Distillation report: %s", report)
+
+    metrics["distillation"] = report
+    metrics["training"] = training_report(train_output, args, freezing, metrics)
+    output_dir = export_artifacts(trainer, tokenizer, df.drop(columns=["teacher_logits"]), label_metadata, metrics, args)
+    with (output_dir / "distillation_report.json").open("w", encoding="utf-8") as fp:
+        json.dump(report, fp, ensure_ascii=False, indent=2)
+    if args.exit_layers:
+        export_exit_heads(trainer.model, datasets, args, output_dir)
+
+
 def main():
     args = parse_args()
+    resolve_cpu_profile(args)
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
     logger = logging.getLogger("train_classifier")
@@ -217,6 +847,20 @@ def main():
     logger.info("Normalizing questions")
     df["question_normalized"] = batch_normalize(df["question"].tolist())
 
+    if not args.no_compaction:
+        # Exit-heads-only writes into the existing model, which already has the original run's report
+        df = run_compaction(args, df, write_report=not args.exit_heads_only)
+
+    if args.exit_heads_only:
+        run_exit_heads_only(args, df)
+        logger.info("Early-exit heads trained successfully")
+        return
+
+    if args.distill_from:
+        run_distillation(args, df)
+        logger.info("Distillation completed successfully")
+        return
+
     logger.info("Building label mapping")
     df, label_metadata = build_label_mapping(df)
 
@@ -229,6 +873,7 @@ def main():
         seed=args.seed,
         tokenizer=tokenizer,
         max_length=args.max_length,
+        dynamic_padding=args.dynamic_padding,
     )
 
     has_eval = len(datasets["validation"]) > 0
@@ -240,23 +885,10 @@ def main():
         id2label=id2label,
         label2id=label2id,
     )
+    freezing = freeze_lower_layers(model, args)
+    logger.info("Training %s of %s parameters", freezing["trainable_parameters"], freezing["total_parameters"])
 
-    training_args = TrainingArguments(
-        output_dir=args.output_dir / "checkpoints",
-        eval_strategy="epoch" if has_eval else "no",
-        save_strategy="epoch" if has_eval else "no",
-        learning_rate=args.learning_rate,
-        per_device_train_batch_size=args.batch_size,
-        per_device_eval_batch_size=args.batch_size,
-        num_train_epochs=args.epochs,
-        weight_decay=0.01,
-        load_best_model_at_end=has_eval,
-        metric_for_best_model="f1",
-        logging_strategy="steps",
-        logging_steps=50,
-        fp16=False,
-        save_total_limit=2,
-    )
+    training_args = build_training_args(args, has_eval)
 
     logger.info("Starting training")
     trainer = Trainer(
@@ -268,7 +900,7 @@ def main():
         compute_metrics=compute_metrics,
     )
 
-    trainer.train()
+    train_output = trainer.train()
 
     metrics: Dict[str, Any] = {}
     if has_eval:
@@ -277,20 +909,12 @@ def main():
         logger.info("Evaluation metrics: %s", metrics)
     else:
         logger.info("Doğrulama veri kümesi bulunmadığı için değerlendirme atlandı.")
+    metrics["training"] = training_report(train_output, args, freezing, metrics)
+    logger.info("Training report: %s", metrics["training"])
 
-    output_dir = args.output_dir
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    logger.info("Saving model to %s", output_dir)
-    trainer.save_model(output_dir)
-    tokenizer.save_pretrained(output_dir)
-
-    label_path = output_dir / "label_mapping.json"
-    with label_path.open("w", encoding="utf-8") as fp:
-        json.dump({"labels": label_metadata, "metrics": metrics}, fp, ensure_ascii=False, indent=2)
-
-    logger.info("Building TF-IDF vector store")
-    build_vector_store(df, output_dir)
+    output_dir = export_artifacts(trainer, tokenizer, df, label_metadata, metrics, args)
+    if args.exit_layers:
+        export_exit_heads(trainer.model, datasets, args, output_dir)
 
     logger.info("Training completed successfully")
 